@@ -5,6 +5,12 @@ from prometheus_client import start_http_server, Gauge, Counter, Histogram
 import logging
 import os
 import importlib
+from utils.transport import TransportRegistry
+from utils.retry import RetryPolicy
+from utils.sdk_client_factory import SDKClientFactory
+from utils.response_cache import ResponseCache
+from utils.snapshot import SnapshotRegistry
+from utils.data_dir import DataDirectory
 
 # 配置日志 - 初始设置，后续会从配置文件中覆盖
 logging.basicConfig(
@@ -57,6 +63,19 @@ class HuaweiCloudExporter:
         logger.debug(f"Initializing HuaweiCloudExporter with config path: {config_path}")
         logger.debug(f"Log level set to: {log_level_str}")
         
+        # 初始化进程级共享HTTP传输层（连接池、keep-alive、DNS缓存）
+        TransportRegistry.configure(self.config.get('exporter', {}).get('http', {}))
+        # 初始化统一重试策略（HTTPClient和SDK调用共用）
+        RetryPolicy.configure_default(self.config.get('exporter', {}).get('retry', {}))
+        # 初始化共享SDK客户端工厂（按账号、区域和服务复用客户端）
+        SDKClientFactory.configure(self.config.get('exporter', {}).get('sdk', {}))
+        # 初始化共享响应缓存（相同凭证的相同查询在TTL内只请求一次）
+        ResponseCache.configure(self.config.get('exporter', {}).get('cache', {}))
+        # 初始化指标快照的序列淘汰代数
+        SnapshotRegistry.configure(self.config.get('exporter', {}).get('snapshot', {}))
+        # 设置本地持久化文件的数据目录
+        DataDirectory.configure(self.config.get('exporter', {}).get('data_dir'))
+        
     def _load_config(self, config_path):
         """
         加载配置文件
@@ -125,6 +144,8 @@ class HuaweiCloudExporter:
                 # 记录开始时间
                 start_time = time.time()
                 logger.debug(f"Starting collection cycle at {start_time}")
+                # 每个采集周期重置重试预算
+                RetryPolicy.default().budget.reset()
                 
                 # 执行所有收集器的collect方法
                 for collector in self.collectors:
@@ -133,7 +154,11 @@ class HuaweiCloudExporter:
                     
                     try:
                         logger.debug(f"Collecting metrics from {module_name} for account {account_name}")
-                        with COLLECTOR_SCRAPE_DURATION.labels(collector=module_name, account=account_name).time():
+                        # 采集期间的写入进入该采集器的构建快照，collect完成后整体发布，抓取不会看到更新到一半的数据，
+                        # 连续多个采集周期未出现的序列在发布时淘汰
+                        with COLLECTOR_SCRAPE_DURATION.labels(collector=module_name, account=account_name).time(), \
+                                SnapshotRegistry.cycle((module_name, account_name), collector.stale_generations,
+                                                       collector.metric_rules):
                             collector.collect()
                         # 收集成功，设置状态为1
                         COLLECTOR_UP.labels(collector=module_name, account=account_name).set(1)
@@ -202,6 +227,7 @@ class HuaweiCloudExporter:
             for thread in self.threads:
                 if thread.is_alive():
                     thread.join(timeout=5)
+            TransportRegistry.close_all()
 
 
 if __name__ == '__main__':
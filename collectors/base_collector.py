@@ -1,10 +1,26 @@
 from abc import ABC, abstractmethod
-from prometheus_client import CollectorRegistry
+from prometheus_client import CollectorRegistry, Counter
 import re
+import json
+import hashlib
 import logging
+from utils.retry import RetryPolicy
+from utils.sdk_raw import invoke_raw
+from utils.json_stream import JSONArrayStream, JSONRecords
+from utils.response_cache import ResponseCache, credential_identity
+from utils.pagination import DEFAULT_MAX_CONCURRENCY
+from utils.snapshot import SnapshotRegistry, MetricRules
 
 logger = logging.getLogger(__name__)
 
+# 定义模块级指标，避免重复注册
+# 按指纹比较后应用或跳过的记录更新数指标
+COLLECTOR_UPDATES_TOTAL = Counter(
+    'exporter_collector_updates_total',
+    'Total number of record metric updates applied or skipped because the data was unchanged',
+    ['collector', 'account', 'result']
+)
+
 
 class BaseCollector(ABC):
     """
@@ -22,6 +38,7 @@ class BaseCollector(ABC):
         self.name = name
         self.account_config = account_config
         self.module_config = module_config or {}
+        self.module_name = self.__class__.__name__.replace('Collector', '').lower()
         
         logger.debug(f"Initializing BaseCollector for account {name}")
         
@@ -56,6 +73,37 @@ class BaseCollector(ABC):
         logger.debug(f"Parameters: {self.params}")
         logger.debug(f"Collection interval: {self.collection_interval} seconds")
         
+        # 原始模式：直接解码SDK接口的响应JSON，跳过SDK响应模型的构造和转换
+        self.raw_mode = bool(self.module_config.get('raw_mode', False))
+        logger.debug(f"Raw mode: {self.raw_mode}")
+        
+        # 流式模式：边下载边逐条解析响应中的记录数组，单次调用的内存占用不随分页大小增长
+        self.stream_mode = bool(self.module_config.get('stream_mode', False))
+        logger.debug(f"Stream mode: {self.stream_mode}")
+        
+        # 跳过未变化数据的更新：false关闭，payload在整个响应未变化时跳过，record逐条跳过未变化的记录
+        skip_unchanged = self.module_config.get('skip_unchanged', False)
+        self.skip_unchanged = 'payload' if skip_unchanged is True else (skip_unchanged or None)
+        self._fingerprints = {}
+        self._pending_fingerprints = {}
+        # record模式下本轮应用和跳过的记录数，提交指纹时一次性计入指标，避免逐条查找标签
+        self._applied_records = 0
+        self._skipped_records = 0
+        logger.debug(f"Skip unchanged: {self.skip_unchanged}")
+        
+        # 分页、分区等并发请求的最大并发数
+        self.max_concurrency = int(self.module_config.get('max_concurrency', DEFAULT_MAX_CONCURRENCY))
+        logger.debug(f"Max concurrency: {self.max_concurrency}")
+        
+        # 序列连续多少个采集周期未出现时淘汰，不配置时使用exporter.snapshot.stale_generations
+        stale_generations = self.module_config.get('stale_generations')
+        self.stale_generations = int(stale_generations) if stale_generations is not None else None
+        logger.debug(f"Stale generations: {self.stale_generations}")
+        
+        # 指标族和标签的输出规则，不输出的指标族不做任何计算和存储
+        self.metric_rules = MetricRules(self.module_config.get('metric_families'))
+        logger.debug(f"Metric rules: {self.module_config.get('metric_families')}")
+        
     def _parse_time_interval(self, interval):
         """
         解析时间间隔配置，支持多种单位
@@ -110,6 +158,167 @@ class BaseCollector(ABC):
             logger.debug(f"Unknown type, returning default 60 seconds")
             return 60
         
+    def _metric_enabled(self, family):
+        """
+        判断指标族是否按规则输出，采集器在解析数据、构造标签之前调用，跳过不输出的指标的计算
+        
+        :param family: 快照指标族
+        :return: 是否输出
+        """
+        return self.metric_rules.enabled(family)
+        
+    def _call_sdk(self, operation, request, client=None):
+        """
+        通过统一重试策略调用华为云SDK接口
+        
+        :param operation: SDK客户端方法名，如 list_costs
+        :param request: SDK请求对象
+        :param client: SDK客户端，不传则使用采集器的默认客户端，多区域采集时传入对应区域的客户端
+        :return: 响应数据字典
+        """
+        client = client or self.client
+        logger.debug(f"Calling SDK operation {operation} for account {self.name}, raw_mode={self.raw_mode}")
+        if self.raw_mode:
+            # 原始模式下响应体与SDK to_json_object()的结构一致，采集器无需区分两种模式
+            def call():
+                response = invoke_raw(client, operation, request)
+                return response.json(), len(response.content)
+        else:
+            def call():
+                response = getattr(client, operation)(request)
+                return response.to_json_object(), len(response.raw_content or b'')
+        
+        def load():
+            # 各采集器调用的都是查询类接口，可以安全重试
+            return RetryPolicy.default().execute(call, idempotent=True, operation=operation)
+        
+        # 使用相同凭证和端点发出的相同请求共享响应缓存
+        identity = credential_identity(client.get_credentials().ak, *client._endpoints)
+        try:
+            return ResponseCache.get_or_load(identity, operation, request.to_dict(), load)
+        except Exception as e:
+            # 请求失败时本周期的数据不完整，不淘汰未出现的序列
+            SnapshotRegistry.mark_incomplete(f"{operation}: {e}")
+            raise
+        
+    def _call_sdk_records(self, operation, request, array_key, key=None, client=None):
+        """
+        调用华为云SDK接口并逐条返回响应中指定数组的记录
+        流式模式下以原始模式发出请求并边下载边解析（不经过响应缓存），其余模式下完整解析后再迭代
+        
+        :param operation: SDK客户端方法名，如 list_costs
+        :param request: SDK请求对象
+        :param array_key: 记录所在的顶层数组字段名
+        :param key: 响应指纹标识，分页或分区调用时用于区分不同的页，默认为操作名
+        :param client: SDK客户端，不传则使用采集器的默认客户端
+        :return: 可迭代的记录集合，响应中的其他字段可在迭代结束后通过meta获取，记录数可在迭代结束后通过records获取；
+                 开启skip_unchanged且响应与上次成功处理的相同时unchanged为True
+        """
+        if not self.stream_mode:
+            data = self._call_sdk(operation, request, client)
+            unchanged = self._payload_unchanged(key or operation, data, len(data.get(array_key) or []))
+            return self._with_unchanged(JSONRecords(data, array_key), unchanged)
+        
+        logger.debug(f"Streaming SDK operation {operation} for account {self.name}")
+        # 重试只覆盖到收到响应头为止，响应体读取过程中的错误由采集器的异常处理负责
+        try:
+            response = RetryPolicy.default().execute(
+                lambda: invoke_raw(client or self.client, operation, request, stream=True),
+                idempotent=True,
+                operation=operation
+            )
+        except Exception as e:
+            SnapshotRegistry.mark_incomplete(f"{operation}: {e}")
+            raise
+        return self._with_unchanged(JSONArrayStream(response, array_key, source=operation))
+        
+    @staticmethod
+    def _with_unchanged(records, unchanged=False):
+        """
+        标记记录集合对应的响应是否与上次成功处理的相同，流式响应在读取前无法计算指纹，始终视为已变化
+        
+        :param records: JSONRecords或JSONArrayStream
+        :param unchanged: 是否未变化
+        :return: 标记后的记录集合
+        """
+        records.unchanged = unchanged
+        return records
+        
+    @staticmethod
+    def _fingerprint(data):
+        """
+        计算数据的指纹，字段顺序不同的相同数据得到相同的指纹
+        
+        :param data: 可JSON序列化的数据
+        :return: 指纹字符串
+        """
+        normalized = json.dumps(data, sort_keys=True, default=str, separators=(',', ':'))
+        return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+        
+    def _payload_unchanged(self, key, data, record_count=1):
+        """
+        判断整个响应是否与上次成功处理的相同，相同时调用方可以跳过整个更新过程
+        record模式下始终逐条比较记录，不做整体比较，以便每轮都能看到所有记录并丢弃已消失记录的指纹
+        
+        :param key: 响应标识，如SDK接口方法名
+        :param data: 响应数据
+        :param record_count: 响应中的记录数，用于统计跳过的更新数
+        :return: 是否未变化
+        """
+        if self.skip_unchanged != 'payload':
+            return False
+        fingerprint = self._fingerprint(data)
+        if self._fingerprints.get(('payload', key)) == fingerprint:
+            COLLECTOR_UPDATES_TOTAL.labels(collector=self.module_name, account=self.name, result='skipped').inc(record_count)
+            # 跳过更新的响应对应哪些序列无法区分，本周期保留该采集器的所有序列
+            SnapshotRegistry.retain_all()
+            logger.debug(f"Payload {key} unchanged for account {self.name}, skipping {record_count} updates")
+            return True
+        self._pending_fingerprints[('payload', key)] = fingerprint
+        if record_count:
+            COLLECTOR_UPDATES_TOTAL.labels(collector=self.module_name, account=self.name, result='applied').inc(record_count)
+        return False
+        
+    def _record_unchanged(self, key, record):
+        """
+        判断单条记录是否与上次成功处理的相同，仅在skip_unchanged为record时比较
+        
+        :param key: 记录标识，如资源ID
+        :param record: 记录数据
+        :return: 是否未变化
+        """
+        if self.skip_unchanged != 'record':
+            return False
+        fingerprint = self._fingerprint(record)
+        unchanged = self._fingerprints.get(('record', key)) == fingerprint
+        self._pending_fingerprints[('record', key)] = fingerprint
+        # 未变化的记录保留上次写入的序列，变化的记录重新记录写入了哪些序列
+        if unchanged:
+            SnapshotRegistry.touch_record(key)
+            self._skipped_records += 1
+        else:
+            SnapshotRegistry.attribute(key)
+            self._applied_records += 1
+        return unchanged
+        
+    def _commit_fingerprints(self):
+        """
+        本轮更新成功完成后提交指纹，更新失败时不提交，下一轮会重新应用所有变化
+        """
+        if not self.skip_unchanged:
+            return
+        if self.skip_unchanged == 'record':
+            # 本轮未出现的记录不再保留指纹
+            self._fingerprints = self._pending_fingerprints
+        else:
+            self._fingerprints.update(self._pending_fingerprints)
+        self._pending_fingerprints = {}
+        for result, count in (('applied', self._applied_records), ('skipped', self._skipped_records)):
+            if count:
+                COLLECTOR_UPDATES_TOTAL.labels(collector=self.module_name, account=self.name, result=result).inc(count)
+        self._applied_records = self._skipped_records = 0
+        logger.debug(f"Committed {len(self._fingerprints)} fingerprints for account {self.name}")
+        
     @abstractmethod
     def collect(self):
         """
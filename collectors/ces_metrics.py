@@ -0,0 +1,296 @@
+from collectors.base_collector import BaseCollector
+from utils.snapshot import SnapshotGauge, SnapshotRegistry
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.sdk_client_factory import SDKClientFactory
+
+# 导入华为云SDK相关模块
+from huaweicloudsdkcore.exceptions import exceptions
+from huaweicloudsdkces.v1 import *
+
+logger = logging.getLogger(__name__)
+
+# 定义模块级指标，避免重复注册
+# 云监控指标最新值
+CES_METRIC_VALUE = SnapshotGauge(
+    'huaweicloud_ces_metric_value',
+    'Latest datapoint of Cloud Eye metrics',
+    ['account', 'region', 'namespace', 'metric_name', 'dimensions']
+)
+
+# 云监控指标最新数据点时间戳 (Unix时间戳)
+CES_METRIC_TIMESTAMP = SnapshotGauge(
+    'huaweicloud_ces_metric_timestamp',
+    'Timestamp of the latest datapoint of Cloud Eye metrics (Unix timestamp)',
+    ['account', 'region', 'namespace', 'metric_name', 'dimensions']
+)
+
+# 云监控采集的序列数指标
+CES_SERIES_TOTAL = SnapshotGauge(
+    'huaweicloud_ces_series_total',
+    'Total count of Cloud Eye metric series collected',
+    ['account', 'region']
+)
+
+# BatchListMetricData每次请求的指标数上限
+BATCH_LIMIT = 500
+
+# ListMetrics每页条数上限
+LIST_METRICS_LIMIT = 1000
+
+
+class CESCollector(BaseCollector):
+    """
+    云监控（Cloud Eye）指标收集器
+    将多个 (指标, 维度) 组合打包到一次BatchListMetricData请求中，各区域的批次并发执行，
+    并按序列记录最新数据点的时间戳，每次只查询新的数据点。
+    专门使用AK/SK认证方式和华为云SDK
+    """
+    
+    def __init__(self, name, account_config, module_config=None):
+        super().__init__(name, account_config, module_config)
+        
+        # 每个请求打包的指标数，不超过接口上限
+        self.batch_size = max(min(int(self.module_config.get('batch_size', BATCH_LIMIT)), BATCH_LIMIT), 1)
+        # 聚合周期和聚合方式，周期1表示原始数据
+        self.period = str(self.module_config.get('period', '1'))
+        self.filter = self.module_config.get('filter', 'average')
+        # 首次采集和长时间未更新的序列向前查询的秒数
+        self.lookback = int(self.module_config.get('lookback', 600))
+        # 重新发现维度的间隔秒数
+        self.discovery_interval = self._parse_time_interval(self.module_config.get('discovery_interval', '1h'))
+        self.metrics = self.module_config.get('metrics') or []
+        # 区域 -> 序列列表，序列为 (namespace, metric_name, ((维度名, 维度值), ...))
+        self._series = {}
+        self._discovered_at = 0
+        # (区域, 序列) -> 已处理的最新数据点时间戳（毫秒）
+        self._last_seen = {}
+        
+        # 初始化华为云CES客户端
+        logger.debug(f"Initializing CES collector for account {name}")
+        try:
+            # 使用配置中的AK/SK或者环境变量
+            ak = self.ak or os.environ.get("CLOUD_SDK_AK")
+            sk = self.sk or os.environ.get("CLOUD_SDK_SK")
+            
+            if not ak or not sk:
+                logger.error(f"Missing AK/SK credentials for CES collector in account {self.name}")
+                self.client = None
+                return
+            
+            # 使用配置中的区域或者默认区域
+            region = self.region or "cn-north-4"
+            self.regions = self.module_config.get('regions') or [region]
+            # 区域 -> 项目ID，未配置时由SDK按区域自动获取
+            project_ids = self.module_config.get('project_ids') or {}
+            # 区域 -> 端点，账号级的endpoint只用于账号配置的区域，其他区域未配置时使用SDK的区域端点
+            endpoints = self.module_config.get('endpoints') or {}
+            logger.debug(f"Using regions: {self.regions}")
+            
+            # CES是项目级服务，每个区域使用独立的共享客户端
+            self.clients = {
+                r: SDKClientFactory.get_client('ces', ak, sk, r,
+                                               endpoint=endpoints.get(r) or (self.endpoint if r == region else None) or None,
+                                               project_id=project_ids.get(r) or (self.project_id if r == region else None))
+                for r in self.regions
+            }
+            self.client = self.clients[self.regions[0]]
+            logger.debug("CES clients initialized successfully")
+        
+        except Exception as e:
+            logger.error(f"Failed to initialize CES client for account {self.name}: {e}")
+            self.client = None
+        
+    def collect(self):
+        """
+        收集云监控指标
+        """
+        logger.debug(f"Starting CES metrics collection for account {self.name}")
+        if not self.client:
+            logger.warning(f"CES client not initialized for CES collector in account {self.name}")
+            return
+        
+        try:
+            if time.time() - self._discovered_at >= self.discovery_interval:
+                self._discover_series()
+            
+            now = int(time.time() * 1000)
+            batches = []
+            for region, series in self._series.items():
+                CES_SERIES_TOTAL.labels(account=self.name, region=region).set(len(series))
+                # 按上次数据点时间排序后分批，同一批次的序列查询起点接近，减少重复返回的数据点
+                ordered = sorted(series, key=lambda s: self._last_seen.get((region, s), 0))
+                for i in range(0, len(ordered), self.batch_size):
+                    batches.append((region, ordered[i:i + self.batch_size]))
+            logger.debug(f"Querying {sum(len(s) for s in self._series.values())} CES series in {len(batches)} batches")
+            
+            # 请求在线程池中并发执行，指标在当前线程中按完成顺序更新
+            with ThreadPoolExecutor(max_workers=max(min(self.max_concurrency, len(batches)), 1),
+                                    thread_name_prefix='ces-batch') as pool:
+                futures = {pool.submit(self._fetch_batch, region, batch, now): region for region, batch in batches}
+                for future in as_completed(futures):
+                    try:
+                        self._update_batch_metrics(futures[future], future.result())
+                    except exceptions.ClientRequestException as e:
+                        logger.error(f"Error querying CES batch in region {futures[future]} for account {self.name}: "
+                                     f"status_code={e.status_code}, request_id={e.request_id}, "
+                                     f"error_code={e.error_code}, error_msg={e.error_msg}")
+                        SnapshotRegistry.mark_incomplete(str(e))
+            
+            # 只有出现新数据点的序列会重新写入，已发现的序列都保留，只在重新发现时删除不存在的序列
+            for region, series in self._series.items():
+                for namespace, metric_name, dimensions in series:
+                    labels = (self.name, region, namespace, metric_name, self._dimension_label(dimensions))
+                    CES_METRIC_VALUE.touch(*labels)
+                    CES_METRIC_TIMESTAMP.touch(*labels)
+        
+        except exceptions.ClientRequestException as e:
+            logger.error(f"Error collecting CES metrics for account {self.name}: "
+                         f"status_code={e.status_code}, request_id={e.request_id}, "
+                         f"error_code={e.error_code}, error_msg={e.error_msg}")
+            SnapshotRegistry.mark_incomplete(str(e))
+        except Exception as e:
+            import traceback
+            logger.error(f"Error collecting CES metrics for account {self.name}: {e}")
+            logger.error(f"Full traceback: {traceback.format_exc()}")
+            SnapshotRegistry.mark_incomplete(str(e))
+        logger.debug(f"Completed CES metrics collection for account {self.name}")
+        
+    @staticmethod
+    def _dimension_label(dimensions):
+        """
+        将维度转换为标签值，如 instance_id=xxx,disk=yyy
+        """
+        return ','.join(f"{name}={value}" for name, value in dimensions)
+        
+    def _discover_series(self):
+        """
+        根据配置生成各区域需要采集的序列，未配置维度的指标通过ListMetrics发现所有维度
+        """
+        discovered = {}
+        for region in self.regions:
+            series = set()
+            for metric in self.metrics:
+                namespace = metric.get('namespace')
+                metric_names = metric.get('metric_names') or [metric.get('metric_name')]
+                for metric_name in metric_names:
+                    if metric.get('dimensions'):
+                        for dimensions in metric['dimensions']:
+                            series.add((namespace, metric_name, tuple(sorted(dimensions.items()))))
+                    else:
+                        series.update(self._list_metrics(region, namespace, metric_name))
+            discovered[region] = sorted(series)
+            logger.debug(f"Discovered {len(series)} CES series in region {region}")
+        
+        # 删除已经不存在的序列对应的指标
+        for region, series in self._series.items():
+            current = set(discovered.get(region) or [])
+            for stale in [s for s in series if s not in current]:
+                self._last_seen.pop((region, stale), None)
+                labels = (self.name, region, stale[0], stale[1], self._dimension_label(stale[2]))
+                for gauge in (CES_METRIC_VALUE, CES_METRIC_TIMESTAMP):
+                    try:
+                        gauge.remove(*labels)
+                    except KeyError:
+                        pass
+        self._series = discovered
+        self._discovered_at = time.time()
+        
+    def _list_metrics(self, region, namespace, metric_name):
+        """
+        通过ListMetrics按游标分页获取指标的所有维度组合
+        
+        :param region: 区域
+        :param namespace: 服务命名空间，如 SYS.ECS
+        :param metric_name: 指标名称，如 cpu_util
+        :return: 序列列表
+        """
+        series = []
+        start = None
+        while True:
+            request = ListMetricsRequest(namespace=namespace, metric_name=metric_name,
+                                         limit=LIST_METRICS_LIMIT, start=start)
+            logger.debug(f"Calling list_metrics API for {namespace}/{metric_name} in region {region}, start={start}")
+            data = self._call_sdk('list_metrics', request, client=self.clients[region])
+            metrics = data.get('metrics') or []
+            for metric in metrics:
+                dimensions = tuple(sorted((d.get('name'), d.get('value')) for d in metric.get('dimensions') or []))
+                series.append((metric.get('namespace', namespace), metric.get('metric_name', metric_name), dimensions))
+            start = (data.get('meta_data') or {}).get('marker')
+            if len(metrics) < LIST_METRICS_LIMIT or not start:
+                return series
+        
+    def _fetch_batch(self, region, batch, now):
+        """
+        查询一批序列的新数据点，在线程池中调用
+        
+        :param region: 区域
+        :param batch: 序列列表，不超过batch_size
+        :param now: 查询结束时间（毫秒）
+        :return: 响应数据字典
+        """
+        oldest = now - self.lookback * 1000
+        # 批次的查询起点为批次中最早的上次数据点之后，最多向前查询lookback秒
+        begin = max(min(self._last_seen.get((region, s), 0) for s in batch) + 1, oldest)
+        request = BatchListMetricDataRequest(
+            body=BatchListMetricDataRequestBody(
+                metrics=[
+                    MetricInfo(
+                        namespace=namespace,
+                        metric_name=metric_name,
+                        dimensions=[MetricsDimension(name=name, value=value) for name, value in dimensions]
+                    )
+                    for namespace, metric_name, dimensions in batch
+                ],
+                period=self.period,
+                filter=self.filter,
+                _from=begin,
+                to=now
+            )
+        )
+        logger.debug(f"Calling batch_list_metric_data API for {len(batch)} series in region {region}, from={begin}")
+        return self._call_sdk('batch_list_metric_data', request, client=self.clients[region])
+        
+    def _update_batch_metrics(self, region, data):
+        """
+        只处理比上次数据点更新的数据点，以每个序列的最新数据点更新指标
+        
+        :param region: 区域
+        :param data: BatchListMetricData响应数据字典
+        """
+        updated = 0
+        for metric in data.get('metrics') or []:
+            dimensions = tuple(sorted((d.get('name'), d.get('value')) for d in metric.get('dimensions') or []))
+            series = (metric.get('namespace'), metric.get('metric_name'), dimensions)
+            last_seen = self._last_seen.get((region, series), 0)
+            datapoints = [p for p in metric.get('datapoints') or []
+                          if p.get('timestamp', 0) > last_seen and p.get(self.filter) is not None]
+            if not datapoints:
+                continue
+            
+            latest = max(datapoints, key=lambda p: p['timestamp'])
+            self._last_seen[(region, series)] = latest['timestamp']
+            labels = {
+                'account': self.name,
+                'region': region,
+                'namespace': series[0],
+                'metric_name': series[1],
+                'dimensions': self._dimension_label(dimensions)
+            }
+            CES_METRIC_VALUE.labels(**labels).set(float(latest[self.filter]))
+            CES_METRIC_TIMESTAMP.labels(**labels).set(latest['timestamp'] / 1000)
+            updated += 1
+        logger.debug(f"Updated {updated} CES series with new datapoints in region {region}")
+        
+    def describe(self):
+        """
+        描述此收集器提供的指标
+        """
+        logger.debug("Describing CES collector metrics")
+        return [
+            CES_METRIC_VALUE,
+            CES_METRIC_TIMESTAMP,
+            CES_SERIES_TOTAL
+        ]
@@ -1,62 +1,65 @@
 from collectors.base_collector import BaseCollector
-from prometheus_client import Gauge, Info
+from utils.snapshot import SnapshotGauge, SnapshotInfo, SnapshotRegistry
+from utils.expiry import ExpiryHistogram
 import logging
 from utils.http_client import HTTPClient
+from utils.json_stream import JSONArrayStream, JSONRecords
+from utils.pagination import iter_offset_pages, report_completeness
 
 logger = logging.getLogger(__name__)
 
 # 定义模块级指标，避免重复注册
 # 域名总数指标
-DOMAIN_TOTAL_COUNT = Gauge(
+DOMAIN_TOTAL_COUNT = SnapshotGauge(
     'huaweicloud_domain_total_count',
     'Total count of domains in the account',
     ['account']
 )
 
 # 域名状态指标
-DOMAIN_STATUS = Gauge(
+DOMAIN_STATUS = SnapshotGauge(
     'huaweicloud_domain_status',
     'Status of domains (1 for active, 0 for inactive)',
     ['account', 'domain_name']
 )
 
 # 域名注册日期指标 (Unix时间戳)
-DOMAIN_REGISTER_TIMESTAMP = Gauge(
+DOMAIN_REGISTER_TIMESTAMP = SnapshotGauge(
     'huaweicloud_domain_register_timestamp',
     'Register timestamp of domains (Unix timestamp)',
     ['account', 'domain_name']
 )
 
 # 域名到期时间指标 (Unix时间戳)
-DOMAIN_EXPIRE_TIMESTAMP = Gauge(
+DOMAIN_EXPIRE_TIMESTAMP = SnapshotGauge(
     'huaweicloud_domain_expire_timestamp',
     'Expire timestamp of domains (Unix timestamp)',
     ['account', 'domain_name']
 )
 
 # 域名信息指标
-DOMAIN_INFO = Info(
+DOMAIN_INFO = SnapshotInfo(
     'huaweicloud_domain',
     'Detailed information of domains',
     ['account', 'domain_name']
 )
 
 # 域名剩余天数指标
-DOMAIN_REMAINING_DAYS = Gauge(
+DOMAIN_REMAINING_DAYS = SnapshotGauge(
     'huaweicloud_domain_remaining_days',
     'Remaining days until domain expires',
     ['account', 'domain_name']
 )
 
 # 域名是否启用隐私保护指标
-DOMAIN_PRIVACY_PROTECTION = Gauge(
+DOMAIN_PRIVACY_PROTECTION = SnapshotGauge(
     'huaweicloud_domain_privacy_protection',
     'Whether privacy protection is enabled for the domain (1 for enabled, 0 for disabled)',
     ['account', 'domain_name']
 )
 
 # 域名是否自动续费指标
-DOMAIN_AUTO_RENEW = Gauge(
+DOMAIN_AUTO_RENEW = SnapshotGauge(
     'huaweicloud_domain_auto_renew',
     'Whether auto renew is enabled for the domain (1 for enabled, 0 for disabled)',
     ['account', 'domain_name']
@@ -71,6 +74,8 @@ class DOMAINCollector(BaseCollector):
     
     def __init__(self, name, account_config, module_config=None):
         super().__init__(name, account_config, module_config)
+        # 可选的按顶级域名统计的到期时间分桶（模块配置expiry_histogram）
+        self.expiry = ExpiryHistogram.from_config(self, DOMAIN_EXPIRE_TIMESTAMP)
         
         # 设置默认端点（如果模块配置中没有指定）
         if not self.endpoint:
@@ -89,198 +94,205 @@ class DOMAINCollector(BaseCollector):
     def collect(self):
         """
         收集域名信息指标
+        每页返回后立即更新该页域名的指标，第一页返回总数后并发获取剩余页
         """
         logger.debug(f"Starting domain metrics collection for account {self.name}")
         try:
-            # 获取所有域名信息
-            logger.debug("Fetching all domains")
-            all_domains_result = self.get_all_domains()
+            limit = int(self.params.get('limit', 200))  # 从配置中获取limit参数，默认200
+            logger.debug(f"Using limit: {limit}")
             
-            if not all_domains_result["success"]:
-                logger.error(f"Failed to get domain information for account {self.name}: {all_domains_result.get('message', 'Unknown error')}")
-                return
+            total_count = 0
+            fetched = 0
+            for _, offset, page in iter_offset_pages(self._fetch_domain_page, limit,
+                                                     max_workers=self.max_concurrency,
+                                                     total_key='total', operation='list_domains'):
+                for domain in page:
+                    # 该页或该域名数据与上次成功处理的相同时，只更新随时间变化的剩余天数
+                    if page.unchanged or self._record_unchanged(domain.get('domain_name', 'unknown'), domain):
+                        self._update_remaining_days(domain)
+                        if self.expiry:
+                            self.expiry.retain(domain.get('domain_name', 'unknown'))
+                        continue
+                    self._update_domain_metrics(domain)
+                fetched += page.records
+                logger.debug(f"Processed {page.records} domains at offset {offset}")
                 
-            domain_data = all_domains_result["data"]
-            domains = domain_data.get("domains", [])
-            total_count = domain_data.get("total", 0)
+                # 第一页返回后即可更新域名总数指标
+                if offset == 0:
+                    total_count = int(page.meta.get('total') or 0)
+                    DOMAIN_TOTAL_COUNT.labels(account=self.name).set(total_count)
+                    logger.debug(f"Updated total domain count for account {self.name}: {total_count}")
             
-            logger.debug(f"Retrieved {len(domains)} domains, total count: {total_count}")
-            
-            # 更新域名总数指标
-            DOMAIN_TOTAL_COUNT.labels(account=self.name).set(total_count)
-            logger.debug(f"Updated total domain count for account {self.name}: {total_count}")
+            # 记录实际获取的域名数与API返回总数的比例
+            report_completeness(self.module_name, self.name, 'list_domains', fetched, total_count)
             
             # 如果没有域名，也要确保指标被设置
-            if not domains:
+            if not total_count:
                 logger.info(f"No domains found for account {self.name}")
-                return
-                
-            # 更新每个域名的详细指标
-            for domain in domains:
-                domain_name = domain.get('domain_name', 'unknown')
-                logger.debug(f"Processing domain: {domain_name}")
-                
-                # 域名状态指标 (将状态字符串转换为0/1)
-                status = domain.get('status', 'UNKNOWN')
-                # 假设'REALNAMEVERIFY'和'NORMAL'表示正常状态
-                status_value = 1 if status in ['REALNAMEVERIFY', 'NORMAL'] else 0
-                DOMAIN_STATUS.labels(
-                    account=self.name,
-                    domain_name=domain_name
-                ).set(status_value)
-                logger.debug(f"Domain {domain_name} status: {status} -> {status_value}")
-                
-                # 域名注册日期指标
-                register_date = domain.get('register_date')
-                if register_date:
-                    try:
-                        import datetime
-                        register_datetime = datetime.datetime.strptime(register_date, '%Y-%m-%d')
-                        register_timestamp = register_datetime.timestamp()
-                        DOMAIN_REGISTER_TIMESTAMP.labels(
-                            account=self.name,
-                            domain_name=domain_name
-                        ).set(register_timestamp)
-                        logger.debug(f"Domain {domain_name} register date: {register_date} -> {register_timestamp}")
-                    except Exception as e:
-                        logger.warning(f"Failed to parse register date for domain {domain_name}: {e}")
-                
-                # 域名到期时间指标
-                expire_date = domain.get('expire_date')
-                if expire_date:
-                    try:
-                        import datetime
-                        expire_datetime = datetime.datetime.strptime(expire_date, '%Y-%m-%d')
-                        expire_timestamp = expire_datetime.timestamp()
-                        DOMAIN_EXPIRE_TIMESTAMP.labels(
-                            account=self.name,
-                            domain_name=domain_name
-                        ).set(expire_timestamp)
-                        logger.debug(f"Domain {domain_name} expire date: {expire_date} -> {expire_timestamp}")
-                        
-                        # 计算并更新剩余天数指标
-                        remaining_days = (expire_datetime - datetime.datetime.now()).days
-                        DOMAIN_REMAINING_DAYS.labels(
-                            account=self.name,
-                            domain_name=domain_name
-                        ).set(remaining_days)
-                        logger.debug(f"Domain {domain_name} remaining days: {remaining_days}")
-                    except Exception as e:
-                        logger.warning(f"Failed to parse expire date for domain {domain_name}: {e}")
-                
-                # 域名隐私保护指标
-                privacy_protection = domain.get('privacy_protection', False)
-                DOMAIN_PRIVACY_PROTECTION.labels(
-                    account=self.name,
-                    domain_name=domain_name
-                ).set(1 if privacy_protection else 0)
-                logger.debug(f"Domain {domain_name} privacy protection: {privacy_protection}")
-                
-                # 域名自动续费指标
-                auto_renew = domain.get('auto_renew', '0')
-                DOMAIN_AUTO_RENEW.labels(
-                    account=self.name,
-                    domain_name=domain_name
-                ).set(1 if auto_renew == '1' else 0)
-                logger.debug(f"Domain {domain_name} auto renew: {auto_renew}")
-                
-                # 域名信息指标
-                DOMAIN_INFO.labels(
-                    account=self.name,
-                    domain_name=domain_name
-                ).info({
-                    'reg_type': domain.get('reg_type', ''),
-                    'audit_status': domain.get('audit_status', ''),
-                    'audit_fail_reason': domain.get('audit_fail_reason', '') or '',
-                    'transfer_status': domain.get('transfer_status', '') or '',
-                    'order_id': domain.get('order_id', '') or ''
-                })
-                logger.debug(f"Domain {domain_name} info updated")
+            
+            # 本轮更新成功完成，提交数据指纹
+            self._commit_fingerprints()
+            if self.expiry:
+                self.expiry.publish()
                         
         except Exception as e:
             logger.error(f"Error collecting domain metrics for account {self.name}: {e}")
+            SnapshotRegistry.mark_incomplete(str(e))
         logger.debug(f"Completed domain metrics collection for account {self.name}")
             
-    def query_domains(self, offset=0, limit=200):
+    def _update_domain_metrics(self, domain):
         """
-        查询域名列表
-        :param offset: 偏移量
-        :param limit: 每页数量
-        :return: 查询结果字典
+        更新单个域名的指标
+        
+        :param domain: 域名信息字典
         """
-        logger.debug(f"Querying domains for account {self.name} with offset={offset}, limit={limit}")
-        try:
-            # 使用统一的HTTP客户端发送请求
-            url = f"{self.endpoint}/v2/domains"
-            params = {
-                "offset": offset,
-                "limit": limit
-            }
-            
-            logger.debug(f"Sending GET request to {url} with params {params}")
-            response = self.http_client.get(
-                url,
-                auth_type='token',
-                iam_endpoint=self.iam_endpoint,
-                domain_name=self.domain_name,
-                username=self.username,
-                password=self.password,
-                params=params
-            )
+        domain_name = domain.get('domain_name', 'unknown')
+        logger.debug(f"Processing domain: {domain_name}")
+        
+        # 域名状态指标 (将状态字符串转换为0/1)
+        if self._metric_enabled(DOMAIN_STATUS):
+            status = domain.get('status', 'UNKNOWN')
+            # 假设'REALNAMEVERIFY'和'NORMAL'表示正常状态
+            status_value = 1 if status in ['REALNAMEVERIFY', 'NORMAL'] else 0
+            DOMAIN_STATUS.labels(
+                account=self.name,
+                domain_name=domain_name
+            ).set(status_value)
+            logger.debug(f"Domain {domain_name} status: {status} -> {status_value}")
+        
+        # 域名注册日期指标
+        if self._metric_enabled(DOMAIN_REGISTER_TIMESTAMP):
+            register_date = domain.get('register_date')
+            if register_date:
+                try:
+                    import datetime
+                    register_datetime = datetime.datetime.strptime(register_date, '%Y-%m-%d')
+                    register_timestamp = register_datetime.timestamp()
+                    DOMAIN_REGISTER_TIMESTAMP.labels(
+                        account=self.name,
+                        domain_name=domain_name
+                    ).set(register_timestamp)
+                    logger.debug(f"Domain {domain_name} register date: {register_date} -> {register_timestamp}")
+                except Exception as e:
+                    logger.warning(f"Failed to parse register date for domain {domain_name}: {e}")
+        
+        # 域名到期时间指标
+        if self._metric_enabled(DOMAIN_EXPIRE_TIMESTAMP) or self.expiry:
+            expire_date = domain.get('expire_date')
+            expire_timestamp = None
+            if expire_date:
+                try:
+                    import datetime
+                    expire_datetime = datetime.datetime.strptime(expire_date, '%Y-%m-%d')
+                    expire_timestamp = expire_datetime.timestamp()
+                    DOMAIN_EXPIRE_TIMESTAMP.labels(
+                        account=self.name,
+                        domain_name=domain_name
+                    ).set(expire_timestamp)
+                    logger.debug(f"Domain {domain_name} expire date: {expire_date} -> {expire_timestamp}")
+                except Exception as e:
+                    logger.warning(f"Failed to parse expire date for domain {domain_name}: {e}")
+            if self.expiry:
+                if expire_timestamp is not None:
+                    self.expiry.observe(domain_name, domain_name.rsplit('.', 1)[-1], expire_timestamp)
+                else:
+                    self.expiry.discard(domain_name)
+        
+        # 计算并更新剩余天数指标
+        self._update_remaining_days(domain)
+        
+        # 域名隐私保护指标
+        if self._metric_enabled(DOMAIN_PRIVACY_PROTECTION):
+            privacy_protection = domain.get('privacy_protection', False)
+            DOMAIN_PRIVACY_PROTECTION.labels(
+                account=self.name,
+                domain_name=domain_name
+            ).set(1 if privacy_protection else 0)
+            logger.debug(f"Domain {domain_name} privacy protection: {privacy_protection}")
+        
+        # 域名自动续费指标
+        if self._metric_enabled(DOMAIN_AUTO_RENEW):
+            auto_renew = domain.get('auto_renew', '0')
+            DOMAIN_AUTO_RENEW.labels(
+                account=self.name,
+                domain_name=domain_name
+            ).set(1 if auto_renew == '1' else 0)
+            logger.debug(f"Domain {domain_name} auto renew: {auto_renew}")
+        
+        # 域名信息指标
+        if self._metric_enabled(DOMAIN_INFO):
+            DOMAIN_INFO.labels(
+                account=self.name,
+                domain_name=domain_name
+            ).info({
+                'reg_type': domain.get('reg_type', ''),
+                'audit_status': domain.get('audit_status', ''),
+                'audit_fail_reason': domain.get('audit_fail_reason', '') or '',
+                'transfer_status': domain.get('transfer_status', '') or '',
+                'order_id': domain.get('order_id', '') or ''
+            })
+            logger.debug(f"Domain {domain_name} info updated")
             
-            data = response.json()
-            domains_count = len(data.get("domains", []))
-            logger.debug(f"Successfully queried {domains_count} domains")
-            return {
-                "success": True,
-                "data": {
-                    "domains": data.get("domains", []),
-                    "total": data.get("total", 0)
-                }
-            }
-        except Exception as e:
-            logger.error(f"Exception while querying domains for account {self.name}: {str(e)}")
-            return {"success": False, "data": None, "message": str(e)}
-    
-    def get_all_domains(self):
+    def _update_remaining_days(self, domain):
         """
-        获取所有域名信息
-        :return: 所有域名信息字典
-        """
-        logger.debug(f"Getting all domains for account {self.name}")
-        all_domains = []
-        offset = 0
-        limit = self.params.get('limit', 200)  # 从配置中获取limit参数，默认200
-        logger.debug(f"Using limit: {limit}")
+        更新域名剩余天数指标，该指标随时间变化，域名数据未变化时也需要更新
         
-        while True:
-            logger.debug(f"Fetching domains batch: offset={offset}")
-            result = self.query_domains(offset, limit)
-            if not result["success"]:
-                logger.error(f"Failed to get domains batch for account {self.name}")
-                return result
-            
-            domains = result["data"]["domains"]
-            total = result["data"]["total"]
-            all_domains.extend(domains)
-            logger.debug(f"Retrieved {len(domains)} domains in this batch")
-            
-            # 如果当前获取的域名数量小于limit，说明已经获取完所有域名
-            if len(domains) < limit:
-                logger.debug("All domains fetched")
-                break
+        :param domain: 域名信息字典
+        """
+        if not self._metric_enabled(DOMAIN_REMAINING_DAYS):
+            return
+        domain_name = domain.get('domain_name', 'unknown')
+        expire_date = domain.get('expire_date')
+        if not expire_date:
+            return
+        try:
+            import datetime
+            expire_datetime = datetime.datetime.strptime(expire_date, '%Y-%m-%d')
+            remaining_days = (expire_datetime - datetime.datetime.now()).days
+            DOMAIN_REMAINING_DAYS.labels(
+                account=self.name,
+                domain_name=domain_name
+            ).set(remaining_days)
+            logger.debug(f"Domain {domain_name} remaining days: {remaining_days}")
+        except Exception as e:
+            logger.warning(f"Failed to calculate remaining days for domain {domain_name}: {e}")
             
-            offset += limit
-            logger.debug(f"Updating offset to {offset}")
+    def _fetch_domain_page(self, partition, offset):
+        """
+        获取一页域名数据，在分页工作线程中调用
+        流式模式下返回边下载边解析的记录流，否则返回完整解析的记录集合
         
-        logger.debug(f"Total domains retrieved: {len(all_domains)}")
-        return {
-            "success": True,
-            "data": {
-                "domains": all_domains,
-                "total": len(all_domains)
-            }
+        :param partition: 分区，域名查询不分区，始终为None
+        :param offset: 偏移量
+        :return: 该页的记录集合
+        """
+        url = f"{self.endpoint}/v2/domains"
+        limit = int(self.params.get('limit', 200))
+        params = {
+            "offset": offset,
+            "limit": limit
         }
+        
+        logger.debug(f"Sending GET request to {url} with params {params}")
+        response = self.http_client.get(
+            url,
+            auth_type='token',
+            iam_endpoint=self.iam_endpoint,
+            domain_name=self.domain_name,
+            username=self.username,
+            password=self.password,
+            params=params,
+            stream=self.stream_mode
+        )
+        
+        if self.stream_mode:
+            return self._with_unchanged(JSONArrayStream(response, 'domains', source='domain'))
+        
+        data = response.json()
+        domains = data.get("domains") or []
+        logger.debug(f"Successfully queried {len(domains)} domains")
+        return self._with_unchanged(JSONRecords(data, 'domains'),
+                                    self._payload_unchanged(f"domains:{offset}", data, len(domains)))
             
     def describe(self):
         """
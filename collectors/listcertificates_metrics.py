@@ -1,13 +1,14 @@
 from collectors.base_collector import BaseCollector
-from prometheus_client import Gauge, Info
+from utils.snapshot import SnapshotGauge, SnapshotInfo, SnapshotRegistry
+from utils.expiry import ExpiryHistogram
 import logging
 import os
 from datetime import datetime
 import time
+from utils.sdk_client_factory import SDKClientFactory
+from utils.pagination import iter_offset_pages, report_completeness
 
 # 导入华为云SDK相关模块
-from huaweicloudsdkcore.auth.credentials import GlobalCredentials
-from huaweicloudsdkscm.v3.region.scm_region import ScmRegion
 from huaweicloudsdkcore.exceptions import exceptions
 from huaweicloudsdkscm.v3 import *
 
@@ -15,28 +16,30 @@ logger = logging.getLogger(__name__)
 
 # 定义模块级指标，避免重复注册
 # 证书总数指标
-CERTIFICATE_TOTAL_COUNT = Gauge(
+CERTIFICATE_TOTAL_COUNT = SnapshotGauge(
     'huaweicloud_scm_certificate_total_count',
     'Total count of certificates in SCM',
     ['account']
 )
 
 # 证书状态指标
-CERTIFICATE_STATUS = Gauge(
+CERTIFICATE_STATUS = SnapshotGauge(
     'huaweicloud_scm_certificate_status',
     'Status of certificates in SCM (1: ISSUED, 0: others)',
-    ['account', 'certificate_id', 'domain']
+    ['account', 'certificate_id', 'domain'],
+    descriptive_labels=['domain']
 )
 
 # 证书过期时间指标 (Unix时间戳)
-CERTIFICATE_EXPIRE_TIMESTAMP = Gauge(
+CERTIFICATE_EXPIRE_TIMESTAMP = SnapshotGauge(
     'huaweicloud_scm_certificate_expire_timestamp',
     'Expire timestamp of certificates in SCM (Unix timestamp)',
-    ['account', 'certificate_id', 'domain']
+    ['account', 'certificate_id', 'domain'],
+    descriptive_labels=['domain']
 )
 
 # 证书信息指标
-CERTIFICATE_INFO = Info(
+CERTIFICATE_INFO = SnapshotInfo(
     'huaweicloud_scm_certificate',
     'Detailed information of certificates in SCM',
     ['account', 'certificate_id']
@@ -52,6 +55,8 @@ class LISTCERTIFICATESCollector(BaseCollector):
     
     def __init__(self, name, account_config, module_config=None):
         super().__init__(name, account_config, module_config)
+        # 可选的按证书类型统计的到期时间分桶（模块配置expiry_histogram）
+        self.expiry = ExpiryHistogram.from_config(self, CERTIFICATE_EXPIRE_TIMESTAMP)
         
         # 初始化华为云SCM客户端
         logger.debug(f"Initializing LISTCERTIFICATES collector for account {name}")
@@ -65,18 +70,20 @@ class LISTCERTIFICATESCollector(BaseCollector):
                 self.client = None
                 return
                 
-            credentials = GlobalCredentials(ak, sk)
-            logger.debug("GlobalCredentials created successfully")
-            
             # 使用配置中的区域或者默认区域
             region = self.region or "cn-north-4"
             logger.debug(f"Using region: {region}")
             
-            self.client = ScmClient.new_builder() \
-                .with_credentials(credentials) \
-                .with_region(ScmRegion.value_of(region)) \
-                .build()
+            # 从共享客户端工厂获取客户端，同一账号的多个模块复用同一个客户端和连接池
+            self.client = SDKClientFactory.get_client('scm', ak, sk, region)
             logger.debug("SCM client initialized successfully")
+            
+            # 需要查询的区域和企业项目，未配置时只查询默认区域和params中的企业项目
+            self.regions = self.module_config.get('regions') or [region]
+            self.enterprise_project_ids = self.module_config.get('enterprise_project_ids') or \
+                [self.params.get('enterprise_project_id')]
+            self.clients = {r: SDKClientFactory.get_client('scm', ak, sk, r) for r in self.regions}
+            logger.debug(f"Regions: {self.regions}, enterprise projects: {self.enterprise_project_ids}")
                 
         except Exception as e:
             logger.error(f"Failed to initialize SCM client for account {self.name}: {e}")
@@ -92,124 +99,185 @@ class LISTCERTIFICATESCollector(BaseCollector):
             return
             
         try:
-            # 构造请求参数
-            request = ListCertificatesRequest()
-            logger.debug("ListCertificatesRequest object created")
-            
-            # 从配置中获取请求参数
-            if self.params:
-                logger.debug(f"Applying parameters: {self.params}")
-                if 'limit' in self.params:
-                    request.limit = self.params['limit']
-                    logger.debug(f"Set limit to {request.limit}")
-                if 'offset' in self.params:
-                    request.offset = self.params['offset']
-                    logger.debug(f"Set offset to {request.offset}")
-                if 'sort_dir' in self.params:
-                    request.sort_dir = self.params['sort_dir']
-                    logger.debug(f"Set sort_dir to {request.sort_dir}")
-                if 'sort_key' in self.params:
-                    request.sort_key = self.params['sort_key']
-                    logger.debug(f"Set sort_key to {request.sort_key}")
-                if 'status' in self.params:
-                    request.status = self.params['status']
-                    logger.debug(f"Set status to {request.status}")
-                if 'enterprise_project_id' in self.params:
-                    request.enterprise_project_id = self.params['enterprise_project_id']
-                    logger.debug(f"Set enterprise_project_id to {request.enterprise_project_id}")
-                if 'deploy_support' in self.params:
-                    request.deploy_support = self.params['deploy_support']
-                    logger.debug(f"Set deploy_support to {request.deploy_support}")
-                if 'owned_by_self' in self.params:
-                    request.owned_by_self = self.params['owned_by_self']
-                    logger.debug(f"Set owned_by_self to {request.owned_by_self}")
-                if 'expired_days_since' in self.params:
-                    request.expired_days_since = self.params['expired_days_since']
-                    logger.debug(f"Set expired_days_since to {request.expired_days_since}")
-            
-            # 调用华为云API
-            logger.debug("Calling list_certificates API")
-            response = self.client.list_certificates(request)
-            logger.debug("list_certificates API call successful")
+            # 每页条数
+            limit = int(self.params.get('limit', 50))
+            # 每个 (区域, 企业项目) 组合作为一个分区，独立分页并发获取
+            partitions = [(region, enterprise_project_id)
+                          for region in self.regions
+                          for enterprise_project_id in self.enterprise_project_ids]
+            logger.debug(f"Paginating with limit {limit}, partitions: {partitions}")
             
-            # 解析响应数据
-            data = response.to_json_object()
-            logger.debug(f"Response data keys: {data.keys()}")
+            seen_ids = set()
+            fetched = 0
+            reported_total = 0
+            for partition, offset, certificates in iter_offset_pages(
+                    self._fetch_certificate_page, limit, partitions,
+                    max_workers=self.max_concurrency,
+                    operation='list_certificates'):
+                for cert in certificates:
+                    # 同一证书可能出现在多个区域或企业项目的结果中，按证书ID去重
+                    certificate_id = cert.get('id', 'unknown')
+                    if certificate_id in seen_ids:
+                        continue
+                    seen_ids.add(certificate_id)
+                    # 该页与上次成功处理的相同时只用于去重和计数，不更新指标
+                    if not certificates.unchanged:
+                        self._update_certificate_metrics(cert)
+                fetched += certificates.records
+                if offset == 0:
+                    reported_total += int(certificates.meta.get('total_count') or 0)
             
-            # 获取证书总数
-            total_count = data.get('total_count', 0)
+            # 更新证书总数指标（按证书ID去重后）
+            total_count = len(seen_ids)
             CERTIFICATE_TOTAL_COUNT.labels(account=self.name).set(total_count)
-            logger.debug(f"Total certificates count: {total_count}")
+            logger.debug(f"Total certificates count: {total_count}, fetched: {fetched}, reported: {reported_total}")
+            # 记录实际获取的证书数与各分区API返回总数之和的比例
+            report_completeness(self.module_name, self.name, 'list_certificates', fetched, reported_total)
             
-            # 解析证书列表数据并更新指标
-            certificates = data.get('certificates', [])
-            logger.debug(f"Found {len(certificates)} certificates")
-            
-            # 更新每个证书的详细指标
-            for cert in certificates:
-                certificate_id = cert.get('id', 'unknown')
-                domain = cert.get('domain', 'unknown')
-                status = cert.get('status', 'unknown')
-                expire_time = cert.get('expire_time', '')
-                
-                logger.debug(f"Processing certificate: {certificate_id}, domain: {domain}")
-                
-                # 证书状态指标 (1表示ISSUED状态，0表示其他状态)
-                status_value = 1 if status == 'ISSUED' else 0
-                CERTIFICATE_STATUS.labels(
-                    account=self.name,
-                    certificate_id=certificate_id,
-                    domain=domain
-                ).set(status_value)
-                logger.debug(f"Certificate {certificate_id} status: {status} -> {status_value}")
-                
-                # 证书过期时间戳
-                expire_timestamp = 0
-                if expire_time:
-                    try:
-                        # 将'YYYY-MM-DD HH:MM:SS.S'格式转换为时间戳
-                        dt = datetime.strptime(expire_time.split('.')[0], '%Y-%m-%d %H:%M:%S')
-                        expire_timestamp = int(time.mktime(dt.timetuple()))
-                        logger.debug(f"Certificate {certificate_id} expire time: {expire_time} -> {expire_timestamp}")
-                    except Exception as e:
-                        logger.warning(f"Failed to parse expire time for certificate {certificate_id}: {e}")
-                
-                CERTIFICATE_EXPIRE_TIMESTAMP.labels(
-                    account=self.name,
-                    certificate_id=certificate_id,
-                    domain=domain
-                ).set(expire_timestamp)
-                
-                # 证书信息指标
-                cert_info = {
-                    'name': cert.get('name', ''),
-                    'domain': cert.get('domain', ''),
-                    'sans': cert.get('sans', ''),
-                    'type': cert.get('type', ''),
-                    'signature_algorithm': cert.get('signature_algorithm', ''),
-                    'brand': cert.get('brand', ''),
-                    'domain_type': cert.get('domain_type', ''),
-                    'validity_period': str(cert.get('validity_period', '')),
-                    'status': cert.get('status', ''),
-                    'domain_count': str(cert.get('domain_count', '')),
-                    'wildcard_count': str(cert.get('wildcard_count', ''))
-                }
-                CERTIFICATE_INFO.labels(
-                    account=self.name,
-                    certificate_id=certificate_id
-                ).info(cert_info)
-                logger.debug(f"Certificate {certificate_id} info updated")
+            # 本轮更新成功完成，提交数据指纹
+            self._commit_fingerprints()
+            if self.expiry:
+                self.expiry.publish()
                 
         except exceptions.ClientRequestException as e:
             logger.error(f"Error collecting LISTCERTIFICATES metrics for account {self.name}: "
                          f"status_code={e.status_code}, request_id={e.request_id}, "
                          f"error_code={e.error_code}, error_msg={e.error_msg}")
+            SnapshotRegistry.mark_incomplete(str(e))
         except Exception as e:
             import traceback
             logger.error(f"Error collecting LISTCERTIFICATES metrics for account {self.name}: {e}")
             logger.error(f"Full traceback: {traceback.format_exc()}")
+            SnapshotRegistry.mark_incomplete(str(e))
         logger.debug(f"Completed LISTCERTIFICATES metrics collection for account {self.name}")
             
+    def _fetch_certificate_page(self, partition, offset):
+        """
+        获取一页证书数据，在分页工作线程中调用
+        
+        :param partition: (区域, 企业项目ID)
+        :param offset: 偏移量
+        :return: 该页的记录集合
+        """
+        region, enterprise_project_id = partition
+        
+        # 构造请求参数
+        request = ListCertificatesRequest()
+        
+        # 从配置中获取请求参数
+        if self.params:
+            logger.debug(f"Applying parameters: {self.params}")
+            if 'limit' in self.params:
+                request.limit = self.params['limit']
+                logger.debug(f"Set limit to {request.limit}")
+            if 'offset' in self.params:
+                request.offset = self.params['offset']
+                logger.debug(f"Set offset to {request.offset}")
+            if 'sort_dir' in self.params:
+                request.sort_dir = self.params['sort_dir']
+                logger.debug(f"Set sort_dir to {request.sort_dir}")
+            if 'sort_key' in self.params:
+                request.sort_key = self.params['sort_key']
+                logger.debug(f"Set sort_key to {request.sort_key}")
+            if 'status' in self.params:
+                request.status = self.params['status']
+                logger.debug(f"Set status to {request.status}")
+            if 'enterprise_project_id' in self.params:
+                request.enterprise_project_id = self.params['enterprise_project_id']
+                logger.debug(f"Set enterprise_project_id to {request.enterprise_project_id}")
+            if 'deploy_support' in self.params:
+                request.deploy_support = self.params['deploy_support']
+                logger.debug(f"Set deploy_support to {request.deploy_support}")
+            if 'owned_by_self' in self.params:
+                request.owned_by_self = self.params['owned_by_self']
+                logger.debug(f"Set owned_by_self to {request.owned_by_self}")
+            if 'expired_days_since' in self.params:
+                request.expired_days_since = self.params['expired_days_since']
+                logger.debug(f"Set expired_days_since to {request.expired_days_since}")
+        
+        # 分页和分区参数覆盖配置中的值
+        request.limit = int(self.params.get('limit', 50))
+        request.offset = offset
+        request.enterprise_project_id = enterprise_project_id
+        
+        logger.debug(f"Calling list_certificates API: region={region}, "
+                     f"enterprise_project_id={enterprise_project_id}, offset={offset}")
+        return self._call_sdk_records(
+            'list_certificates', request, 'certificates',
+            key=f"list_certificates:{region}:{enterprise_project_id}:{offset}",
+            client=self.clients[region]
+        )
+            
+    def _update_certificate_metrics(self, cert):
+        """
+        更新单个证书的指标
+        
+        :param cert: 证书信息字典
+        """
+        certificate_id = cert.get('id', 'unknown')
+        domain = cert.get('domain', 'unknown')
+        status = cert.get('status', 'unknown')
+        expire_time = cert.get('expire_time', '')
+        
+        logger.debug(f"Processing certificate: {certificate_id}, domain: {domain}")
+        
+        # 证书数据未变化时跳过该证书的指标更新
+        if self._record_unchanged(certificate_id, cert):
+            if self.expiry:
+                self.expiry.retain(certificate_id)
+            return
+        
+        # 证书状态指标 (1表示ISSUED状态，0表示其他状态)
+        status_value = 1 if status == 'ISSUED' else 0
+        CERTIFICATE_STATUS.labels(
+            account=self.name,
+            certificate_id=certificate_id,
+            domain=domain
+        ).set(status_value)
+        logger.debug(f"Certificate {certificate_id} status: {status} -> {status_value}")
+        
+        # 证书过期时间戳
+        expire_timestamp = 0
+        if expire_time:
+            try:
+                # 将'YYYY-MM-DD HH:MM:SS.S'格式转换为时间戳
+                dt = datetime.strptime(expire_time.split('.')[0], '%Y-%m-%d %H:%M:%S')
+                expire_timestamp = int(time.mktime(dt.timetuple()))
+                logger.debug(f"Certificate {certificate_id} expire time: {expire_time} -> {expire_timestamp}")
+            except Exception as e:
+                logger.warning(f"Failed to parse expire time for certificate {certificate_id}: {e}")
+        
+        CERTIFICATE_EXPIRE_TIMESTAMP.labels(
+            account=self.name,
+            certificate_id=certificate_id,
+            domain=domain
+        ).set(expire_timestamp)
+        if self.expiry:
+            if expire_timestamp:
+                self.expiry.observe(certificate_id, cert.get('type') or 'unknown', expire_timestamp)
+            else:
+                self.expiry.discard(certificate_id)
+        
+        # 证书信息指标
+        cert_info = {
+            'name': cert.get('name', ''),
+            'domain': cert.get('domain', ''),
+            'sans': cert.get('sans', ''),
+            'type': cert.get('type', ''),
+            'signature_algorithm': cert.get('signature_algorithm', ''),
+            'brand': cert.get('brand', ''),
+            'domain_type': cert.get('domain_type', ''),
+            'validity_period': str(cert.get('validity_period', '')),
+            'status': cert.get('status', ''),
+            'domain_count': str(cert.get('domain_count', '')),
+            'wildcard_count': str(cert.get('wildcard_count', ''))
+        }
+        CERTIFICATE_INFO.labels(
+            account=self.name,
+            certificate_id=certificate_id
+        ).info(cert_info)
+        logger.debug(f"Certificate {certificate_id} info updated")
+            
     def describe(self):
         """
         描述此收集器提供的指标
@@ -1,13 +1,19 @@
 from collectors.base_collector import BaseCollector
-from prometheus_client import Gauge, Info
+from utils.snapshot import SnapshotGauge, SnapshotRegistry
 import logging
+import math
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
+from utils.sdk_client_factory import SDKClientFactory
+from utils.json_stream import JSONRecords
+from utils.daily_series import DailySeriesStore
+from utils.cost_history import CostHistoryCache, COST_HISTORY_MONTHS_TOTAL, DEFAULT_HISTORY_PATH
+from utils.response_cache import credential_identity
+from utils.pagination import PAGINATION_PAGES_TOTAL, report_completeness
 
 # 导入华为云SDK相关模块
-from huaweicloudsdkcore.auth.credentials import GlobalCredentials
-from huaweicloudsdkbss.v2.region.bss_region import BssRegion
 from huaweicloudsdkcore.exceptions import exceptions
 from huaweicloudsdkbss.v2 import *
 
@@ -15,26 +21,32 @@ logger = logging.getLogger(__name__)
 
 # 定义模块级指标，避免重复注册
 # 成本金额指标
-COST_AMOUNT = Gauge(
+COST_AMOUNT = SnapshotGauge(
     'huaweicloud_bss_cost_amount',
     'Cost amount in BSS',
-    ['account', 'dimension_key', 'dimension_value', 'time_dimension_value', 'amount_type']
+    ['account', 'variant', 'dimension_key', 'dimension_value', 'time_dimension_value', 'amount_type']
 )
 
 # 官方成本金额指标
-OFFICIAL_COST_AMOUNT = Gauge(
+OFFICIAL_COST_AMOUNT = SnapshotGauge(
     'huaweicloud_bss_official_cost_amount',
     'Official cost amount in BSS',
-    ['account', 'dimension_key', 'dimension_value', 'time_dimension_value']
+    ['account', 'variant', 'dimension_key', 'dimension_value', 'time_dimension_value']
 )
 
 # 成本汇总信息指标
-COST_SUMMARY = Gauge(
+COST_SUMMARY = SnapshotGauge(
     'huaweicloud_bss_cost_summary',
     'Cost summary by dimension in BSS',
-    ['account', 'dimension_key', 'dimension_value', 'summary_type']
+    ['account', 'variant', 'dimension_key', 'dimension_value', 'summary_type']
 )
 
+# 每页条数，接口默认每页只返回10条
+DEFAULT_COST_PAGE_LIMIT = 1000
+
+# 批量回填时单次查询覆盖的最大月份数，更长的时间范围拆分为多次查询
+BACKFILL_QUERY_MONTHS = 12
+
 
 class LISTCOSTSCollector(BaseCollector):
     """
@@ -46,6 +58,20 @@ class LISTCOSTSCollector(BaseCollector):
     def __init__(self, name, account_config, module_config=None):
         super().__init__(name, account_config, module_config)
         
+        # 已结算月份的本地缓存，默认关闭，通过 history_cache.enabled: true 开启
+        history_config = self.module_config.get('history_cache') or {}
+        self.open_months = int(history_config.get('open_months', 2))
+        self.history = None
+        # 缓存按凭证身份区分账号，账号显示名称改变或被其他账号重用时不会读到错误的数据
+        self.history_identity = credential_identity(self.ak or os.environ.get("CLOUD_SDK_AK"))
+        # 按天粒度查询的滚动窗口，每个查询条件一个
+        self.daily_stores = {}
+        if history_config.get('enabled', False):
+            try:
+                self.history = CostHistoryCache.open(history_config.get('path', DEFAULT_HISTORY_PATH))
+            except Exception as e:
+                logger.warning(f"Failed to open cost history cache for account {name}, querying full history: {e}")
+        
         # 初始化华为云BSS客户端
         logger.debug(f"Initializing LISTCOSTS collector for account {name}")
         try:
@@ -58,17 +84,12 @@ class LISTCOSTSCollector(BaseCollector):
                 self.client = None
                 return
                 
-            credentials = GlobalCredentials(ak, sk)
-            logger.debug("GlobalCredentials created successfully")
-            
             # 使用配置中的区域或者默认区域
             region = self.region or "cn-north-1"
             logger.debug(f"Using region: {region}")
             
-            self.client = BssClient.new_builder() \
-                .with_credentials(credentials) \
-                .with_region(BssRegion.value_of(region)) \
-                .build()
+            # 从共享客户端工厂获取客户端，同一账号的多个模块复用同一个客户端和连接池
+            self.client = SDKClientFactory.get_client('bss', ak, sk, region)
             logger.debug("BSS client initialized successfully")
                 
         except Exception as e:
@@ -78,187 +99,631 @@ class LISTCOSTSCollector(BaseCollector):
     def collect(self):
         """
         收集ListCosts API指标
+        params可以是单个查询条件，也可以是查询条件列表，多个查询通过共享客户端并发执行
         """
         logger.debug(f"Starting LISTCOSTS metrics collection for account {self.name}")
         if not self.client:
             logger.warning(f"BSS client not initialized for LISTCosts collector in account {self.name}")
             return
+        
+        variants = self._query_variants()
+        logger.debug(f"Running {len(variants)} list_costs query variants: {[name for name, _ in variants]}")
+        
+        succeeded = True
+        fetched = 0
+        total_count = 0
+        # 请求在线程池中并发执行，指标、滚动窗口和本地缓存只在当前线程中按完成顺序更新
+        with ThreadPoolExecutor(max_workers=max(min(self.max_concurrency, len(variants)), 1),
+                                thread_name_prefix='listcosts') as pool:
+            futures = {}
+            for variant, params in variants:
+                try:
+                    plan = self._plan_variant(variant, params)
+                except Exception as e:
+                    succeeded = False
+                    logger.error(f"Error preparing LISTCosts query for account {self.name}, variant {variant}: {e}")
+                    SnapshotRegistry.mark_incomplete(str(e))
+                    continue
+                futures[pool.submit(self._fetch_variant, variant, params, plan)] = (variant, params, plan)
+            for future in as_completed(futures):
+                variant, params, plan = futures[future]
+                try:
+                    cost_data = future.result()
+                    if cost_data is not None:
+                        fetched += cost_data.records
+                        total_count += int(cost_data.meta.get('total_count') or 0)
+                    self._apply_variant(variant, params, plan, cost_data)
+                except exceptions.ClientRequestException as e:
+                    succeeded = False
+                    logger.error(f"Error collecting LISTCosts metrics for account {self.name}, variant {variant}: "
+                                 f"status_code={e.status_code}, request_id={e.request_id}, "
+                                 f"error_code={e.error_code}, error_msg={e.error_msg}")
+                    SnapshotRegistry.mark_incomplete(str(e))
+                except Exception as e:
+                    import traceback
+                    succeeded = False
+                    logger.error(f"Error collecting LISTCosts metrics for account {self.name}, variant {variant}: {e}")
+                    logger.error(f"Full traceback: {traceback.format_exc()}")
+                    SnapshotRegistry.mark_incomplete(str(e))
+        
+        # 记录所有查询实际获取的记录数与API返回总数的比例
+        report_completeness(self.module_name, self.name, 'list_costs', fetched, total_count)
+        
+        # 所有查询都成功完成后才提交数据指纹
+        if succeeded:
+            self._commit_fingerprints()
+        logger.debug(f"Completed LISTCOSTS metrics collection for account {self.name}")
             
-        try:
-            # 构造请求参数
-            request = ListCostsRequest()
-            logger.debug("ListCostsRequest object created")
-            
-            # 自动生成时间范围：基于当前月份的上一个月往前推12个月
-            # 例如今天是2025年9月4日，应该查询2024年8月至2025年8月的数据
-            current_date = datetime.now()
-            # 获取上一个月作为结束时间
-            end_date = current_date - relativedelta(months=1)
-            # 格式化为YYYY-MM
-            end_time = end_date.strftime("%Y-%m")
-            # 计算开始时间：往前推12个月
-            start_date = end_date - relativedelta(months=11)
-            begin_time = start_date.strftime("%Y-%m")
-            
-            logger.debug(f"Auto-generated time range: {begin_time} to {end_time}")
-            
-            # 如果配置中有参数，则使用配置中的参数
-            if self.params:
-                logger.debug(f"Applying parameters: {self.params}")
-                if 'begin_time' in self.params:
-                    begin_time = self.params['begin_time']
-                    logger.debug(f"Overriding begin_time with config value: {begin_time}")
-                if 'end_time' in self.params:
-                    end_time = self.params['end_time']
-                    logger.debug(f"Overriding end_time with config value: {end_time}")
+    def _query_variants(self):
+        """
+        解析配置中的查询条件
+        
+        :return: (查询名称, 查询参数) 列表，查询名称用作指标的variant标签
+        """
+        # 单个查询条件的variant标签为空，与未区分查询条件时的序列相同，已有的查询不受影响
+        if not isinstance(self.params, list):
+            return [('', self.params or {})]
+        params_list = self.params
+        
+        variants = []
+        seen = set()
+        for index, params in enumerate(params_list):
+            params = params or {}
+            # 未配置name时使用分组维度作为查询名称，如 charging_mode
+            name = params.get('name') or \
+                '_'.join(str(groupby.get('key', '')).lower() for groupby in params.get('groupby', [])) or \
+                'default'
+            if name in seen:
+                name = f"{name}_{index}"
+            seen.add(name)
+            variants.append((name, params))
+        return variants
             
-            # 构造时间条件
-            time_condition = TimeCondition(
-                time_measure_id=2,  # 月粒度
-                begin_time=begin_time,
-                end_time=end_time
+    def _build_request(self, params):
+        """
+        根据查询参数构造ListCosts请求
+        
+        :param params: 查询参数
+        :return: (ListCostsRequest, 查询开始月份, 查询结束月份)
+        """
+        # 构造请求参数
+        request = ListCostsRequest()
+        logger.debug("ListCostsRequest object created")
+        
+        # 自动生成时间范围：基于当前月份的上一个月往前推12个月
+        # 例如今天是2025年9月4日，应该查询2024年8月至2025年8月的数据
+        current_date = datetime.now()
+        # 获取上一个月作为结束时间
+        end_date = current_date - relativedelta(months=1)
+        # 格式化为YYYY-MM
+        end_time = end_date.strftime("%Y-%m")
+        # 计算开始时间：往前推12个月
+        start_date = end_date - relativedelta(months=11)
+        begin_time = start_date.strftime("%Y-%m")
+        
+        logger.debug(f"Auto-generated time range: {begin_time} to {end_time}")
+        
+        # 如果配置中有参数，则使用配置中的参数
+        if params:
+            logger.debug(f"Applying parameters: {params}")
+            if 'begin_time' in params:
+                begin_time = params['begin_time']
+                logger.debug(f"Overriding begin_time with config value: {begin_time}")
+            if 'end_time' in params:
+                end_time = params['end_time']
+                logger.debug(f"Overriding end_time with config value: {end_time}")
+        
+        # 构造时间条件
+        time_condition = TimeCondition(
+            time_measure_id=2,  # 月粒度
+            begin_time=begin_time,
+            end_time=end_time
+        )
+        logger.debug(f"TimeCondition created: time_measure_id=2, begin_time={begin_time}, end_time={end_time}")
+        
+        # 构造分组条件 - 默认按计费模式分组
+        groupby_list = [
+            GroupBy(
+                type="dimension",
+                key="CHARGING_MODE"
             )
-            logger.debug(f"TimeCondition created: time_measure_id=2, begin_time={begin_time}, end_time={end_time}")
-            
-            # 构造分组条件 - 默认按计费模式分组
-            groupby_list = [
-                GroupBy(
-                    type="dimension",
-                    key="CHARGING_MODE"
-                )
-            ]
-            logger.debug("Default groupby condition created: CHARGING_MODE")
+        ]
+        logger.debug("Default groupby condition created: CHARGING_MODE")
+        
+        # 构造请求体
+        request_body = ListCostsReq(
+            amount_type="NET_AMOUNT",     # 默认净额
+            cost_type="ORIGINAL_COST",    # 默认原始成本
+            groupby=groupby_list,
+            time_condition=time_condition,
+            filters=[],  # 默认无过滤条件
+            offset=0,
+            limit=int(params.get('limit', DEFAULT_COST_PAGE_LIMIT)) if params else DEFAULT_COST_PAGE_LIMIT
+        )
+        logger.debug("ListCostsReq created with default values")
+        
+        # 如果配置中有参数，则使用配置中的参数覆盖默认值
+        if params:
+            if 'amount_type' in params:
+                request_body.amount_type = params['amount_type']
+                logger.debug(f"Overriding amount_type with config value: {request_body.amount_type}")
+            if 'cost_type' in params:
+                request_body.cost_type = params['cost_type']
+                logger.debug(f"Overriding cost_type with config value: {request_body.cost_type}")
+            if 'groupby' in params:
+                # 需要将配置中的groupby参数转换为SDK对象
+                groupby_list = []
+                for groupby_item in params['groupby']:
+                    groupby_obj = GroupBy(
+                        type=groupby_item.get('type', 'dimension'),
+                        key=groupby_item.get('key')
+                    )
+                    groupby_list.append(groupby_obj)
+                    logger.debug(f"Added groupby condition: type={groupby_obj.type}, key={groupby_obj.key}")
+                request_body.groupby = groupby_list
+            if 'filters' in params:
+                request_body.filters = params['filters']
+                logger.debug(f"Overriding filters with config value: {request_body.filters}")
+        
+        request.body = request_body
+        logger.debug("Request body assigned to request")
+        return request, begin_time, end_time
             
-            # 构造请求体
-            request_body = ListCostsReq(
-                amount_type="NET_AMOUNT",     # 默认净额
-                cost_type="ORIGINAL_COST",    # 默认原始成本
-                groupby=groupby_list,
-                time_condition=time_condition,
-                filters=[]  # 默认无过滤条件
-            )
-            logger.debug("ListCostsReq created with default values")
+    def _plan_variant(self, variant, params):
+        """
+        构造一个查询条件的请求，在当前线程中调用
+        按天粒度的查询条件先删除滑出窗口的天，按月的查询条件从本地缓存确定需要查询的月份
+        
+        :param variant: 查询名称
+        :param params: 查询参数
+        :return: (ListCostsRequest, 按月查询的缓存计划或按天查询的日期列表)，请求为None时不需要调用API
+        """
+        logger.debug(f"Planning list_costs variant {variant} for account {self.name}")
+        request, begin_time, end_time = self._build_request(params)
+        
+        # 按天粒度采集时使用内存中的滚动窗口，不使用按月的本地缓存
+        if params.get('time_measure') == 'daily':
+            return request, self._plan_daily(variant, params, request)
+        
+        # 已结算月份从本地缓存读取，只查询其后的月份
+        history = self._plan_history(request.body, begin_time, end_time) if self.history else None
+        if history and not history[2]:
+            logger.debug("All months served from the cost history cache, skipping list_costs API")
+            return None, history
+        return request, history
             
-            # 如果配置中有参数，则使用配置中的参数覆盖默认值
-            if self.params:
-                if 'amount_type' in self.params:
-                    request_body.amount_type = self.params['amount_type']
-                    logger.debug(f"Overriding amount_type with config value: {request_body.amount_type}")
-                if 'cost_type' in self.params:
-                    request_body.cost_type = self.params['cost_type']
-                    logger.debug(f"Overriding cost_type with config value: {request_body.cost_type}")
-                if 'groupby' in self.params:
-                    # 需要将配置中的groupby参数转换为SDK对象
-                    groupby_list = []
-                    for groupby_item in self.params['groupby']:
-                        groupby_obj = GroupBy(
-                            type=groupby_item.get('type', 'dimension'),
-                            key=groupby_item.get('key')
-                        )
-                        groupby_list.append(groupby_obj)
-                        logger.debug(f"Added groupby condition: type={groupby_obj.type}, key={groupby_obj.key}")
-                    request_body.groupby = groupby_list
-                if 'filters' in self.params:
-                    request_body.filters = self.params['filters']
-                    logger.debug(f"Overriding filters with config value: {request_body.filters}")
+    def _fetch_variant(self, variant, params, plan):
+        """
+        调用ListCosts API，在线程池中调用，只发送请求不更新任何状态
+        
+        :param variant: 查询名称
+        :param params: 查询参数
+        :param plan: _plan_variant返回的查询计划
+        :return: 成本记录，不需要调用API时为None
+        """
+        request, _ = plan
+        if request is None:
+            return None
+        key = f"list_costs:{variant}:daily" if params.get('time_measure') == 'daily' else f"list_costs:{variant}"
+        logger.debug(f"Calling list_costs API for variant {variant}")
+        return self._fetch_costs(request, key)
             
-            request.body = request_body
-            logger.debug("Request body assigned to request")
+    def _fetch_costs(self, request, key):
+        """
+        按偏移量顺序获取ListCosts的所有分页，在线程池中调用
+        接口默认每页只返回10条，分组维度较多（如RESOURCE_TYPE）时需要翻页才能得到完整的结果
+        
+        :param request: ListCostsRequest，分页参数在此设置
+        :param key: 响应指纹标识，第一页之后的页以偏移量区分
+        :return: 所有页的成本记录集合，records为获取的记录数，meta为第一页的其他字段（含total_count）；
+                 所有页都与上次成功处理的相同时unchanged为True
+        """
+        limit = request.body.limit or DEFAULT_COST_PAGE_LIMIT
+        request.body.limit = limit
+        offset = 0
+        items = []
+        meta = None
+        unchanged = True
+        while True:
+            request.body.offset = offset
+            page = self._call_sdk_records('list_costs', request, 'cost_data',
+                                          key=key if not offset else f"{key}:{offset}")
+            # 流式响应的其他字段在迭代结束后才可用
+            items.extend(page)
+            PAGINATION_PAGES_TOTAL.labels(operation='list_costs').inc()
+            meta = page.meta if meta is None else meta
+            unchanged = unchanged and page.unchanged
+            offset += page.records
+            total_count = int(page.meta.get('total_count') or 0)
+            if page.records < limit or offset >= total_count:
+                break
+            logger.debug(f"Fetching list_costs page at offset {offset} of {total_count} for {key}")
+        return self._with_unchanged(JSONRecords({**meta, 'cost_data': items}, 'cost_data'), unchanged)
             
-            # 调用华为云API
-            logger.debug("Calling list_costs API")
-            response = self.client.list_costs(request)
-            logger.debug("list_costs API call successful")
+    def _apply_variant(self, variant, params, plan, cost_data):
+        """
+        根据一个查询条件的查询结果更新指标，在当前线程中调用
+        
+        :param variant: 查询名称
+        :param params: 查询参数
+        :param plan: _plan_variant返回的查询计划
+        :param cost_data: _fetch_variant返回的成本记录
+        """
+        if params.get('time_measure') == 'daily':
+            self._apply_daily(variant, plan[1], cost_data)
+            return
+        
+        history = plan[1]
+        if cost_data is None:
+            cost_data = self._with_unchanged(JSONRecords({'cost_data': []}, 'cost_data'))
+        
+        # 响应与上次成功处理的相同时跳过整个更新过程
+        if cost_data.unchanged:
+            return
+        
+        cost_items = self._merge_history(cost_data, *history) if history else cost_data
+        
+        cost_item_count = 0
+        # 更新每个成本数据的详细指标
+        for cost_item in cost_items:
+            cost_item_count += 1
+            dimensions = cost_item.get('dimensions', [])
+            dimension_key = 'unknown'
+            dimension_value = 'unknown'
             
-            # 解析响应数据
-            data = response.to_json_object()
-            logger.debug(f"Response data keys: {data.keys()}")
+            # 获取维度信息
+            if dimensions:
+                dimension = dimensions[0]
+                dimension_key = dimension.get('key', 'unknown')
+                dimension_value = dimension.get('value', 'unknown')
             
-            # 获取货币单位
-            currency = data.get('currency', 'CNY')
-            logger.debug(f"Currency: {currency}")
+            logger.debug(f"Processing cost item with dimension: {dimension_key} = {dimension_value}")
             
-            # 解析成本数据并更新指标
-            cost_data = data.get('cost_data', [])
-            logger.debug(f"Found {len(cost_data)} cost data items")
+            # 该维度的成本数据未变化时跳过指标更新
+            if self._record_unchanged((variant, dimension_key, dimension_value), cost_item):
+                continue
             
-            # 如果没有成本数据，也要确保指标被设置
-            if not cost_data:
-                logger.info(f"No cost data found for account {self.name}")
-                return
+            # 获取成本详情
+            costs = cost_item.get('costs', [])
+            logger.debug(f"Found {len(costs)} cost entries for this dimension")
             
-            # 更新每个成本数据的详细指标
-            for cost_item in cost_data:
-                dimensions = cost_item.get('dimensions', [])
-                dimension_key = 'unknown'
-                dimension_value = 'unknown'
-                
-                # 获取维度信息
-                if dimensions:
-                    dimension = dimensions[0]
-                    dimension_key = dimension.get('key', 'unknown')
-                    dimension_value = dimension.get('value', 'unknown')
-                
-                logger.debug(f"Processing cost item with dimension: {dimension_key} = {dimension_value}")
+            # 更新每个时间点的成本指标
+            for cost in costs:
+                time_dimension_value = cost.get('time_dimension_value', 'unknown')
+                amount = float(cost.get('amount', 0))
+                official_amount = float(cost.get('official_amount', 0))
                 
-                # 获取成本详情
-                costs = cost_item.get('costs', [])
-                logger.debug(f"Found {len(costs)} cost entries for this dimension")
+                logger.debug(f"Processing cost for time {time_dimension_value}: amount={amount}, official_amount={official_amount}")
                 
-                # 更新每个时间点的成本指标
-                for cost in costs:
-                    time_dimension_value = cost.get('time_dimension_value', 'unknown')
-                    amount = float(cost.get('amount', 0))
-                    official_amount = float(cost.get('official_amount', 0))
-                    
-                    logger.debug(f"Processing cost for time {time_dimension_value}: amount={amount}, official_amount={official_amount}")
-                    
-                    # 更新成本金额指标
-                    COST_AMOUNT.labels(
-                        account=self.name,
-                        dimension_key=dimension_key,
-                        dimension_value=dimension_value,
-                        time_dimension_value=time_dimension_value,
-                        amount_type='net_amount'
-                    ).set(amount)
-                    
-                    # 更新官方成本金额指标
-                    OFFICIAL_COST_AMOUNT.labels(
-                        account=self.name,
-                        dimension_key=dimension_key,
-                        dimension_value=dimension_value,
-                        time_dimension_value=time_dimension_value
-                    ).set(official_amount)
-                
-                # 更新成本汇总信息
-                amount_by_costs = float(cost_item.get('amount_by_costs', 0))
-                official_amount_by_costs = float(cost_item.get('official_amount_by_costs', 0))
-                
-                logger.debug(f"Cost summary: amount_by_costs={amount_by_costs}, official_amount_by_costs={official_amount_by_costs}")
-                
-                COST_SUMMARY.labels(
+                # 更新成本金额指标
+                COST_AMOUNT.labels(
                     account=self.name,
+                    variant=variant,
                     dimension_key=dimension_key,
                     dimension_value=dimension_value,
-                    summary_type='net_amount'
-                ).set(amount_by_costs)
+                    time_dimension_value=time_dimension_value,
+                    amount_type='net_amount'
+                ).set(amount)
                 
-                COST_SUMMARY.labels(
+                # 更新官方成本金额指标
+                OFFICIAL_COST_AMOUNT.labels(
                     account=self.name,
+                    variant=variant,
                     dimension_key=dimension_key,
                     dimension_value=dimension_value,
-                    summary_type='official_amount'
-                ).set(official_amount_by_costs)
-                
-        except exceptions.ClientRequestException as e:
-            logger.error(f"Error collecting LISTCosts metrics for account {self.name}: "
-                         f"status_code={e.status_code}, request_id={e.request_id}, "
-                         f"error_code={e.error_code}, error_msg={e.error_msg}")
-        except Exception as e:
-            import traceback
-            logger.error(f"Error collecting LISTCosts metrics for account {self.name}: {e}")
-            logger.error(f"Full traceback: {traceback.format_exc()}")
-        logger.debug(f"Completed LISTCOSTS metrics collection for account {self.name}")
+                    time_dimension_value=time_dimension_value
+                ).set(official_amount)
+            
+            # 更新成本汇总信息
+            amount_by_costs = float(cost_item.get('amount_by_costs', 0))
+            official_amount_by_costs = float(cost_item.get('official_amount_by_costs', 0))
+            
+            logger.debug(f"Cost summary: amount_by_costs={amount_by_costs}, official_amount_by_costs={official_amount_by_costs}")
+            
+            COST_SUMMARY.labels(
+                account=self.name,
+                variant=variant,
+                dimension_key=dimension_key,
+                dimension_value=dimension_value,
+                summary_type='net_amount'
+            ).set(amount_by_costs)
+            
+            COST_SUMMARY.labels(
+                account=self.name,
+                variant=variant,
+                dimension_key=dimension_key,
+                dimension_value=dimension_value,
+                summary_type='official_amount'
+            ).set(official_amount_by_costs)
+        
+        # 货币单位等其他字段在记录解析完成后才可用
+        currency = cost_data.meta.get('currency', 'CNY')
+        logger.debug(f"Found {cost_item_count} cost data items, currency: {currency}")
+        
+        # 如果没有成本数据，也要确保指标被设置
+        if not cost_item_count:
+            logger.info(f"No cost data found for account {self.name}, variant {variant}")
+            
+    def _plan_daily(self, variant, params, request):
+        """
+        确定按天粒度查询的时间范围
+        窗口内已获取且已结算的天保存在内存中，每次只查询新的天和最近open_days天，滑出窗口的天对应的指标会被删除
+        
+        :param variant: 查询名称
+        :param params: 查询参数
+        :param request: 已构造好分组、金额类型等条件的ListCostsRequest，查询时间范围在此设置
+        :return: 本次查询的日期列表
+        """
+        window_days = int(params.get('window_days', 30))
+        open_days = int(params.get('open_days', 3))
+        store = self.daily_stores.get(variant)
+        if store is None or store.window_days != window_days:
+            store = self.daily_stores[variant] = DailySeriesStore(window_days)
+        
+        today = datetime.now().date()
+        window_begin = today - timedelta(days=window_days - 1)
+        
+        # 删除滑出窗口的天和整个窗口都没有数据的维度对应的指标
+        evicted, dropped = store.evict(window_begin)
+        for (dimension_key, dimension_value), day in evicted:
+            self._remove_daily_series(variant, dimension_key, dimension_value, day.isoformat())
+        for dimension_key, dimension_value in dropped:
+            for summary_type in ('net_amount', 'official_amount'):
+                self._remove_series(COST_SUMMARY, self.name, variant, dimension_key, dimension_value, summary_type)
+        
+        fetch_begin = store.first_missing(window_begin, today - timedelta(days=open_days - 1))
+        request.body.time_condition = TimeCondition(
+            time_measure_id=1,  # 日粒度
+            begin_time=fetch_begin.isoformat(),
+            end_time=today.isoformat()
+        )
+        logger.debug(f"Daily window {window_begin} to {today}, querying from {fetch_begin}")
+        return [fetch_begin + timedelta(days=offset) for offset in range((today - fetch_begin).days + 1)]
+            
+    def _apply_daily(self, variant, days, cost_data):
+        """
+        将按天查询的结果写入滚动窗口并更新指标
+        
+        :param variant: 查询名称
+        :param days: _plan_daily返回的本次查询的日期列表
+        :param cost_data: 成本记录
+        """
+        # 响应与上次成功处理的相同时窗口内的数据都未变化
+        if cost_data.unchanged:
+            return
+        
+        store = self.daily_stores[variant]
+        store.reset(days)
+        for cost_item in cost_data:
+            dimensions = cost_item.get('dimensions', [])
+            dimension = dimensions[0] if dimensions else {}
+            key = (dimension.get('key', 'unknown'), dimension.get('value', 'unknown'))
+            for cost in cost_item.get('costs', []):
+                try:
+                    day = datetime.strptime(str(cost.get('time_dimension_value'))[:10], "%Y-%m-%d").date()
+                except ValueError:
+                    logger.warning(f"Unexpected daily time_dimension_value: {cost.get('time_dimension_value')}")
+                    continue
+                store.set(key, day, float(cost.get('amount', 0)), float(cost.get('official_amount', 0)))
+        
+        # 更新本次查询的天的指标，以及每个维度的窗口合计
+        for dimension_key, dimension_value in store.dimensions():
+            for day in days:
+                amount, official_amount = store.get((dimension_key, dimension_value), day)
+                if math.isnan(amount):
+                    self._remove_daily_series(variant, dimension_key, dimension_value, day.isoformat())
+                    continue
+                COST_AMOUNT.labels(
+                    account=self.name,
+                    variant=variant,
+                    dimension_key=dimension_key,
+                    dimension_value=dimension_value,
+                    time_dimension_value=day.isoformat(),
+                    amount_type='net_amount'
+                ).set(amount)
+                OFFICIAL_COST_AMOUNT.labels(
+                    account=self.name,
+                    variant=variant,
+                    dimension_key=dimension_key,
+                    dimension_value=dimension_value,
+                    time_dimension_value=day.isoformat()
+                ).set(official_amount)
+            
+            amount_total, official_amount_total = store.totals((dimension_key, dimension_value))
+            COST_SUMMARY.labels(
+                account=self.name,
+                variant=variant,
+                dimension_key=dimension_key,
+                dimension_value=dimension_value,
+                summary_type='net_amount'
+            ).set(amount_total)
+            COST_SUMMARY.labels(
+                account=self.name,
+                variant=variant,
+                dimension_key=dimension_key,
+                dimension_value=dimension_value,
+                summary_type='official_amount'
+            ).set(official_amount_total)
+        logger.debug(f"Updated {len(days)} days for {len(store.dimensions())} dimensions of variant {variant}")
+            
+    def _remove_daily_series(self, variant, dimension_key, dimension_value, day):
+        """
+        删除某一天的成本指标
+        """
+        self._remove_series(COST_AMOUNT, self.name, variant, dimension_key, dimension_value, day, 'net_amount')
+        self._remove_series(OFFICIAL_COST_AMOUNT, self.name, variant, dimension_key, dimension_value, day)
+            
+    @staticmethod
+    def _remove_series(metric, *labels):
+        """
+        删除指标的一个序列，序列不存在时忽略
+        """
+        try:
+            metric.remove(*labels)
+        except KeyError:
+            pass
+            
+    def backfill(self, begin_time, end_time):
+        """
+        批量获取一段历史时间范围内按月的成本数据，用于一次性导出，不更新指标
+        时间范围按BACKFILL_QUERY_MONTHS拆分为多次查询，所有查询条件和时间段并发执行并各自翻页获取完整，按天粒度的查询条件被忽略
+        
+        :param begin_time: 开始月份（YYYY-MM）
+        :param end_time: 结束月份（YYYY-MM）
+        :return: (variant, dimension_key, dimension_value, month, amount, official_amount) 列表
+        """
+        start = datetime.strptime(begin_time, "%Y-%m")
+        end = datetime.strptime(end_time, "%Y-%m")
+        windows = []
+        while start <= end:
+            window_end = min(start + relativedelta(months=BACKFILL_QUERY_MONTHS - 1), end)
+            windows.append((start.strftime("%Y-%m"), window_end.strftime("%Y-%m")))
+            start = window_end + relativedelta(months=1)
+        
+        tasks = [(variant, params, window) for variant, params in self._query_variants()
+                 if params.get('time_measure') != 'daily' for window in windows]
+        logger.info(f"Backfilling list_costs for account {self.name} from {begin_time} to {end_time} "
+                    f"in {len(tasks)} queries")
+        
+        def fetch(task):
+            variant, params, (window_begin, window_end) = task
+            request, _, _ = self._build_request(params)
+            request.body.time_condition.begin_time = window_begin
+            request.body.time_condition.end_time = window_end
+            cost_data = self._fetch_costs(request, f"list_costs:{variant}:backfill:{window_begin}")
+            rows = []
+            for cost_item in cost_data:
+                dimensions = cost_item.get('dimensions', [])
+                dimension = dimensions[0] if dimensions else {}
+                for cost in cost_item.get('costs', []):
+                    rows.append((
+                        variant,
+                        dimension.get('key', 'unknown'),
+                        dimension.get('value', 'unknown'),
+                        cost.get('time_dimension_value', 'unknown'),
+                        float(cost.get('amount', 0)),
+                        float(cost.get('official_amount', 0))
+                    ))
+            return rows, cost_data.records, int(cost_data.meta.get('total_count') or 0)
+        
+        with ThreadPoolExecutor(max_workers=max(min(self.max_concurrency, len(tasks)), 1),
+                                thread_name_prefix='listcosts-backfill') as pool:
+            results = list(pool.map(fetch, tasks))
+        # 记录实际获取的记录数与API返回总数的比例，不完整时记录警告
+        report_completeness(self.module_name, self.name, 'list_costs',
+                            sum(fetched for _, fetched, _ in results), sum(total for _, _, total in results))
+        return [row for rows, _, _ in results for row in rows]
+            
+    def _month_closed(self, month):
+        """
+        判断月份是否已结算，最近open_months个月（不含当月）的数据每次都重新查询
+        
+        :param month: 月份（YYYY-MM）
+        :return: 是否已结算
+        """
+        cutoff = (datetime.now().replace(day=1) - relativedelta(months=self.open_months)).strftime("%Y-%m")
+        return month < cutoff
+            
+    def _plan_history(self, request_body, begin_time, end_time):
+        """
+        根据本地缓存确定需要查询的月份，并将请求的开始时间调整为第一个需要查询的月份
+        
+        :param request_body: ListCostsReq请求体
+        :param begin_time: 查询窗口开始月份
+        :param end_time: 查询窗口结束月份
+        :return: (查询条件标识, 从缓存读取的月份列表, 需要查询的月份列表, 查询窗口开始月份)，
+                 时间格式不是按月时返回None
+        """
+        try:
+            start = datetime.strptime(begin_time, "%Y-%m")
+            end = datetime.strptime(end_time, "%Y-%m")
+        except (TypeError, ValueError):
+            logger.warning(f"Cost history cache only supports YYYY-MM time ranges, got {begin_time} to {end_time}")
+            return None
+        
+        months = []
+        while start <= end:
+            months.append(start.strftime("%Y-%m"))
+            start += relativedelta(months=1)
+        
+        query_key = CostHistoryCache.query_key(
+            request_body.amount_type,
+            request_body.cost_type,
+            [groupby.to_dict() for groupby in request_body.groupby or []],
+            request_body.filters
+        )
+        cached = self.history.cached_months(self.history_identity, query_key, [m for m in months if self._month_closed(m)])
+        
+        # 一次查询只能覆盖连续的时间范围，只有窗口开头连续缓存的月份可以跳过
+        cached_months = []
+        for month in months:
+            if month not in cached:
+                break
+            cached_months.append(month)
+        fetch_months = months[len(cached_months):]
+        
+        if fetch_months:
+            request_body.time_condition.begin_time = fetch_months[0]
+        logger.debug(f"Cost history: {len(cached_months)} months cached, querying {fetch_months}")
+        return query_key, cached_months, fetch_months, begin_time
+            
+    def _merge_history(self, cost_data, query_key, cached_months, fetch_months, begin_time):
+        """
+        保存本次查询到的已结算月份，并与缓存的月份合并为完整窗口的成本数据
+        
+        :param cost_data: 本次查询返回的成本记录
+        :param query_key: 查询条件标识
+        :param cached_months: 从缓存读取的月份列表
+        :param fetch_months: 本次查询的月份列表
+        :param begin_time: 查询窗口开始月份，更早的缓存数据会被清理
+        :return: 成本数据列表，结构与API返回的cost_data一致
+        """
+        items = []
+        fetched = {}
+        for cost_item in cost_data:
+            items.append(cost_item)
+            dimensions = cost_item.get('dimensions', [])
+            dimension = dimensions[0] if dimensions else {}
+            costs = fetched.setdefault((dimension.get('key', 'unknown'), dimension.get('value', 'unknown')), {})
+            for cost in cost_item.get('costs', []):
+                costs[cost.get('time_dimension_value', 'unknown')] = (
+                    float(cost.get('amount', 0)),
+                    float(cost.get('official_amount', 0))
+                )
+        COST_HISTORY_MONTHS_TOTAL.labels(account=self.name, source='api').inc(len(fetch_months))
+        
+        # 已结算的月份写入缓存，下次采集时不再查询
+        closed_months = [month for month in fetch_months if self._month_closed(month)]
+        if closed_months:
+            rows = [
+                (dimension_key, dimension_value, month, amount, official_amount)
+                for (dimension_key, dimension_value), costs in fetched.items()
+                for month, (amount, official_amount) in costs.items()
+                if month in closed_months
+            ]
+            self.history.store(self.history_identity, query_key, closed_months, rows, keep_from=begin_time)
+        
+        if not cached_months:
+            return items
+        
+        # 合并缓存的月份，按合并后的月度数据重新计算汇总金额
+        COST_HISTORY_MONTHS_TOTAL.labels(account=self.name, source='cache').inc(len(cached_months))
+        for dimension_key, dimension_value, month, amount, official_amount in \
+                self.history.load(self.history_identity, query_key, cached_months):
+            fetched.setdefault((dimension_key, dimension_value), {})[month] = (amount, official_amount)
+        
+        merged = []
+        for (dimension_key, dimension_value), costs in fetched.items():
+            merged.append({
+                'dimensions': [{'key': dimension_key, 'value': dimension_value}],
+                'costs': [
+                    {'time_dimension_value': month, 'amount': amount, 'official_amount': official_amount}
+                    for month, (amount, official_amount) in sorted(costs.items())
+                ],
+                'amount_by_costs': sum(amount for amount, _ in costs.values()),
+                'official_amount_by_costs': sum(official_amount for _, official_amount in costs.values())
+            })
+        return merged
             
     def describe(self):
         """
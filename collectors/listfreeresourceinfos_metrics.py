@@ -1,11 +1,12 @@
 from collectors.base_collector import BaseCollector
-from prometheus_client import Gauge, Info
+from utils.snapshot import SnapshotGauge, SnapshotInfo, SnapshotRegistry
+from utils.expiry import ExpiryHistogram
 import logging
 import os
+from utils.sdk_client_factory import SDKClientFactory
+from utils.pagination import iter_offset_pages, report_completeness
 
 # 导入华为云SDK相关模块
-from huaweicloudsdkcore.auth.credentials import GlobalCredentials
-from huaweicloudsdkbss.v2.region.bss_region import BssRegion
 from huaweicloudsdkcore.exceptions import exceptions
 from huaweicloudsdkbss.v2 import *
 
@@ -13,56 +14,60 @@ logger = logging.getLogger(__name__)
 
 # 定义模块级指标，避免重复注册
 # 免费资源包总数指标
-TOTAL_COUNT = Gauge(
+TOTAL_COUNT = SnapshotGauge(
     'huaweicloud_bss_free_resource_package_total_count',
     'Total count of free resource packages in BSS',
     ['account']
 )
 
 # 免费资源包状态指标 (0:未生效, 1:生效中, 2:已用完, 3:已失效, 4:已退订)
-PACKAGE_STATUS = Gauge(
+PACKAGE_STATUS = SnapshotGauge(
     'huaweicloud_bss_free_resource_package_status',
     'Status of free resource packages in BSS (0:not effective, 1:in effect, 2:used up, 3:expired, 4:unsubscribed)',
-    ['account', 'order_instance_id', 'product_name', 'service_type_name']
+    ['account', 'order_instance_id', 'product_name', 'service_type_name'],
+    descriptive_labels=['service_type_name']
 )
 
 # 免费资源剩余额度指标
-RESOURCE_AMOUNT = Gauge(
+RESOURCE_AMOUNT = SnapshotGauge(
     'huaweicloud_bss_free_resource_amount',
     'Remaining amount of free resources in BSS',
     ['account', 'order_instance_id', 'product_name', 'usage_type_name', 'measure_unit']
 )
 
 # 免费资源原始额度指标
-RESOURCE_ORIGINAL_AMOUNT = Gauge(
+RESOURCE_ORIGINAL_AMOUNT = SnapshotGauge(
     'huaweicloud_bss_free_resource_original_amount',
     'Original amount of free resources in BSS',
     ['account', 'order_instance_id', 'product_name', 'usage_type_name', 'measure_unit']
 )
 
 # 免费资源包生效时间指标 (Unix时间戳)
-PACKAGE_EFFECTIVE_TIME = Gauge(
+PACKAGE_EFFECTIVE_TIME = SnapshotGauge(
     'huaweicloud_bss_free_resource_package_effective_timestamp',
     'Effective timestamp of free resource packages in BSS (Unix timestamp)',
-    ['account', 'order_instance_id', 'product_name', 'service_type_name']
+    ['account', 'order_instance_id', 'product_name', 'service_type_name'],
+    descriptive_labels=['service_type_name']
 )
 
 # 免费资源包到期时间指标 (Unix时间戳)
-PACKAGE_EXPIRE_TIME = Gauge(
+PACKAGE_EXPIRE_TIME = SnapshotGauge(
     'huaweicloud_bss_free_resource_package_expire_timestamp',
     'Expire timestamp of free resource packages in BSS (Unix timestamp)',
-    ['account', 'order_instance_id', 'product_name', 'service_type_name']
+    ['account', 'order_instance_id', 'product_name', 'service_type_name'],
+    descriptive_labels=['service_type_name']
 )
 
 # 正在使用中的免费资源包到期时间指标 (Unix时间戳)
-ACTIVE_PACKAGE_EXPIRE_TIME = Gauge(
+ACTIVE_PACKAGE_EXPIRE_TIME = SnapshotGauge(
     'huaweicloud_bss_free_resource_active_package_expire_timestamp',
     'Expire timestamp of active free resource packages in BSS (Unix timestamp)',
-    ['account', 'order_instance_id', 'product_name', 'service_type_name']
+    ['account', 'order_instance_id', 'product_name', 'service_type_name'],
+    descriptive_labels=['service_type_name']
 )
 
 # 免费资源包信息指标
-PACKAGE_INFO = Info(
+PACKAGE_INFO = SnapshotInfo(
     'huaweicloud_bss_free_resource_package',
     'Detailed information of free resource packages in BSS',
     ['account', 'order_instance_id', 'product_name']
@@ -79,6 +84,12 @@ class LISTFREERESOURCEINFOSCollector(BaseCollector):
     def __init__(self, name, account_config, module_config=None):
         super().__init__(name, account_config, module_config)
         
+        # 资源包按实例ID和内容指纹比较，默认只重新处理剩余额度等内容发生变化的资源包
+        if 'skip_unchanged' not in self.module_config:
+            self.skip_unchanged = 'record'
+        # 可选的按云服务类型统计的到期时间分桶（模块配置expiry_histogram）
+        self.expiry = ExpiryHistogram.from_config(self, PACKAGE_EXPIRE_TIME)
+        
         # 初始化华为云BSS客户端
         logger.debug(f"Initializing LISTFREERESOURCEINFOS collector for account {name}")
         try:
@@ -91,17 +102,12 @@ class LISTFREERESOURCEINFOSCollector(BaseCollector):
                 self.client = None
                 return
                 
-            credentials = GlobalCredentials(ak, sk)
-            logger.debug("GlobalCredentials created successfully")
-            
             # 使用配置中的区域或者默认区域
             region = self.region or "cn-north-1"
             logger.debug(f"Using region: {region}")
             
-            self.client = BssClient.new_builder() \
-                .with_credentials(credentials) \
-                .with_region(BssRegion.value_of(region)) \
-                .build()
+            # 从共享客户端工厂获取客户端，同一账号的多个模块复用同一个客户端和连接池
+            self.client = SDKClientFactory.get_client('bss', ak, sk, region)
             logger.debug("BSS client initialized successfully")
                 
         except Exception as e:
@@ -118,171 +124,223 @@ class LISTFREERESOURCEINFOSCollector(BaseCollector):
             return
             
         try:
-            # 构造请求参数
-            request = ListFreeResourceInfosRequest()
-            logger.debug("ListFreeResourceInfosRequest object created")
-            
-            # 根据配置文件中的参数构造请求体
-            request_body = ListFreeResourceInfosReq()
-            logger.debug("ListFreeResourceInfosReq object created")
-            
-            if self.params:
-                logger.debug(f"Applying parameters: {self.params}")
-                # 添加配置文件中定义的参数
-                for key, value in self.params.items():
-                    if hasattr(request_body, key):
-                        setattr(request_body, key, value)
-                        logger.debug(f"Set {key} to {value}")
-            
-            request.body = request_body
-            logger.debug("Request body assigned to request")
+            # 每页条数
+            limit = int(self.params.get('limit', 100))
+            logger.debug(f"Paginating with limit {limit}")
             
-            # 调用华为云API
-            logger.debug("Calling list_free_resource_infos API")
-            response = self.client.list_free_resource_infos(request)
-            logger.debug("list_free_resource_infos API call successful")
-            
-            # 解析响应数据
-            data = response.to_json_object()
-            logger.debug(f"Response data keys: {data.keys()}")
-            
-            # 更新免费资源包总数指标
-            total_count = data.get('total_count', 0)
-            TOTAL_COUNT.labels(account=self.name).set(total_count)
-            logger.debug(f"Total free resource packages count: {total_count}")
+            seen_ids = set()
+            fetched = 0
+            total_count = 0
+            for _, offset, packages in iter_offset_pages(self._fetch_package_page, limit,
+                                                         max_workers=self.max_concurrency,
+                                                         operation='list_free_resource_infos'):
+                for package in packages:
+                    # 分页期间数据变化可能导致同一资源包出现在相邻两页中，按资源包实例ID去重
+                    order_instance_id = package.get('order_instance_id', 'unknown')
+                    if order_instance_id in seen_ids:
+                        continue
+                    seen_ids.add(order_instance_id)
+                    # 该页与上次成功处理的相同时不更新指标
+                    if not packages.unchanged:
+                        self._update_package_metrics(package)
+                fetched += packages.records
+                
+                # 第一页返回后即可更新免费资源包总数指标
+                if offset == 0:
+                    total_count = int(packages.meta.get('total_count') or 0)
+                    TOTAL_COUNT.labels(account=self.name).set(total_count)
+                    logger.debug(f"Total free resource packages count: {total_count}")
             
-            # 解析免费资源包列表数据并更新指标
-            free_resource_packages = data.get('free_resource_packages', [])
-            logger.debug(f"Found {len(free_resource_packages)} free resource packages")
+            logger.debug(f"Found {len(seen_ids)} free resource packages")
+            # 记录实际获取的资源包数与API返回总数的比例
+            report_completeness(self.module_name, self.name, 'list_free_resource_infos', fetched, total_count)
             
             # 如果没有免费资源包，也要确保指标被设置
-            if not free_resource_packages:
+            if not seen_ids:
                 logger.info(f"No free resource packages found for account {self.name}")
-                return
             
-            # 更新每个免费资源包的详细指标
-            for package in free_resource_packages:
-                order_instance_id = package.get('order_instance_id', 'unknown')
-                product_name = package.get('product_name', 'unknown')
-                service_type_name = package.get('service_type_name', 'unknown')
-                
-                logger.debug(f"Processing free resource package: {order_instance_id}, product: {product_name}")
-                
-                # 免费资源包状态指标
-                status = package.get('status', 0)
-                PACKAGE_STATUS.labels(
-                    account=self.name,
-                    order_instance_id=order_instance_id,
-                    product_name=product_name,
-                    service_type_name=service_type_name
-                ).set(status)
-                logger.debug(f"Package {order_instance_id} status: {status}")
-                
-                # 免费资源包信息指标
-                package_info = {
-                    'order_id': package.get('order_id', '') or '',
-                    'product_id': package.get('product_id', '') or '',
-                    'service_type_code': package.get('service_type_code', '') or '',
-                    'region_code': package.get('region_code', '') or '',
-                    'source_type': str(package.get('source_type', '')) or '',
-                    'bundle_type': package.get('bundle_type', '') or '',
-                    'quota_reuse_mode': str(package.get('quota_reuse_mode', '')) or ''
-                }
-                PACKAGE_INFO.labels(
-                    account=self.name,
-                    order_instance_id=order_instance_id,
-                    product_name=product_name
-                ).info(package_info)
-                logger.debug(f"Package {order_instance_id} info updated")
-                
-                # 免费资源包生效时间指标 (转换为Unix时间戳)
-                effective_time_str = package.get('effective_time')
-                if effective_time_str:
-                    effective_timestamp = self._convert_to_timestamp(effective_time_str)
-                    if effective_timestamp is not None:
-                        PACKAGE_EFFECTIVE_TIME.labels(
-                            account=self.name,
-                            order_instance_id=order_instance_id,
-                            product_name=product_name,
-                            service_type_name=service_type_name
-                        ).set(effective_timestamp)
-                        logger.debug(f"Package {order_instance_id} effective time: {effective_time_str} -> {effective_timestamp}")
-                
-                # 免费资源包到期时间指标 (转换为Unix时间戳)
-                expire_time_str = package.get('expire_time')
-                if expire_time_str:
-                    expire_timestamp = self._convert_to_timestamp(expire_time_str)
-                    if expire_timestamp is not None:
-                        PACKAGE_EXPIRE_TIME.labels(
-                            account=self.name,
-                            order_instance_id=order_instance_id,
-                            product_name=product_name,
-                            service_type_name=service_type_name
-                        ).set(expire_timestamp)
-                        logger.debug(f"Package {order_instance_id} expire time: {expire_time_str} -> {expire_timestamp}")
-                        
-                        # 如果资源包状态为生效中(status=1)，则也更新正在使用中的资源包到期时间指标
-                        if status == 1:
-                            ACTIVE_PACKAGE_EXPIRE_TIME.labels(
-                                account=self.name,
-                                order_instance_id=order_instance_id,
-                                product_name=product_name,
-                                service_type_name=service_type_name
-                            ).set(expire_timestamp)
-                            logger.debug(f"Active package {order_instance_id} expire time: {expire_time_str} -> {expire_timestamp}")
-                
-                # 解析资源套餐内的资源项信息并更新指标
-                free_resources = package.get('free_resources', [])
-                logger.debug(f"Package {order_instance_id} contains {len(free_resources)} free resources")
-                
-                for resource in free_resources:
-                    usage_type_name = resource.get('usage_type_name', 'unknown')
-                    measure_id = resource.get('measure_id', 0)
-                    # 将测量单位ID转换为可读单位
-                    measure_unit = self._get_measure_unit(measure_id)
-                    
-                    logger.debug(f"Processing free resource: {usage_type_name}, measure_id: {measure_id}, unit: {measure_unit}")
-                    
-                    # 免费资源剩余额度指标
-                    amount_str = resource.get('amount', '0')
-                    try:
-                        amount = float(amount_str)
-                    except (ValueError, TypeError):
-                        amount = 0.0
-                    RESOURCE_AMOUNT.labels(
-                        account=self.name,
-                        order_instance_id=order_instance_id,
-                        product_name=product_name,
-                        usage_type_name=usage_type_name,
-                        measure_unit=measure_unit
-                    ).set(amount)
-                    logger.debug(f"Resource {usage_type_name} amount: {amount}")
-                    
-                    # 免费资源原始额度指标
-                    original_amount_str = resource.get('original_amount', '0')
-                    try:
-                        original_amount = float(original_amount_str)
-                    except (ValueError, TypeError):
-                        original_amount = 0.0
-                    RESOURCE_ORIGINAL_AMOUNT.labels(
-                        account=self.name,
-                        order_instance_id=order_instance_id,
-                        product_name=product_name,
-                        usage_type_name=usage_type_name,
-                        measure_unit=measure_unit
-                    ).set(original_amount)
-                    logger.debug(f"Resource {usage_type_name} original amount: {original_amount}")
+            # 本轮更新成功完成，提交数据指纹
+            self._commit_fingerprints()
+            if self.expiry:
+                self.expiry.publish()
                 
         except exceptions.ClientRequestException as e:
             logger.error(f"Error collecting LISTFREERESOURCEINFOS metrics for account {self.name}: "
                          f"status_code={e.status_code}, request_id={e.request_id}, "
                          f"error_code={e.error_code}, error_msg={e.error_msg}")
+            SnapshotRegistry.mark_incomplete(str(e))
         except Exception as e:
             import traceback
             logger.error(f"Error collecting LISTFREERESOURCEINFOS metrics for account {self.name}: {e}")
             logger.error(f"Full traceback: {traceback.format_exc()}")
+            SnapshotRegistry.mark_incomplete(str(e))
         logger.debug(f"Completed LISTFREERESOURCEINFOS metrics collection for account {self.name}")
             
+    def _fetch_package_page(self, partition, offset):
+        """
+        获取一页免费资源包数据，在分页工作线程中调用
+        
+        :param partition: 分区，免费资源包查询不分区，始终为None
+        :param offset: 偏移量
+        :return: 该页的记录集合
+        """
+        # 构造请求参数
+        request = ListFreeResourceInfosRequest()
+        
+        # 根据配置文件中的参数构造请求体
+        request_body = ListFreeResourceInfosReq()
+        if self.params:
+            # 添加配置文件中定义的参数
+            for key, value in self.params.items():
+                if hasattr(request_body, key):
+                    setattr(request_body, key, value)
+        
+        # 分页参数覆盖配置中的值
+        request_body.limit = int(self.params.get('limit', 100))
+        request_body.offset = offset
+        request.body = request_body
+        
+        logger.debug(f"Calling list_free_resource_infos API with offset={offset}, limit={request_body.limit}")
+        return self._call_sdk_records(
+            'list_free_resource_infos', request, 'free_resource_packages',
+            key=f"list_free_resource_infos:{offset}"
+        )
+            
+    def _update_package_metrics(self, package):
+        """
+        更新单个免费资源包及其资源项的指标
+        
+        :param package: 免费资源包信息字典
+        """
+        order_instance_id = package.get('order_instance_id', 'unknown')
+        product_name = package.get('product_name', 'unknown')
+        service_type_name = package.get('service_type_name', 'unknown')
+        
+        logger.debug(f"Processing free resource package: {order_instance_id}, product: {product_name}")
+        
+        # 资源包数据未变化时跳过该资源包的指标更新
+        if self._record_unchanged(order_instance_id, package):
+            if self.expiry:
+                self.expiry.retain(order_instance_id)
+            return
+        
+        # 免费资源包状态指标
+        status = package.get('status', 0)
+        if self._metric_enabled(PACKAGE_STATUS):
+            PACKAGE_STATUS.labels(
+                account=self.name,
+                order_instance_id=order_instance_id,
+                product_name=product_name,
+                service_type_name=service_type_name
+            ).set(status)
+            logger.debug(f"Package {order_instance_id} status: {status}")
+        
+        # 免费资源包信息指标
+        if self._metric_enabled(PACKAGE_INFO):
+            package_info = {
+                'order_id': package.get('order_id', '') or '',
+                'product_id': package.get('product_id', '') or '',
+                'service_type_code': package.get('service_type_code', '') or '',
+                'region_code': package.get('region_code', '') or '',
+                'source_type': str(package.get('source_type', '')) or '',
+                'bundle_type': package.get('bundle_type', '') or '',
+                'quota_reuse_mode': str(package.get('quota_reuse_mode', '')) or ''
+            }
+            PACKAGE_INFO.labels(
+                account=self.name,
+                order_instance_id=order_instance_id,
+                product_name=product_name
+            ).info(package_info)
+            logger.debug(f"Package {order_instance_id} info updated")
+        
+        # 免费资源包生效时间指标 (转换为Unix时间戳)
+        if self._metric_enabled(PACKAGE_EFFECTIVE_TIME):
+            effective_time_str = package.get('effective_time')
+            if effective_time_str:
+                effective_timestamp = self._convert_to_timestamp(effective_time_str)
+                if effective_timestamp is not None:
+                    PACKAGE_EFFECTIVE_TIME.labels(
+                        account=self.name,
+                        order_instance_id=order_instance_id,
+                        product_name=product_name,
+                        service_type_name=service_type_name
+                    ).set(effective_timestamp)
+                    logger.debug(f"Package {order_instance_id} effective time: {effective_time_str} -> {effective_timestamp}")
+        
+        # 免费资源包到期时间指标 (转换为Unix时间戳)
+        if self._metric_enabled(PACKAGE_EXPIRE_TIME) or self._metric_enabled(ACTIVE_PACKAGE_EXPIRE_TIME) or self.expiry:
+            expire_time_str = package.get('expire_time')
+            expire_timestamp = None
+            if expire_time_str:
+                expire_timestamp = self._convert_to_timestamp(expire_time_str)
+                if expire_timestamp is not None:
+                    PACKAGE_EXPIRE_TIME.labels(
+                        account=self.name,
+                        order_instance_id=order_instance_id,
+                        product_name=product_name,
+                        service_type_name=service_type_name
+                    ).set(expire_timestamp)
+                    logger.debug(f"Package {order_instance_id} expire time: {expire_time_str} -> {expire_timestamp}")
+                    
+                    # 如果资源包状态为生效中(status=1)，则也更新正在使用中的资源包到期时间指标
+                    if status == 1:
+                        ACTIVE_PACKAGE_EXPIRE_TIME.labels(
+                            account=self.name,
+                            order_instance_id=order_instance_id,
+                            product_name=product_name,
+                            service_type_name=service_type_name
+                        ).set(expire_timestamp)
+                        logger.debug(f"Active package {order_instance_id} expire time: {expire_time_str} -> {expire_timestamp}")
+            if self.expiry:
+                if expire_timestamp is not None:
+                    self.expiry.observe(order_instance_id, service_type_name, expire_timestamp)
+                else:
+                    self.expiry.discard(order_instance_id)
+        
+        # 解析资源套餐内的资源项信息并更新指标
+        free_resources = package.get('free_resources', [])
+        logger.debug(f"Package {order_instance_id} contains {len(free_resources)} free resources")
+        
+        for resource in free_resources:
+            usage_type_name = resource.get('usage_type_name', 'unknown')
+            measure_id = resource.get('measure_id', 0)
+            # 将测量单位ID转换为可读单位
+            measure_unit = self._get_measure_unit(measure_id)
+            
+            logger.debug(f"Processing free resource: {usage_type_name}, measure_id: {measure_id}, unit: {measure_unit}")
+            
+            # 免费资源剩余额度指标
+            if self._metric_enabled(RESOURCE_AMOUNT):
+                amount_str = resource.get('amount', '0')
+                try:
+                    amount = float(amount_str)
+                except (ValueError, TypeError):
+                    amount = 0.0
+                RESOURCE_AMOUNT.labels(
+                    account=self.name,
+                    order_instance_id=order_instance_id,
+                    product_name=product_name,
+                    usage_type_name=usage_type_name,
+                    measure_unit=measure_unit
+                ).set(amount)
+                logger.debug(f"Resource {usage_type_name} amount: {amount}")
+            
+            # 免费资源原始额度指标
+            if self._metric_enabled(RESOURCE_ORIGINAL_AMOUNT):
+                original_amount_str = resource.get('original_amount', '0')
+                try:
+                    original_amount = float(original_amount_str)
+                except (ValueError, TypeError):
+                    original_amount = 0.0
+                RESOURCE_ORIGINAL_AMOUNT.labels(
+                    account=self.name,
+                    order_instance_id=order_instance_id,
+                    product_name=product_name,
+                    usage_type_name=usage_type_name,
+                    measure_unit=measure_unit
+                ).set(original_amount)
+                logger.debug(f"Resource {usage_type_name} original amount: {original_amount}")
+            
     def _convert_to_timestamp(self, time_str):
         """
         将ISO时间字符串转换为Unix时间戳
@@ -1,11 +1,12 @@
 from collectors.base_collector import BaseCollector
-from prometheus_client import Gauge, Info
+from utils.snapshot import SnapshotGauge, SnapshotInfo, ChildCache, SnapshotRegistry
+from utils.expiry import ExpiryHistogram
 import logging
 import os
+from utils.sdk_client_factory import SDKClientFactory
+from utils.pagination import iter_offset_pages, report_completeness
 
 # 导入华为云SDK相关模块
-from huaweicloudsdkcore.auth.credentials import GlobalCredentials
-from huaweicloudsdkbss.v2.region.bss_region import BssRegion
 from huaweicloudsdkcore.exceptions import exceptions
 from huaweicloudsdkbss.v2 import *
 
@@ -13,52 +14,58 @@ logger = logging.getLogger(__name__)
 
 # 定义模块级指标，避免重复注册
 # 资源总数指标
-RESOURCE_TOTAL_COUNT = Gauge(
+RESOURCE_TOTAL_COUNT = SnapshotGauge(
     'huaweicloud_bss_resource_total_count',
     'Total count of pay-per-use resources in BSS',
     ['account']
 )
 
 # 资源状态指标 (1 for active, 0 for inactive)
-RESOURCE_STATUS = Gauge(
+RESOURCE_STATUS = SnapshotGauge(
     'huaweicloud_bss_resource_status',
     'Status of pay-per-use resources in BSS (1 for active, 0 for inactive)',
-    ['account', 'region', 'resource_id', 'resource_name', 'service_type_name', 'resource_type_name']
+    ['account', 'region', 'resource_id', 'resource_name', 'service_type_name', 'resource_type_name'],
+    descriptive_labels=['resource_name', 'service_type_name', 'resource_type_name']
 )
 
 # 资源规格大小指标
-RESOURCE_SPEC_SIZE = Gauge(
+RESOURCE_SPEC_SIZE = SnapshotGauge(
     'huaweicloud_bss_resource_spec_size',
     'Specification size of pay-per-use resources in BSS',
-    ['account', 'region', 'resource_id', 'resource_name', 'service_type_name', 'resource_type_name', 'spec_unit']
+    ['account', 'region', 'resource_id', 'resource_name', 'service_type_name', 'resource_type_name', 'spec_unit'],
+    descriptive_labels=['resource_name', 'service_type_name', 'resource_type_name']
 )
 
 # 资源到期时间指标 (Unix时间戳)
-RESOURCE_EXPIRE_TIME = Gauge(
+RESOURCE_EXPIRE_TIME = SnapshotGauge(
     'huaweicloud_bss_resource_expire_timestamp',
     'Expire timestamp of pay-per-use resources in BSS (Unix timestamp)',
-    ['account', 'region', 'resource_id', 'resource_name', 'service_type_name', 'resource_type_name']
+    ['account', 'region', 'resource_id', 'resource_name', 'service_type_name', 'resource_type_name'],
+    descriptive_labels=['resource_name', 'service_type_name', 'resource_type_name']
 )
 
 # 资源生效时间指标 (Unix时间戳)
-RESOURCE_EFFECTIVE_TIME = Gauge(
+RESOURCE_EFFECTIVE_TIME = SnapshotGauge(
     'huaweicloud_bss_resource_effective_timestamp',
     'Effective timestamp of pay-per-use resources in BSS (Unix timestamp)',
-    ['account', 'region', 'resource_id', 'resource_name', 'service_type_name', 'resource_type_name']
+    ['account', 'region', 'resource_id', 'resource_name', 'service_type_name', 'resource_type_name'],
+    descriptive_labels=['resource_name', 'service_type_name', 'resource_type_name']
 )
 
 # 资源是否为主资源指标
-RESOURCE_IS_MAIN = Gauge(
+RESOURCE_IS_MAIN = SnapshotGauge(
     'huaweicloud_bss_resource_is_main',
     'Whether the resource is main resource in BSS (1 for main, 0 for sub)',
-    ['account', 'region', 'resource_id', 'resource_name', 'service_type_name', 'resource_type_name']
+    ['account', 'region', 'resource_id', 'resource_name', 'service_type_name', 'resource_type_name'],
+    descriptive_labels=['resource_name', 'service_type_name', 'resource_type_name']
 )
 
 # 资源信息指标
-RESOURCE_INFO = Info(
+RESOURCE_INFO = SnapshotInfo(
     'huaweicloud_bss_resource',
     'Detailed information of pay-per-use resources in BSS',
-    ['account', 'region', 'resource_id', 'resource_name']
+    ['account', 'region', 'resource_id', 'resource_name'],
+    descriptive_labels=['resource_name']
 )
 
 
@@ -72,6 +79,11 @@ class LISTPAYPERUSECUSTOMERRESOURCESCollector(BaseCollector):
     def __init__(self, name, account_config, module_config=None):
         super().__init__(name, account_config, module_config)
         
+        # 按资源ID缓存绑定好标签的子指标，资源较多时避免每条记录重复处理标签
+        self._children = ChildCache(self._bind_resource_children)
+        # 可选的按云服务类型统计的到期时间分桶（模块配置expiry_histogram）
+        self.expiry = ExpiryHistogram.from_config(self, RESOURCE_EXPIRE_TIME)
+        
         # 初始化华为云BSS客户端
         logger.debug(f"Initializing LISTPAYPERUSECUSTOMERRESOURCES collector for account {name}")
         try:
@@ -84,17 +96,12 @@ class LISTPAYPERUSECUSTOMERRESOURCESCollector(BaseCollector):
                 self.client = None
                 return
                 
-            credentials = GlobalCredentials(ak, sk)
-            logger.debug("GlobalCredentials created successfully")
-            
             # 使用配置中的区域或者默认区域
             region = self.region or "cn-north-1"
             logger.debug(f"Using region: {region}")
             
-            self.client = BssClient.new_builder() \
-                .with_credentials(credentials) \
-                .with_region(BssRegion.value_of(region)) \
-                .build()
+            # 从共享客户端工厂获取客户端，同一账号的多个模块复用同一个客户端和连接池
+            self.client = SDKClientFactory.get_client('bss', ak, sk, region)
             logger.debug("BSS client initialized successfully")
                 
         except Exception as e:
@@ -111,171 +118,196 @@ class LISTPAYPERUSECUSTOMERRESOURCESCollector(BaseCollector):
             return
             
         try:
-            # 构造请求参数
-            request = ListPayPerUseCustomerResourcesRequest()
-            logger.debug("ListPayPerUseCustomerResourcesRequest object created")
-            
-            # 根据配置文件中的参数构造请求体
-            request_body = QueryResourcesReq()
-            logger.debug("QueryResourcesReq object created")
-            
-            if self.params:
-                logger.debug(f"Applying parameters: {self.params}")
-                # 添加配置文件中定义的参数
-                for key, value in self.params.items():
-                    if hasattr(request_body, key):
-                        setattr(request_body, key, value)
-                        logger.debug(f"Set {key} to {value}")
-            
-            request.body = request_body
-            logger.debug("Request body assigned to request")
+            # 每页条数，接口单页最多返回500条
+            limit = int(self.params.get('limit', 500))
+            # 可选的分区条件，每个分区独立分页并发获取，如按service_type_code拆分
+            partitions = self.module_config.get('partitions') or [None]
+            logger.debug(f"Paginating with limit {limit}, partitions: {partitions}")
             
-            # 调用华为云API
-            logger.debug("Calling list_pay_per_use_customer_resources API")
-            response = self.client.list_pay_per_use_customer_resources(request)
-            logger.debug("list_pay_per_use_customer_resources API call successful")
-            
-            # 解析响应数据
-            data = response.to_json_object()
-            logger.debug(f"Response data keys: {data.keys()}")
+            total_count = 0
+            resource_count = 0
+            # 第一页返回总数后并发获取剩余页，每页在当前线程中逐条更新指标
+            for partition, offset, resource_list in iter_offset_pages(
+                    self._fetch_resource_page, limit, partitions,
+                    max_workers=self.max_concurrency,
+                    operation='list_pay_per_use_customer_resources'):
+                # 该页与上次成功处理的相同时跳过该页的更新
+                if not resource_list.unchanged:
+                    for resource in resource_list:
+                        self._update_resource_metrics(resource)
+                resource_count += resource_list.records
+                if offset == 0:
+                    total_count += int(resource_list.meta.get('total_count') or 0)
             
             # 更新资源总数指标
-            total_count = data.get('total_count', 0)
             RESOURCE_TOTAL_COUNT.labels(account=self.name).set(total_count)
-            logger.debug(f"Total pay-per-use resources count: {total_count}")
-            
-            # 解析资源列表数据并更新指标
-            resource_list = data.get('data', [])
-            logger.debug(f"Found {len(resource_list)} pay-per-use resources")
+            logger.debug(f"Total pay-per-use resources count: {total_count}, fetched: {resource_count}")
+            # 记录实际获取的资源数与API返回总数的比例
+            report_completeness(self.module_name, self.name, 'list_pay_per_use_customer_resources',
+                                resource_count, total_count)
             
             # 如果没有资源，也要确保指标被设置
-            if not resource_list:
+            if not resource_count:
                 logger.info(f"No pay-per-use resources found for account {self.name}")
-                return
             
-            # 更新每个资源的详细指标
-            for resource in resource_list:
-                resource_id = resource.get('resource_id', 'unknown')
-                resource_name = resource.get('resource_name', 'unknown')
-                region = resource.get('region_code', 'unknown')
-                service_type_name = resource.get('service_type_name', 'unknown')
-                resource_type_name = resource.get('resource_type_name', 'unknown')
-                
-                logger.debug(f"Processing resource: {resource_id}, name: {resource_name}")
-                
-                # 资源状态指标 (将API状态码转换为0/1状态)
-                # API状态码: 2：使用中 3：已关闭 4：已冻结 5：已过期
-                status = resource.get('status', 0)
-                # 确保status不是None
-                if status is None:
-                    status = 0
-                status_value = 1 if status == 2 else 0  # 只有状态2(使用中)为1，其他为0
-                RESOURCE_STATUS.labels(
-                    account=self.name,
-                    region=region,
-                    resource_id=resource_id,
-                    resource_name=resource_name,
-                    service_type_name=service_type_name,
-                    resource_type_name=resource_type_name
-                ).set(status_value)
-                logger.debug(f"Resource {resource_id} status: {status} -> {status_value}")
-                
-                # 资源规格大小指标
-                spec_size = resource.get('spec_size', 0)
-                # 确保spec_size不是None
-                if spec_size is None:
-                    spec_size = 0
-                spec_unit_id = resource.get('spec_size_measure_id', 'unknown')
-                # 确保spec_unit_id不是None
-                if spec_unit_id is None:
-                    spec_unit_id = 'unknown'
-                # 将测量单位ID转换为可读单位
-                spec_unit = self._get_spec_unit(spec_unit_id)
-                RESOURCE_SPEC_SIZE.labels(
-                    account=self.name,
-                    region=region,
-                    resource_id=resource_id,
-                    resource_name=resource_name,
-                    service_type_name=service_type_name,
-                    resource_type_name=resource_type_name,
-                    spec_unit=spec_unit
-                ).set(spec_size)
-                logger.debug(f"Resource {resource_id} spec size: {spec_size} {spec_unit}")
-                
-                # 资源信息指标
-                resource_info = {
-                    'id': resource.get('id', '') or '',
-                    'service_type_name': resource.get('service_type_name', '') or '',
-                    'resource_type_name': resource.get('resource_type_name', '') or '',
-                    'product_spec_desc': resource.get('product_spec_desc', '') or '',
-                    'project_id': resource.get('project_id', '') or '',
-                    'parent_resource_id': resource.get('parent_resource_id', '') or '',
-                    'enterprise_project_id': resource.get('enterprise_project', {}).get('id', '') or '' if resource.get('enterprise_project') is not None else '',
-                    'enterprise_project_name': resource.get('enterprise_project', {}).get('name', '') or '' if resource.get('enterprise_project') is not None else ''
-                }
-                RESOURCE_INFO.labels(
-                    account=self.name,
-                    region=region,
-                    resource_id=resource_id,
-                    resource_name=resource_name
-                ).info(resource_info)
-                logger.debug(f"Resource {resource_id} info updated")
-                
-                # 资源到期时间指标 (转换为Unix时间戳)
-                expire_time_str = resource.get('expire_time')
-                if expire_time_str:
-                    expire_timestamp = self._convert_to_timestamp(expire_time_str)
-                    if expire_timestamp is not None:
-                        RESOURCE_EXPIRE_TIME.labels(
-                            account=self.name,
-                            region=region,
-                            resource_id=resource_id,
-                            resource_name=resource_name,
-                            service_type_name=service_type_name,
-                            resource_type_name=resource_type_name
-                        ).set(expire_timestamp)
-                        logger.debug(f"Resource {resource_id} expire time: {expire_time_str} -> {expire_timestamp}")
-                
-                # 资源生效时间指标 (转换为Unix时间戳)
-                effective_time_str = resource.get('effective_time')
-                if effective_time_str:
-                    effective_timestamp = self._convert_to_timestamp(effective_time_str)
-                    if effective_timestamp is not None:
-                        RESOURCE_EFFECTIVE_TIME.labels(
-                            account=self.name,
-                            region=region,
-                            resource_id=resource_id,
-                            resource_name=resource_name,
-                            service_type_name=service_type_name,
-                            resource_type_name=resource_type_name
-                        ).set(effective_timestamp)
-                        logger.debug(f"Resource {resource_id} effective time: {effective_time_str} -> {effective_timestamp}")
-                
-                # 资源是否为主资源指标
-                is_main_resource = resource.get('is_main_resource', 0)
-                # 确保is_main_resource不是None
-                if is_main_resource is None:
-                    is_main_resource = 0
-                RESOURCE_IS_MAIN.labels(
-                    account=self.name,
-                    region=region,
-                    resource_id=resource_id,
-                    resource_name=resource_name,
-                    service_type_name=service_type_name,
-                    resource_type_name=resource_type_name
-                ).set(is_main_resource)
-                logger.debug(f"Resource {resource_id} is main resource: {is_main_resource}")
+            # 本轮更新成功完成，提交数据指纹，并清理已不存在的资源的子指标缓存
+            self._commit_fingerprints()
+            self._children.prune()
+            if self.expiry:
+                self.expiry.publish()
                 
         except exceptions.ClientRequestException as e:
             logger.error(f"Error collecting LISTPAYPERUSECUSTOMERRESOURCES metrics for account {self.name}: "
                          f"status_code={e.status_code}, request_id={e.request_id}, "
                          f"error_code={e.error_code}, error_msg={e.error_msg}")
+            SnapshotRegistry.mark_incomplete(str(e))
         except Exception as e:
             import traceback
             logger.error(f"Error collecting LISTPAYPERUSECUSTOMERRESOURCES metrics for account {self.name}: {e}")
             logger.error(f"Full traceback: {traceback.format_exc()}")
+            SnapshotRegistry.mark_incomplete(str(e))
         logger.debug(f"Completed LISTPAYPERUSECUSTOMERRESOURCES metrics collection for account {self.name}")
             
+    def _fetch_resource_page(self, partition, offset):
+        """
+        获取一页资源数据，在分页工作线程中调用
+        
+        :param partition: 分区条件字典，会覆盖params中的同名参数
+        :param offset: 偏移量
+        :return: 该页的记录集合
+        """
+        request = ListPayPerUseCustomerResourcesRequest()
+        
+        # 根据配置文件中的参数构造请求体
+        request_body = QueryResourcesReq()
+        params = dict(self.params)
+        params.update(partition or {})
+        for key, value in params.items():
+            if hasattr(request_body, key):
+                setattr(request_body, key, value)
+        request_body.offset = offset
+        request_body.limit = int(self.params.get('limit', 500))
+        request.body = request_body
+        
+        logger.debug(f"Calling list_pay_per_use_customer_resources API: partition={partition}, offset={offset}")
+        return self._call_sdk_records(
+            'list_pay_per_use_customer_resources', request, 'data',
+            key=f"list_pay_per_use_customer_resources:{partition}:{offset}"
+        )
+            
+    def _update_resource_metrics(self, resource):
+        """
+        更新单个资源的指标
+        
+        :param resource: 资源信息字典
+        """
+        resource_id = resource.get('resource_id', 'unknown')
+        resource_name = resource.get('resource_name', 'unknown')
+        region = resource.get('region_code', 'unknown')
+        service_type_name = resource.get('service_type_name', 'unknown')
+        resource_type_name = resource.get('resource_type_name', 'unknown')
+        
+        logger.debug(f"Processing resource: {resource_id}, name: {resource_name}")
+        
+        # 资源数据未变化时跳过该资源的指标更新
+        if self._record_unchanged(resource_id, resource):
+            if self.expiry:
+                self.expiry.retain(resource_id)
+            return
+        
+        # 将测量单位ID转换为可读单位
+        spec_unit_id = resource.get('spec_size_measure_id', 'unknown')
+        # 确保spec_unit_id不是None
+        if spec_unit_id is None:
+            spec_unit_id = 'unknown'
+        spec_unit = self._get_spec_unit(spec_unit_id)
+        status_child, spec_size_child, info_child, expire_child, effective_child, is_main_child = self._children.get(
+            resource_id, (region, resource_name, service_type_name, resource_type_name, spec_unit)
+        )
+        
+        # 资源状态指标 (将API状态码转换为0/1状态)
+        # API状态码: 2：使用中 3：已关闭 4：已冻结 5：已过期
+        if self._metric_enabled(RESOURCE_STATUS):
+            status = resource.get('status', 0)
+            # 确保status不是None
+            if status is None:
+                status = 0
+            status_value = 1 if status == 2 else 0  # 只有状态2(使用中)为1，其他为0
+            status_child.set(status_value)
+            logger.debug(f"Resource {resource_id} status: {status} -> {status_value}")
+        
+        # 资源规格大小指标
+        if self._metric_enabled(RESOURCE_SPEC_SIZE):
+            spec_size = resource.get('spec_size', 0)
+            # 确保spec_size不是None
+            if spec_size is None:
+                spec_size = 0
+            spec_size_child.set(spec_size)
+            logger.debug(f"Resource {resource_id} spec size: {spec_size} {spec_unit}")
+        
+        # 资源信息指标
+        if self._metric_enabled(RESOURCE_INFO):
+            resource_info = {
+                'id': resource.get('id', '') or '',
+                'service_type_name': resource.get('service_type_name', '') or '',
+                'resource_type_name': resource.get('resource_type_name', '') or '',
+                'product_spec_desc': resource.get('product_spec_desc', '') or '',
+                'project_id': resource.get('project_id', '') or '',
+                'parent_resource_id': resource.get('parent_resource_id', '') or '',
+                'enterprise_project_id': resource.get('enterprise_project', {}).get('id', '') or '' if resource.get('enterprise_project') is not None else '',
+                'enterprise_project_name': resource.get('enterprise_project', {}).get('name', '') or '' if resource.get('enterprise_project') is not None else ''
+            }
+            info_child.info(resource_info)
+            logger.debug(f"Resource {resource_id} info updated")
+        
+        # 资源到期时间指标 (转换为Unix时间戳)
+        if self._metric_enabled(RESOURCE_EXPIRE_TIME) or self.expiry:
+            expire_time_str = resource.get('expire_time')
+            expire_timestamp = self._convert_to_timestamp(expire_time_str) if expire_time_str else None
+            if expire_timestamp is not None:
+                expire_child.set(expire_timestamp)
+                logger.debug(f"Resource {resource_id} expire time: {expire_time_str} -> {expire_timestamp}")
+            if self.expiry:
+                if expire_timestamp is not None:
+                    self.expiry.observe(resource_id, service_type_name, expire_timestamp)
+                else:
+                    self.expiry.discard(resource_id)
+        
+        # 资源生效时间指标 (转换为Unix时间戳)
+        if self._metric_enabled(RESOURCE_EFFECTIVE_TIME):
+            effective_time_str = resource.get('effective_time')
+            if effective_time_str:
+                effective_timestamp = self._convert_to_timestamp(effective_time_str)
+                if effective_timestamp is not None:
+                    effective_child.set(effective_timestamp)
+                    logger.debug(f"Resource {resource_id} effective time: {effective_time_str} -> {effective_timestamp}")
+        
+        # 资源是否为主资源指标
+        if self._metric_enabled(RESOURCE_IS_MAIN):
+            is_main_resource = resource.get('is_main_resource', 0)
+            # 确保is_main_resource不是None
+            if is_main_resource is None:
+                is_main_resource = 0
+            is_main_child.set(is_main_resource)
+            logger.debug(f"Resource {resource_id} is main resource: {is_main_resource}")
+            
+    def _bind_resource_children(self, resource_id, region, resource_name, service_type_name, resource_type_name,
+                                spec_unit):
+        """
+        绑定一个资源所有指标的子指标，资源首次出现或标签值变化时调用
+        
+        :return: (状态, 规格大小, 信息, 到期时间, 生效时间, 是否主资源) 子指标元组
+        """
+        labels = (self.name, region, resource_id, resource_name, service_type_name, resource_type_name)
+        return (
+            RESOURCE_STATUS.labels(*labels),
+            RESOURCE_SPEC_SIZE.labels(*labels, spec_unit),
+            RESOURCE_INFO.labels(*labels[:4]),
+            RESOURCE_EXPIRE_TIME.labels(*labels),
+            RESOURCE_EFFECTIVE_TIME.labels(*labels),
+            RESOURCE_IS_MAIN.labels(*labels)
+        )
+            
     def _get_spec_unit(self, measure_id):
         """
         根据测量单位ID获取单位名称
@@ -1,11 +1,11 @@
 from collectors.base_collector import BaseCollector
-from prometheus_client import Gauge, Info
+from utils.snapshot import SnapshotGauge, SnapshotInfo, SnapshotRegistry
+from utils.expiry import ExpiryHistogram
 import logging
 import os
+from utils.sdk_client_factory import SDKClientFactory
 
 # 导入华为云SDK相关模块
-from huaweicloudsdkcore.auth.credentials import GlobalCredentials
-from huaweicloudsdkbss.v2.region.bss_region import BssRegion
 from huaweicloudsdkcore.exceptions import exceptions
 from huaweicloudsdkbss.v2 import *
 
@@ -13,52 +13,58 @@ logger = logging.getLogger(__name__)
 
 # 定义模块级指标，避免重复注册
 # 储值卡总数指标
-TOTAL_COUNT = Gauge(
+TOTAL_COUNT = SnapshotGauge(
     'huaweicloud_bss_stored_value_card_total_count',
     'Total count of stored value cards in BSS',
     ['account']
 )
 
 # 储值卡状态指标 (1 for available, 2 for used up)
-CARD_STATUS = Gauge(
+CARD_STATUS = SnapshotGauge(
     'huaweicloud_bss_stored_value_card_status',
     'Status of stored value cards in BSS (1 for available, 2 for used up)',
-    ['account', 'card_id', 'card_name']
+    ['account', 'card_id', 'card_name'],
+    descriptive_labels=['card_name']
 )
 
 # 储值卡面值指标
-CARD_FACE_VALUE = Gauge(
+CARD_FACE_VALUE = SnapshotGauge(
     'huaweicloud_bss_stored_value_card_face_value',
     'Face value of stored value cards in BSS',
-    ['account', 'card_id', 'card_name', 'currency']
+    ['account', 'card_id', 'card_name', 'currency'],
+    descriptive_labels=['card_name']
 )
 
 # 储值卡余额指标
-CARD_BALANCE = Gauge(
+CARD_BALANCE = SnapshotGauge(
     'huaweicloud_bss_stored_value_card_balance',
     'Balance of stored value cards in BSS',
-    ['account', 'card_id', 'card_name', 'currency']
+    ['account', 'card_id', 'card_name', 'currency'],
+    descriptive_labels=['card_name']
 )
 
 # 储值卡生效时间指标 (Unix时间戳)
-CARD_EFFECTIVE_TIME = Gauge(
+CARD_EFFECTIVE_TIME = SnapshotGauge(
     'huaweicloud_bss_stored_value_card_effective_timestamp',
     'Effective timestamp of stored value cards in BSS (Unix timestamp)',
-    ['account', 'card_id', 'card_name']
+    ['account', 'card_id', 'card_name'],
+    descriptive_labels=['card_name']
 )
 
 # 储值卡到期时间指标 (Unix时间戳)
-CARD_EXPIRE_TIME = Gauge(
+CARD_EXPIRE_TIME = SnapshotGauge(
     'huaweicloud_bss_stored_value_card_expire_timestamp',
     'Expire timestamp of stored value cards in BSS (Unix timestamp)',
-    ['account', 'card_id', 'card_name']
+    ['account', 'card_id', 'card_name'],
+    descriptive_labels=['card_name']
 )
 
 # 储值卡信息指标
-CARD_INFO = Info(
+CARD_INFO = SnapshotInfo(
     'huaweicloud_bss_stored_value_card',
     'Detailed information of stored value cards in BSS',
-    ['account', 'card_id', 'card_name']
+    ['account', 'card_id', 'card_name'],
+    descriptive_labels=['card_name']
 )
 
 
@@ -71,6 +77,8 @@ class LISTSTOREDVALUECARDSCollector(BaseCollector):
     
     def __init__(self, name, account_config, module_config=None):
         super().__init__(name, account_config, module_config)
+        # 可选的按储值卡名称统计的到期时间和余额分桶（模块配置expiry_histogram）
+        self.expiry = ExpiryHistogram.from_config(self, CARD_EXPIRE_TIME, amounts=True)
         
         # 初始化华为云BSS客户端
         logger.debug(f"Initializing LISTSTOREDVALUECARDS collector for account {name}")
@@ -84,17 +92,12 @@ class LISTSTOREDVALUECARDSCollector(BaseCollector):
                 self.client = None
                 return
                 
-            credentials = GlobalCredentials(ak, sk)
-            logger.debug("GlobalCredentials created successfully")
-            
             # 使用配置中的区域或者默认区域
             region = self.region or "cn-north-1"
             logger.debug(f"Using region: {region}")
             
-            self.client = BssClient.new_builder() \
-                .with_credentials(credentials) \
-                .with_region(BssRegion.value_of(region)) \
-                .build()
+            # 从共享客户端工厂获取客户端，同一账号的多个模块复用同一个客户端和连接池
+            self.client = SDKClientFactory.get_client('bss', ak, sk, region)
             logger.debug("BSS client initialized successfully")
                 
         except Exception as e:
@@ -126,11 +129,17 @@ class LISTSTOREDVALUECARDSCollector(BaseCollector):
             
             # 调用华为云API
             logger.debug("Calling list_stored_value_cards API")
-            response = self.client.list_stored_value_cards(request)
+            data = self._call_sdk('list_stored_value_cards', request)
             logger.debug("list_stored_value_cards API call successful")
             
+            # 响应与上次成功处理的相同时跳过整个更新过程
+            if self._payload_unchanged('list_stored_value_cards', data, len(data.get('stored_value_cards') or [])):
+                # 到期分桶依赖当前时间，储值卡未变化时仍重新计算，保留所有对象
+                if self.expiry:
+                    self.expiry.publish()
+                return
+            
             # 解析响应数据
-            data = response.to_json_object()
             logger.debug(f"Response data keys: {data.keys()}")
             
             # 更新储值卡总数指标
@@ -145,6 +154,8 @@ class LISTSTOREDVALUECARDSCollector(BaseCollector):
             # 如果没有储值卡，也要确保指标被设置
             if not stored_value_cards:
                 logger.info(f"No stored value cards found for account {self.name}")
+                if self.expiry:
+                    self.expiry.publish()
                 return
             
             # 更新每个储值卡的详细指标
@@ -154,6 +165,12 @@ class LISTSTOREDVALUECARDSCollector(BaseCollector):
                 
                 logger.debug(f"Processing stored value card: {card_id}, name: {card_name}")
                 
+                # 储值卡数据未变化时跳过该储值卡的指标更新
+                if self._record_unchanged(card_id, card):
+                    if self.expiry:
+                        self.expiry.retain(card_id)
+                    continue
+                
                 # 储值卡状态指标
                 status = card.get('status', 0)
                 CARD_STATUS.labels(
@@ -220,24 +237,35 @@ class LISTSTOREDVALUECARDSCollector(BaseCollector):
                 
                 # 储值卡到期时间指标 (转换为Unix时间戳)
                 expire_time_str = card.get('expire_time')
-                if expire_time_str:
-                    expire_timestamp = self._convert_to_timestamp(expire_time_str)
+                expire_timestamp = self._convert_to_timestamp(expire_time_str) if expire_time_str else None
+                if expire_timestamp is not None:
+                    CARD_EXPIRE_TIME.labels(
+                        account=self.name,
+                        card_id=card_id,
+                        card_name=card_name
+                    ).set(expire_timestamp)
+                    logger.debug(f"Card {card_id} expire time: {expire_time_str} -> {expire_timestamp}")
+                if self.expiry:
                     if expire_timestamp is not None:
-                        CARD_EXPIRE_TIME.labels(
-                            account=self.name,
-                            card_id=card_id,
-                            card_name=card_name
-                        ).set(expire_timestamp)
-                        logger.debug(f"Card {card_id} expire time: {expire_time_str} -> {expire_timestamp}")
+                        self.expiry.observe(card_id, card_name, expire_timestamp, balance)
+                    else:
+                        self.expiry.discard(card_id)
+            
+            # 本轮更新成功完成，提交数据指纹
+            self._commit_fingerprints()
+            if self.expiry:
+                self.expiry.publish()
                 
         except exceptions.ClientRequestException as e:
             logger.error(f"Error collecting LISTSTOREDVALUECARDS metrics for account {self.name}: "
                          f"status_code={e.status_code}, request_id={e.request_id}, "
                          f"error_code={e.error_code}, error_msg={e.error_msg}")
+            SnapshotRegistry.mark_incomplete(str(e))
         except Exception as e:
             import traceback
             logger.error(f"Error collecting LISTSTOREDVALUECARDS metrics for account {self.name}: {e}")
             logger.error(f"Full traceback: {traceback.format_exc()}")
+            SnapshotRegistry.mark_incomplete(str(e))
         logger.debug(f"Completed LISTSTOREDVALUECARDS metrics collection for account {self.name}")
             
     def _convert_to_timestamp(self, time_str):
@@ -0,0 +1,260 @@
+from collectors.base_collector import BaseCollector
+from utils.snapshot import SnapshotGauge, SnapshotRegistry
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from dateutil.relativedelta import relativedelta
+from utils.sdk_client_factory import SDKClientFactory
+from utils.response_cache import normalize_params, credential_identity
+from utils.bill_store import BillDetailStore, DEFAULT_BILL_STORE_PATH, BILL_STORE_RECORDS_TOTAL
+
+# 导入华为云SDK相关模块
+from huaweicloudsdkcore.exceptions import exceptions
+from huaweicloudsdkbss.v2 import *
+
+logger = logging.getLogger(__name__)
+
+# 定义模块级指标，避免重复注册
+# 账期金额排名前N的资源指标
+RESOURCE_BILL_TOP_AMOUNT = SnapshotGauge(
+    'huaweicloud_bss_resource_bill_top_amount',
+    'Consume amount of the top resources by cost in the bill cycle',
+    ['account', 'cycle', 'res_instance_id', 'resource_name', 'cloud_service_type', 'enterprise_project_id'],
+    descriptive_labels=['resource_name']
+)
+
+# 按云服务类型汇总的账期金额指标
+RESOURCE_BILL_SERVICE_AMOUNT = SnapshotGauge(
+    'huaweicloud_bss_resource_bill_service_amount',
+    'Resource bill amount of the bill cycle rolled up by cloud service type',
+    ['account', 'cycle', 'cloud_service_type', 'amount_type']
+)
+
+# 按企业项目汇总的账期金额指标
+RESOURCE_BILL_ENTERPRISE_PROJECT_AMOUNT = SnapshotGauge(
+    'huaweicloud_bss_resource_bill_enterprise_project_amount',
+    'Resource bill amount of the bill cycle rolled up by enterprise project',
+    ['account', 'cycle', 'enterprise_project_id', 'amount_type']
+)
+
+# 作为过滤条件传给接口的配置参数
+FILTER_PARAMS = ('cloud_service_type', 'resource_type', 'region', 'enterprise_project_id',
+                 'charge_mode', 'bill_type', 'include_zero_record', 'method', 'sub_customer_id')
+
+
+class RESOURCEBILLSCollector(BaseCollector):
+    """
+    资源账单明细收集器
+    按天分页获取资源级账单明细，每页在内存中按 (资源, 云服务类型, 企业项目) 聚合后累加到本地SQLite，
+    只输出排名前N的资源和按云服务类型、企业项目汇总的指标。
+    每一天保存分页游标，已获取完整的天不再查询，中断的天从上次的偏移量继续。
+    专门使用AK/SK认证方式和华为云SDK
+    """
+    
+    def __init__(self, name, account_config, module_config=None):
+        super().__init__(name, account_config, module_config)
+        
+        # 输出的资源数上限
+        self.top_n = int(self.module_config.get('top_n', 20))
+        # 最近几天（含当天）的账单仍会变化，每次都重新获取
+        self.open_days = max(int(self.module_config.get('open_days', 2)), 1)
+        # 本地保留的账期数
+        self.keep_months = max(int(self.module_config.get('keep_months', 3)), 1)
+        # 上次输出的序列，用于删除不再排名或已滑出账期的序列
+        self._exposed = {}
+        self.store = None
+        # 本地存储按凭证身份区分账号，账号显示名称改变或被其他账号重用时不会读到错误的数据和游标
+        self.store_identity = credential_identity(self.ak or os.environ.get("CLOUD_SDK_AK"))
+        
+        # 初始化华为云BSS客户端
+        logger.debug(f"Initializing RESOURCEBILLS collector for account {name}")
+        try:
+            self.store = BillDetailStore.open(self.module_config.get('store_path', DEFAULT_BILL_STORE_PATH))
+            
+            # 使用配置中的AK/SK或者环境变量
+            ak = self.ak or os.environ.get("CLOUD_SDK_AK")
+            sk = self.sk or os.environ.get("CLOUD_SDK_SK")
+            
+            if not ak or not sk:
+                logger.error(f"Missing AK/SK credentials for RESOURCEBILLS collector in account {self.name}")
+                self.client = None
+                return
+            
+            # 使用配置中的区域或者默认区域
+            region = self.region or "cn-north-1"
+            logger.debug(f"Using region: {region}")
+            
+            # 从共享客户端工厂获取客户端，同一账号的多个模块复用同一个客户端和连接池
+            self.client = SDKClientFactory.get_client('bss', ak, sk, region, endpoint=self.endpoint or None)
+            logger.debug("BSS client initialized successfully")
+        
+        except Exception as e:
+            logger.error(f"Failed to initialize RESOURCEBILLS collector for account {self.name}: {e}")
+            self.client = None
+        
+    def collect(self):
+        """
+        收集资源账单明细指标
+        """
+        logger.debug(f"Starting RESOURCEBILLS metrics collection for account {self.name}")
+        if not self.client:
+            logger.warning(f"BSS client not initialized for RESOURCEBILLS collector in account {self.name}")
+            return
+        
+        try:
+            filters = {key: self.params[key] for key in FILTER_PARAMS if key in self.params}
+            query_key = normalize_params(filters)
+            today = date.today()
+            # 从最早的未结算天所在账期的第一天开始，已获取完整的天只检查游标
+            begin = (today - timedelta(days=self.open_days - 1)).replace(day=1)
+            days = [begin + timedelta(days=i) for i in range((today - begin).days + 1)]
+            open_begin = today - timedelta(days=self.open_days - 1)
+            
+            # 同一天的分页依赖游标顺序获取，不同的天并发获取
+            with ThreadPoolExecutor(max_workers=max(min(self.max_concurrency, len(days)), 1),
+                                    thread_name_prefix='resource-bill') as pool:
+                fetched = sum(pool.map(lambda day: self._collect_day(filters, query_key, day, day >= open_begin), days))
+            logger.debug(f"Fetched {fetched} resource bill records for {len(days)} days of account {self.name}")
+            
+            # 删除保留账期之前的数据
+            keep_from = today.replace(day=1) - relativedelta(months=self.keep_months - 1)
+            self.store.prune(self.store_identity, query_key, keep_from.isoformat())
+            
+            cycles = sorted({day.strftime("%Y-%m") for day in days})
+            self._update_metrics(query_key, cycles)
+        
+        except exceptions.ClientRequestException as e:
+            logger.error(f"Error collecting RESOURCEBILLS metrics for account {self.name}: "
+                         f"status_code={e.status_code}, request_id={e.request_id}, "
+                         f"error_code={e.error_code}, error_msg={e.error_msg}")
+            SnapshotRegistry.mark_incomplete(str(e))
+        except Exception as e:
+            import traceback
+            logger.error(f"Error collecting RESOURCEBILLS metrics for account {self.name}: {e}")
+            logger.error(f"Full traceback: {traceback.format_exc()}")
+            SnapshotRegistry.mark_incomplete(str(e))
+        logger.debug(f"Completed RESOURCEBILLS metrics collection for account {self.name}")
+        
+    def _collect_day(self, filters, query_key, day, is_open):
+        """
+        获取一天的资源账单明细并累加到本地存储，在线程池中调用
+        
+        :param filters: 过滤条件字典
+        :param query_key: 查询条件标识
+        :param day: 日期
+        :param is_open: 是否为未结算的天，未结算的天即使已获取完整也重新获取
+        :return: 本次获取的记录数
+        """
+        bill_date = day.isoformat()
+        cursor = self.store.cursor(self.store_identity, query_key, bill_date)
+        offset = 0
+        if cursor:
+            next_offset, _, complete, fetched_open = cursor
+            if not is_open and not fetched_open:
+                # 结算后获取的天：已获取完整时不再查询，中断时从游标处继续，此前的页已经累加过
+                if complete:
+                    return 0
+                offset = next_offset
+                logger.info(f"Resuming resource bills of {bill_date} for account {self.name} at offset {offset}")
+            else:
+                # 未结算的天每次从头获取，中断时已累加的页可能已经变化，也从头获取；
+                # 在未结算时获取的天结算后再从头获取一次，得到最终的金额
+                if not is_open:
+                    logger.info(f"Refetching resource bills of {bill_date} for account {self.name} after it closed")
+                self.store.reset_day(self.store_identity, query_key, bill_date)
+        
+        limit = int(self.params.get('limit', 1000))
+        fetched = 0
+        while True:
+            page = self._fetch_page(filters, day, offset, limit)
+            rows = {}
+            for record in page:
+                key = (
+                    record.get('res_instance_id') or 'unknown',
+                    record.get('cloud_service_type') or 'unknown',
+                    record.get('enterprise_project_id') or ''
+                )
+                values = rows.setdefault(key, ['', 0.0, 0.0, 0])
+                values[0] = record.get('resource_name') or values[0]
+                values[1] += float(record.get('consume_amount') or 0)
+                values[2] += float(record.get('official_amount') or 0)
+                values[3] += 1
+            total_count = int(page.meta.get('total_count') or 0)
+            offset += page.records
+            fetched += page.records
+            complete = page.records < limit or offset >= total_count
+            self.store.add_page(self.store_identity, query_key, day.strftime("%Y-%m"), bill_date, rows,
+                                offset, total_count, complete, fetched_open=is_open)
+            BILL_STORE_RECORDS_TOTAL.labels(account=self.name).inc(page.records)
+            if complete:
+                logger.debug(f"Fetched {fetched} resource bill records of {bill_date}, total {total_count}")
+                return fetched
+        
+    def _fetch_page(self, filters, day, offset, limit):
+        """
+        获取一天的一页资源账单明细
+        
+        :return: 该页的记录集合，流式模式下边下载边解析
+        """
+        query = QueryResRecordsDetailReq(
+            cycle=day.strftime("%Y-%m"),
+            query_type='DAILY',
+            statistic_type=2,
+            bill_cycle_begin=day.isoformat(),
+            bill_cycle_end=day.isoformat(),
+            offset=offset,
+            limit=limit
+        )
+        for key, value in filters.items():
+            setattr(query, key, value)
+        request = ListCustomerselfResourceRecordDetailsRequest(body=query)
+        
+        logger.debug(f"Calling list_customerself_resource_record_details API for {day} with offset={offset}")
+        return self._call_sdk_records('list_customerself_resource_record_details', request, 'monthly_records',
+                                      key=f"resource_bills:{day}:{offset}")
+        
+    def _update_metrics(self, query_key, cycles):
+        """
+        从本地存储读取排名前N的资源和汇总结果更新指标，并删除上次输出但本次不再存在的序列
+        
+        :param query_key: 查询条件标识
+        :param cycles: 需要输出的账期列表
+        """
+        exposed = {metric: set() for metric in (RESOURCE_BILL_TOP_AMOUNT, RESOURCE_BILL_SERVICE_AMOUNT,
+                                                RESOURCE_BILL_ENTERPRISE_PROJECT_AMOUNT)}
+        for cycle in cycles:
+            for res_instance_id, service_type, project_id, resource_name, amount, _ in \
+                    self.store.top_resources(self.store_identity, query_key, cycle, self.top_n):
+                labels = (self.name, cycle, res_instance_id, resource_name, service_type, project_id)
+                RESOURCE_BILL_TOP_AMOUNT.labels(*labels).set(amount)
+                exposed[RESOURCE_BILL_TOP_AMOUNT].add(labels)
+            
+            for metric, column in ((RESOURCE_BILL_SERVICE_AMOUNT, 'cloud_service_type'),
+                                   (RESOURCE_BILL_ENTERPRISE_PROJECT_AMOUNT, 'enterprise_project_id')):
+                for value, amount, official_amount, _ in \
+                        self.store.rollup(self.store_identity, query_key, cycle, column):
+                    for amount_type, number in (('consume_amount', amount), ('official_amount', official_amount)):
+                        labels = (self.name, cycle, value, amount_type)
+                        metric.labels(*labels).set(number)
+                        exposed[metric].add(labels)
+        
+        for metric, labels_set in self._exposed.items():
+            for labels in labels_set - exposed[metric]:
+                try:
+                    metric.remove(*labels)
+                except KeyError:
+                    pass
+        self._exposed = exposed
+        logger.debug(f"Exposed {len(exposed[RESOURCE_BILL_TOP_AMOUNT])} top resources for cycles {cycles}")
+        
+    def describe(self):
+        """
+        描述此收集器提供的指标
+        """
+        logger.debug("Describing RESOURCEBILLS collector metrics")
+        return [
+            RESOURCE_BILL_TOP_AMOUNT,
+            RESOURCE_BILL_SERVICE_AMOUNT,
+            RESOURCE_BILL_ENTERPRISE_PROJECT_AMOUNT
+        ]
@@ -1,11 +1,10 @@
 from collectors.base_collector import BaseCollector
-from prometheus_client import Gauge
+from utils.snapshot import SnapshotGauge, SnapshotRegistry
 import logging
 import os
+from utils.sdk_client_factory import SDKClientFactory
 
 # 导入华为云SDK相关模块
-from huaweicloudsdkcore.auth.credentials import GlobalCredentials
-from huaweicloudsdkbss.v2.region.bss_region import BssRegion
 from huaweicloudsdkcore.exceptions import exceptions
 from huaweicloudsdkbss.v2 import *
 
@@ -13,35 +12,35 @@ logger = logging.getLogger(__name__)
 
 # 定义模块级指标，避免重复注册
 # 账户总欠款金额指标
-DEBT_AMOUNT = Gauge(
+DEBT_AMOUNT = SnapshotGauge(
     'huaweicloud_bss_debt_amount',
     'Total debt amount in BSS',
     ['account', 'currency']
 )
 
 # 账户余额指标
-ACCOUNT_BALANCE = Gauge(
+ACCOUNT_BALANCE = SnapshotGauge(
     'huaweicloud_bss_account_balance',
     'Account balance in BSS',
     ['account', 'account_id', 'account_type', 'currency']
 )
 
 # 账户专款专用余额指标
-ACCOUNT_DESIGNATED_AMOUNT = Gauge(
+ACCOUNT_DESIGNATED_AMOUNT = SnapshotGauge(
     'huaweicloud_bss_account_designated_amount',
     'Account designated amount in BSS',
     ['account', 'account_id', 'account_type', 'currency']
 )
 
 # 账户信用额度指标
-ACCOUNT_CREDIT_AMOUNT = Gauge(
+ACCOUNT_CREDIT_AMOUNT = SnapshotGauge(
     'huaweicloud_bss_account_credit_amount',
     'Account credit amount in BSS (only for credit accounts)',
     ['account', 'account_id', 'account_type', 'currency']
 )
 
 # 账户总金额度指标
-ACCOUNT_TOTAL_AMOUNT = Gauge(
+ACCOUNT_TOTAL_AMOUNT = SnapshotGauge(
     'huaweicloud_bss_account_total_amount',
     'Total amount in BSS account (balance + designated_amount + credit_amount)',
     ['account', 'account_id', 'account_type', 'currency']
@@ -70,17 +69,12 @@ class SHOWCUSTOMERACCOUNTBALANCESCollector(BaseCollector):
                 self.client = None
                 return
                 
-            credentials = GlobalCredentials(ak, sk)
-            logger.debug("GlobalCredentials created successfully")
-            
             # 使用配置中的区域或者默认区域
             region = self.region or "cn-north-1"
             logger.debug(f"Using region: {region}")
             
-            self.client = BssClient.new_builder() \
-                .with_credentials(credentials) \
-                .with_region(BssRegion.value_of(region)) \
-                .build()
+            # 从共享客户端工厂获取客户端，同一账号的多个模块复用同一个客户端和连接池
+            self.client = SDKClientFactory.get_client('bss', ak, sk, region)
             logger.debug("BSS client initialized successfully")
                 
         except Exception as e:
@@ -103,11 +97,14 @@ class SHOWCUSTOMERACCOUNTBALANCESCollector(BaseCollector):
             
             # 调用华为云API
             logger.debug("Calling show_customer_account_balances API")
-            response = self.client.show_customer_account_balances(request)
+            data = self._call_sdk('show_customer_account_balances', request)
             logger.debug("show_customer_account_balances API call successful")
             
+            # 响应与上次成功处理的相同时跳过整个更新过程
+            if self._payload_unchanged('show_customer_account_balances', data, len(data.get('account_balances') or [])):
+                return
+            
             # 解析响应数据
-            data = response.to_json_object()
             logger.debug(f"Response data keys: {data.keys()}")
             
             # 获取债务金额
@@ -138,6 +135,10 @@ class SHOWCUSTOMERACCOUNTBALANCESCollector(BaseCollector):
                 
                 logger.debug(f"Processing account balance: {account_id}, type: {account_type}")
                 
+                # 账户余额数据未变化时跳过该账户的指标更新
+                if self._record_unchanged(account_id, account):
+                    continue
+                
                 # 账户余额
                 amount = account.get('amount', 0)
                 ACCOUNT_BALANCE.labels(
@@ -177,15 +178,20 @@ class SHOWCUSTOMERACCOUNTBALANCESCollector(BaseCollector):
                     currency=currency
                 ).set(total_amount)
                 logger.debug(f"Account {account_id} total amount: {total_amount} {currency}")
+            
+            # 本轮更新成功完成，提交数据指纹
+            self._commit_fingerprints()
                 
         except exceptions.ClientRequestException as e:
             logger.error(f"Error collecting SHOWCUSTOMERACCOUNTBALANCES metrics for account {self.name}: "
                          f"status_code={e.status_code}, request_id={e.request_id}, "
                          f"error_code={e.error_code}, error_msg={e.error_msg}")
+            SnapshotRegistry.mark_incomplete(str(e))
         except Exception as e:
             import traceback
             logger.error(f"Error collecting SHOWCUSTOMERACCOUNTBALANCES metrics for account {self.name}: {e}")
             logger.error(f"Full traceback: {traceback.format_exc()}")
+            SnapshotRegistry.mark_incomplete(str(e))
         logger.debug(f"Completed SHOWCUSTOMERACCOUNTBALANCES metrics collection for account {self.name}")
             
     def _get_account_type_name(self, account_type):
@@ -0,0 +1,397 @@
+from collectors.base_collector import BaseCollector
+from utils.snapshot import SnapshotGauge, SnapshotInfo, SnapshotRegistry
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from utils.sdk_client_factory import SDKClientFactory
+from utils.pagination import iter_offset_pages, report_completeness
+
+# 导入华为云SDK相关模块
+from huaweicloudsdkcore.exceptions import exceptions
+from huaweicloudsdkbss.v2 import *
+
+logger = logging.getLogger(__name__)
+
+# 定义模块级指标，避免重复注册
+# 子客户总数指标
+SUB_CUSTOMER_TOTAL_COUNT = SnapshotGauge(
+    'huaweicloud_bss_sub_customer_total_count',
+    'Total count of sub-customers under the partner or enterprise master account',
+    ['account', 'mode']
+)
+
+# 子客户信息指标
+SUB_CUSTOMER_INFO = SnapshotInfo(
+    'huaweicloud_bss_sub_customer',
+    'Detailed information of sub-customers under the partner or enterprise master account',
+    ['account', 'customer_id']
+)
+
+# 子客户余额指标
+# 子客户的余额和成本使用独立的指标族，不写入单账号收集器的指标，同一子客户同时单独配置时不会出现重复样本
+SUB_CUSTOMER_BALANCE = SnapshotGauge(
+    'huaweicloud_bss_sub_customer_balance',
+    'Balance of sub-customers under the partner account',
+    ['account', 'customer_id', 'currency']
+)
+
+# 子客户欠款指标
+SUB_CUSTOMER_DEBT_AMOUNT = SnapshotGauge(
+    'huaweicloud_bss_sub_customer_debt_amount',
+    'Debt amount of sub-customers under the partner account',
+    ['account', 'customer_id', 'currency']
+)
+
+# 子客户当前账期按云服务类型汇总的应付金额指标
+SUB_CUSTOMER_COST_AMOUNT = SnapshotGauge(
+    'huaweicloud_bss_sub_customer_cost_amount',
+    'Cost amount of sub-customers by service type in the bill cycle',
+    ['account', 'customer_id', 'service_type_code', 'bill_cycle']
+)
+
+# 子客户当前账期按云服务类型汇总的官方金额指标
+SUB_CUSTOMER_OFFICIAL_COST_AMOUNT = SnapshotGauge(
+    'huaweicloud_bss_sub_customer_official_cost_amount',
+    'Official cost amount of sub-customers by service type in the bill cycle',
+    ['account', 'customer_id', 'service_type_code', 'bill_cycle']
+)
+
+# 每次批量查询余额的客户数上限
+BALANCE_BATCH_SIZE = 100
+
+# 各模式下枚举子客户和查询账单使用的接口：(方法名, 记录数组字段, 总数字段)
+MODE_OPERATIONS = {
+    'partner': {
+        'customers': ('list_sub_customers', 'customer_infos', 'count'),
+        'bills': ('list_sub_customer_bill_detail', 'fee_records', 'total_count'),
+    },
+    'enterprise': {
+        'customers': ('list_enterprise_sub_customers', 'sub_customer_infos', 'total_count'),
+        'bills': ('show_customer_monthly_sum', 'bill_sums', 'total_count'),
+    },
+}
+
+
+class SUBCUSTOMERSCollector(BaseCollector):
+    """
+    子客户批量收集器
+    使用伙伴或企业主账号的BSS接口分页枚举所有子客户，批量查询余额和当月账单，
+    结果以子客户名称作为account标签写入子客户余额和成本指标，不需要为每个子客户单独配置凭证。
+    专门使用AK/SK认证方式和华为云SDK
+    """
+    
+    def __init__(self, name, account_config, module_config=None):
+        super().__init__(name, account_config, module_config)
+        
+        # partner: 伙伴账号及其子客户；enterprise: 企业主账号及其成员账号
+        self.mode = self.module_config.get('mode', 'partner')
+        if self.mode not in MODE_OPERATIONS:
+            logger.error(f"Unsupported SUBCUSTOMERS mode {self.mode} for account {name}, using partner")
+            self.mode = 'partner'
+        self.collect_balances = self.module_config.get('balances', True)
+        self.collect_costs = self.module_config.get('costs', True)
+        # 子客户指标的account标签格式，可使用 {name}、{customer_id} 和 {master}
+        self.account_label = self.module_config.get('account_label', '{name}')
+        # 上次成功处理的账单页的汇总结果，(账期, 偏移量) -> {(子客户ID, 云服务类型): [应付金额, 官方金额]}
+        # 账单页未变化时复用，不再逐条累加
+        self._bill_page_totals = {}
+        logger.debug(f"SUBCUSTOMERS mode: {self.mode}, balances: {self.collect_balances}, costs: {self.collect_costs}")
+        
+        # 初始化华为云BSS客户端
+        logger.debug(f"Initializing SUBCUSTOMERS collector for account {name}")
+        try:
+            # 使用配置中的AK/SK或者环境变量
+            ak = self.ak or os.environ.get("CLOUD_SDK_AK")
+            sk = self.sk or os.environ.get("CLOUD_SDK_SK")
+            
+            if not ak or not sk:
+                logger.error(f"Missing AK/SK credentials for SUBCUSTOMERS collector in account {self.name}")
+                self.client = None
+                return
+            
+            # 使用配置中的区域或者默认区域
+            region = self.region or "cn-north-1"
+            logger.debug(f"Using region: {region}")
+            
+            # 从共享客户端工厂获取客户端，配置endpoint时（如本地桩服务）直接使用该端点
+            self.client = SDKClientFactory.get_client('bss', ak, sk, region, endpoint=self.endpoint or None)
+            logger.debug("BSS client initialized successfully")
+        
+        except Exception as e:
+            logger.error(f"Failed to initialize BSS client for account {self.name}: {e}")
+            self.client = None
+        
+    def collect(self):
+        """
+        收集子客户指标
+        """
+        logger.debug(f"Starting SUBCUSTOMERS metrics collection for account {self.name}")
+        if not self.client:
+            logger.warning(f"BSS client not initialized for SUBCUSTOMERS collector in account {self.name}")
+            return
+        
+        try:
+            customers = self._list_sub_customers()
+            SUB_CUSTOMER_TOTAL_COUNT.labels(account=self.name, mode=self.mode).set(len(customers))
+            logger.debug(f"Found {len(customers)} sub-customers for account {self.name}")
+            
+            if not customers:
+                logger.info(f"No sub-customers found for account {self.name}")
+            else:
+                # 企业主账号没有批量查询成员账号余额的接口，只有伙伴模式采集余额
+                if self.collect_balances and self.mode == 'partner':
+                    self._collect_balances(customers)
+                
+                if self.collect_costs:
+                    self._collect_costs(customers)
+            
+            # 本轮更新成功完成，提交数据指纹
+            self._commit_fingerprints()
+        
+        except exceptions.ClientRequestException as e:
+            logger.error(f"Error collecting SUBCUSTOMERS metrics for account {self.name}: "
+                         f"status_code={e.status_code}, request_id={e.request_id}, "
+                         f"error_code={e.error_code}, error_msg={e.error_msg}")
+            SnapshotRegistry.mark_incomplete(str(e))
+        except Exception as e:
+            import traceback
+            logger.error(f"Error collecting SUBCUSTOMERS metrics for account {self.name}: {e}")
+            logger.error(f"Full traceback: {traceback.format_exc()}")
+            SnapshotRegistry.mark_incomplete(str(e))
+        logger.debug(f"Completed SUBCUSTOMERS metrics collection for account {self.name}")
+        
+    def _label(self, customers, customer_id):
+        """
+        获取子客户指标的account标签
+        
+        :param customers: 子客户ID到名称的映射
+        :param customer_id: 子客户ID
+        :return: account标签值
+        """
+        return self.account_label.format(
+            name=customers.get(customer_id) or customer_id,
+            customer_id=customer_id,
+            master=self.name
+        )
+        
+    def _list_sub_customers(self):
+        """
+        分页并发枚举所有子客户
+        
+        :return: 子客户ID到名称的映射
+        """
+        operation, array_key, total_key = MODE_OPERATIONS[self.mode]['customers']
+        limit = int(self.params.get('limit', 100))
+        
+        customers = {}
+        fetched = 0
+        total_count = 0
+        for _, offset, page in iter_offset_pages(self._fetch_customer_page, limit,
+                                                 max_workers=self.max_concurrency,
+                                                 total_key=total_key, operation=operation):
+            for customer in page:
+                # 该页与上次成功处理的相同时只用于建立子客户映射，不更新信息指标
+                if self.mode == 'partner':
+                    customer_id = customer.get('customer_id', 'unknown')
+                    customer_name = customer.get('account_name') or customer.get('customer') or customer_id
+                    info = {
+                        'name': customer_name,
+                        'association_type': str(customer.get('association_type', '') or ''),
+                        'customer_type': str(customer.get('customer_type', '') or ''),
+                        'label': customer.get('label', '') or ''
+                    }
+                else:
+                    customer_id = customer.get('id', 'unknown')
+                    customer_name = customer.get('name') or customer.get('display_name') or customer_id
+                    info = {
+                        'name': customer_name,
+                        'display_name': customer.get('display_name', '') or '',
+                        'status': str(customer.get('status', '') or ''),
+                        'org_name': customer.get('org_name', '') or ''
+                    }
+                customers[customer_id] = customer_name
+                if page.unchanged:
+                    continue
+                SUB_CUSTOMER_INFO.labels(account=self.name, customer_id=customer_id).info(info)
+            fetched += page.records
+            if offset == 0:
+                total_count = int(page.meta.get(total_key) or 0)
+        
+        report_completeness(self.module_name, self.name, operation, fetched, total_count)
+        return customers
+        
+    def _fetch_customer_page(self, partition, offset):
+        """
+        获取一页子客户，在分页工作线程中调用
+        
+        :param partition: 分区，子客户查询不分区，始终为None
+        :param offset: 偏移量
+        :return: 该页的记录集合
+        """
+        operation, array_key, _ = MODE_OPERATIONS[self.mode]['customers']
+        limit = int(self.params.get('limit', 100))
+        if self.mode == 'partner':
+            query = QuerySubCustomerListReq()
+            request = ListSubCustomersRequest(body=query)
+        else:
+            query = request = ListEnterpriseSubCustomersRequest()
+        
+        # 配置中的过滤条件，如 indirect_partner_id、org_id
+        for key, value in self.params.items():
+            if hasattr(query, key):
+                setattr(query, key, value)
+        query.offset = offset
+        query.limit = limit
+        
+        logger.debug(f"Calling {operation} API with offset={offset}, limit={limit}")
+        return self._call_sdk_records(operation, request, array_key, key=f"{operation}:{offset}")
+        
+    def _collect_balances(self, customers):
+        """
+        按批量接口并发查询所有子客户的余额，写入子客户余额和欠款指标
+        
+        :param customers: 子客户ID到名称的映射
+        """
+        customer_ids = list(customers)
+        batches = [customer_ids[i:i + BALANCE_BATCH_SIZE] for i in range(0, len(customer_ids), BALANCE_BATCH_SIZE)]
+        logger.debug(f"Querying balances of {len(customer_ids)} sub-customers in {len(batches)} batches")
+        
+        def fetch(batch):
+            request = ListCustomersBalancesDetailRequest(
+                body=QueryCustomersBalancesReq(
+                    customer_infos=[CustomerInfoV2(customer_id=customer_id) for customer_id in batch],
+                    indirect_partner_id=self.params.get('indirect_partner_id')
+                )
+            )
+            return self._call_sdk('list_customers_balances_detail', request)
+        
+        # 请求在线程池中并发执行，指标在当前线程中按批次顺序更新
+        with ThreadPoolExecutor(max_workers=max(min(self.max_concurrency, len(batches)), 1),
+                                thread_name_prefix='subcustomer-balance') as pool:
+            for data in pool.map(fetch, batches):
+                for balance in data.get('customer_balances') or []:
+                    customer_id = balance.get('customer_id', 'unknown')
+                    account = self._label(customers, customer_id)
+                    currency = balance.get('currency', 'CNY')
+                    
+                    SUB_CUSTOMER_BALANCE.labels(
+                        account=account,
+                        customer_id=customer_id,
+                        currency=currency
+                    ).set(float(balance.get('amount') or 0))
+                    SUB_CUSTOMER_DEBT_AMOUNT.labels(
+                        account=account,
+                        customer_id=customer_id,
+                        currency=currency
+                    ).set(float(balance.get('debt_amount') or 0))
+                    logger.debug(f"Sub-customer {customer_id} balance: {balance.get('amount')} {currency}")
+        
+    def _collect_costs(self, customers):
+        """
+        分页并发获取所有子客户当前账期的账单，按子客户和云服务类型汇总后写入子客户成本指标
+        
+        :param customers: 子客户ID到名称的映射
+        """
+        operation, array_key, total_key = MODE_OPERATIONS[self.mode]['bills']
+        bill_cycle = self.params.get('bill_cycle') or datetime.now().strftime("%Y-%m")
+        limit = int(self.params.get('bill_limit', 100))
+        
+        # 同一子客户的账单可能分布在多页中，先按页汇总，未变化的页复用上次的汇总结果
+        page_totals = {}
+        changed = False
+        fetched = 0
+        total_count = 0
+        for _, offset, page in iter_offset_pages(lambda partition, offset: self._fetch_bill_page(bill_cycle, offset),
+                                                 limit, max_workers=self.max_concurrency,
+                                                 total_key=total_key, operation=operation):
+            previous = self._bill_page_totals.get((bill_cycle, offset))
+            if page.unchanged and previous is not None:
+                page_totals[(bill_cycle, offset)] = previous
+            else:
+                changed = True
+                # (子客户ID, 云服务类型) -> [应付金额, 官方金额]
+                amounts_by_key = page_totals[(bill_cycle, offset)] = {}
+                for record in page:
+                    key = (record.get('customer_id') or 'unknown', record.get('service_type_code') or 'unknown')
+                    amounts = amounts_by_key.setdefault(key, [0.0, 0.0])
+                    # 伙伴账单明细的应付金额为payment_amount，企业汇总账单为consume_amount
+                    amounts[0] += float(record.get('payment_amount', record.get('consume_amount')) or 0)
+                    amounts[1] += float(record.get('official_amount') or 0)
+            fetched += page.records
+            if offset == 0:
+                total_count = int(page.meta.get(total_key) or 0)
+        report_completeness(self.module_name, self.name, operation, fetched, total_count)
+        # 只保留本轮出现的页，账期切换后上个账期的汇总结果不再保留
+        self._bill_page_totals = page_totals
+        
+        # 所有账单页都未变化时沿用上次写入的指标
+        if not changed:
+            logger.debug(f"Sub-customer bills for bill cycle {bill_cycle} unchanged, skipping cost updates")
+            return
+        
+        totals = {}
+        for amounts_by_key in page_totals.values():
+            for key, (amount, official_amount) in amounts_by_key.items():
+                amounts = totals.setdefault(key, [0.0, 0.0])
+                amounts[0] += amount
+                amounts[1] += official_amount
+        
+        for (customer_id, service_type_code), (amount, official_amount) in totals.items():
+            account = self._label(customers, customer_id)
+            SUB_CUSTOMER_COST_AMOUNT.labels(
+                account=account,
+                customer_id=customer_id,
+                service_type_code=service_type_code,
+                bill_cycle=bill_cycle
+            ).set(amount)
+            SUB_CUSTOMER_OFFICIAL_COST_AMOUNT.labels(
+                account=account,
+                customer_id=customer_id,
+                service_type_code=service_type_code,
+                bill_cycle=bill_cycle
+            ).set(official_amount)
+        logger.debug(f"Updated {len(totals)} sub-customer cost series for bill cycle {bill_cycle}")
+        
+    def _fetch_bill_page(self, bill_cycle, offset):
+        """
+        获取一页子客户账单，在分页工作线程中调用
+        
+        :param bill_cycle: 账期（YYYY-MM）
+        :param offset: 偏移量
+        :return: 该页的记录集合
+        """
+        operation, array_key, _ = MODE_OPERATIONS[self.mode]['bills']
+        limit = int(self.params.get('bill_limit', 100))
+        if self.mode == 'partner':
+            request = ListSubCustomerBillDetailRequest(
+                bill_cycle=bill_cycle,
+                indirect_partner_id=self.params.get('indirect_partner_id'),
+                offset=offset,
+                limit=limit
+            )
+        else:
+            # method为sub_customer时返回所有成员账号的汇总账单，每条记录带customer_id
+            request = ShowCustomerMonthlySumRequest(
+                bill_cycle=bill_cycle,
+                method='sub_customer',
+                offset=offset,
+                limit=limit
+            )
+        
+        logger.debug(f"Calling {operation} API for bill cycle {bill_cycle} with offset={offset}, limit={limit}")
+        return self._call_sdk_records(operation, request, array_key, key=f"{operation}:{bill_cycle}:{offset}")
+        
+    def describe(self):
+        """
+        描述此收集器提供的指标
+        """
+        logger.debug("Describing SUBCUSTOMERS collector metrics")
+        return [
+            SUB_CUSTOMER_TOTAL_COUNT,
+            SUB_CUSTOMER_INFO,
+            SUB_CUSTOMER_BALANCE,
+            SUB_CUSTOMER_DEBT_AMOUNT,
+            SUB_CUSTOMER_COST_AMOUNT,
+            SUB_CUSTOMER_OFFICIAL_COST_AMOUNT
+        ]
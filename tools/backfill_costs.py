@@ -0,0 +1,115 @@
+"""
+导出历史成本数据为OpenMetrics文件，用于一次性回填Prometheus
+
+在线指标huaweicloud_bss_cost_amount把月份放在time_dimension_value标签中，Prometheus无法按时间绘制成本曲线。
+该工具复用配置文件中各账号的listcosts模块配置（查询条件、凭证和并发数），批量获取一段历史时间范围内按月的成本，
+以每个月第一天（UTC）作为样本时间戳写入OpenMetrics文件，再通过promtool导入为TSDB块。
+
+默认只导出已结算的月份（与listcosts模块history_cache.open_months的判断一致），
+未结算的月份仍会变化，加上 --include-open 才会导出。
+
+用法：
+    python tools/backfill_costs.py --begin 2023-01 --end 2025-07 --output data/costs_backfill.om
+    promtool tsdb create-blocks-from openmetrics data/costs_backfill.om /path/to/prometheus/data
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dateutil.relativedelta import relativedelta  # noqa: E402
+
+from app import HuaweiCloudExporter  # noqa: E402
+from collectors.listcosts_metrics import LISTCOSTSCollector  # noqa: E402
+
+# 导出的指标族：(指标名, 说明, 样本中的金额字段下标, 额外标签)
+FAMILIES = [
+    ('huaweicloud_bss_cost_monthly_amount', 'Monthly cost amount in BSS, timestamped at the start of the month',
+     5, {'amount_type': 'net_amount'}),
+    ('huaweicloud_bss_official_cost_monthly_amount',
+     'Monthly official cost amount in BSS, timestamped at the start of the month', 6, {}),
+]
+
+
+def escape(value):
+    """
+    按OpenMetrics规则转义标签值
+    """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def month_timestamp(month):
+    """
+    月份第一天零点（UTC）的Unix时间戳
+    """
+    return int(datetime.strptime(month, "%Y-%m").replace(tzinfo=timezone.utc).timestamp())
+
+
+def write_openmetrics(path, samples):
+    """
+    写入OpenMetrics文件，先写临时文件再替换，避免promtool读到不完整的文件
+
+    :param path: 输出文件路径
+    :param samples: (account, variant, dimension_key, dimension_value, month, amount, official_amount) 列表
+    :return: 写入的样本数
+    """
+    # 同一序列的样本必须连续且按时间升序
+    samples = sorted(samples, key=lambda row: (row[:4], row[4]))
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for name, help_text, index, extra_labels in FAMILIES:
+            f.write(f"# HELP {name} {help_text}\n")
+            f.write(f"# TYPE {name} gauge\n")
+            for row in samples:
+                labels = {
+                    'account': row[0],
+                    'variant': row[1],
+                    'dimension_key': row[2],
+                    'dimension_value': row[3],
+                    **extra_labels
+                }
+                label_text = ','.join(f'{key}="{escape(value)}"' for key, value in labels.items())
+                f.write(f"{name}{{{label_text}}} {row[index]} {month_timestamp(row[4])}\n")
+        f.write("# EOF\n")
+    os.replace(tmp_path, path)
+    return len(samples) * len(FAMILIES)
+
+
+def main():
+    last_month = (datetime.now() - relativedelta(months=1)).strftime("%Y-%m")
+    parser = argparse.ArgumentParser(description='Export historical ListCosts data as an OpenMetrics backfill file')
+    parser.add_argument('--config', default='config/config.yaml', help='exporter configuration file')
+    parser.add_argument('--begin', required=True, help='first month to export (YYYY-MM)')
+    parser.add_argument('--end', default=last_month, help='last month to export (YYYY-MM), defaults to last month')
+    parser.add_argument('--account', action='append', help='only export these accounts (repeatable)')
+    parser.add_argument('--output', default='data/costs_backfill.om', help='OpenMetrics output file')
+    parser.add_argument('--include-open', action='store_true', help='also export months that are not settled yet')
+    args = parser.parse_args()
+
+    # 复用exporter的配置加载和进程级组件初始化（重试、SDK客户端工厂、响应缓存）
+    exporter = HuaweiCloudExporter(args.config)
+    samples = []
+    for account in exporter.config.get('huawei_cloud_accounts', []):
+        module_config = (account.get('modules') or {}).get('listcosts')
+        if module_config is None or (args.account and account['name'] not in args.account):
+            continue
+        collector = LISTCOSTSCollector(account['name'], account, module_config)
+        if not collector.client:
+            print(f"Skipping account {account['name']}: BSS client not initialized", file=sys.stderr)
+            continue
+        for row in collector.backfill(args.begin, args.end):
+            if args.include_open or collector._month_closed(row[3]):
+                samples.append((account['name'], *row))
+
+    count = write_openmetrics(args.output, samples)
+    print(f"Wrote {count} samples to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+对比SDK模式与原始模式的解析开销
+
+在本地启动一个返回合成数据的HTTP服务，分别以SDK模式和原始模式调用
+ListPayPerUseCustomerResources接口，输出每种模式的平均耗时、CPU时间和峰值内存。
+
+用法：
+    python tools/benchmark_raw_mode.py --rows 5000 --repeat 5
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from huaweicloudsdkbss.v2 import ListPayPerUseCustomerResourcesRequest, QueryResourcesReq  # noqa: E402
+
+from utils.sdk_client_factory import SDKClientFactory  # noqa: E402
+from utils.sdk_raw import invoke_raw  # noqa: E402
+
+
+def build_payload(rows):
+    """
+    构造与ListPayPerUseCustomerResources响应结构一致的合成数据
+    """
+    data = []
+    for i in range(rows):
+        data.append({
+            'id': f'order-instance-{i}',
+            'resource_id': f'resource-{i:08d}',
+            'resource_name': f'ecs-benchmark-{i}',
+            'resource_type': 'hws.resource.type.vm',
+            'cloud_service_type': 'hws.service.type.ec2',
+            'region_code': 'cn-north-4',
+            'service_type_name': 'Elastic Cloud Server',
+            'resource_type_name': 'Cloud Server',
+            'product_spec_desc': 's6.large.2 | 2vCPUs | 4GiB | linux',
+            'effective_time': '2024-01-01T00:00:00Z',
+            'expire_time': '2026-01-01T00:00:00Z',
+            'status': 2,
+            'expire_policy': 0,
+            'is_main_resource': 1,
+            'enterprise_project': {'id': '0', 'name': 'default'},
+        })
+    return json.dumps({'data': data, 'total_count': rows}).encode('utf-8')
+
+
+def start_stub_server(payload):
+    """
+    启动返回固定响应的本地HTTP服务
+
+    :return: (server, endpoint)
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def measure(label, func, repeat):
+    """
+    多次执行并统计平均墙钟时间、CPU时间和峰值内存
+    """
+    func()  # 预热，建立连接
+    wall = cpu = 0.0
+    peak = 0
+    for _ in range(repeat):
+        tracemalloc.start()
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        func()
+        wall += time.perf_counter() - start_wall
+        cpu += time.process_time() - start_cpu
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    print(f"{label:<8} wall={wall / repeat * 1000:8.1f}ms  cpu={cpu / repeat * 1000:8.1f}ms  "
+          f"peak_mem={peak / 1024 / 1024:7.1f}MiB")
+    return cpu / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SDK mode against raw mode')
+    parser.add_argument('--rows', type=int, default=5000, help='number of resources in the synthetic response')
+    parser.add_argument('--repeat', type=int, default=5, help='number of measured calls per mode')
+    args = parser.parse_args()
+
+    payload = build_payload(args.rows)
+    server, endpoint = start_stub_server(payload)
+    client = SDKClientFactory.get_client('bss', 'benchmark-ak', 'benchmark-sk', 'cn-north-1', endpoint=endpoint)
+    request = ListPayPerUseCustomerResourcesRequest(
+        body=QueryResourcesReq(status_list=[2], only_main_resource=1, limit=500)
+    )
+
+    def sdk_mode():
+        return client.list_pay_per_use_customer_resources(request).to_json_object()
+
+    def raw_mode():
+        return invoke_raw(client, 'list_pay_per_use_customer_resources', request).json()
+
+    # 两种模式返回的数据结构必须一致
+    assert sdk_mode() == raw_mode()
+
+    print(f"rows={args.rows} payload={len(payload) / 1024:.0f}KiB repeat={args.repeat}")
+    sdk_cpu = measure('sdk', sdk_mode, args.repeat)
+    raw_cpu = measure('raw', raw_mode, args.repeat)
+    print(f"raw mode CPU speedup: {sdk_cpu / raw_cpu:.1f}x")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+本地BSS桩服务
+
+模拟伙伴和企业主账号的子客户相关BSS接口以及资源账单明细接口，返回确定性的合成数据，
+用于在没有真实伙伴或企业账号的环境中验证subcustomers和resourcebills模块的分页、批量查询和指标输出。
+
+支持的接口：
+    POST /v2/partners/sub-customers/query                       伙伴查询子客户列表
+    GET  /v2/enterprises/multi-accounts/sub-customers           企业主账号查询成员账号列表
+    POST /v2/accounts/customer-accounts/balances/batch-query    伙伴批量查询子客户余额
+    GET  /v2/bills/subcustomer-bills/res-fee-records            伙伴查询子客户消费明细
+    GET  /v2/bills/customer-bills/monthly-sum                   企业主账号查询汇总账单
+    POST /v2/bills/customer-bills/res-records/query             查询资源账单明细
+
+用法：
+    python tools/stub_bss_server.py --port 18080 --customers 250
+
+然后在模块配置中将endpoint指向桩服务：
+    subcustomers:
+      enabled: true
+      mode: "partner"
+      endpoint: "http://127.0.0.1:18080"
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+SERVICE_TYPES = ['hws.service.type.ec2', 'hws.service.type.ebs', 'hws.service.type.obs', 'hws.service.type.vpc']
+
+
+class StubBSS:
+    """
+    合成数据和请求统计
+    """
+
+    def __init__(self, customers, records_per_customer, resources=0):
+        self.customers = [
+            {'customer_id': f'sub-{i:05d}', 'account_name': f'member{i:05d}'}
+            for i in range(customers)
+        ]
+        self.records_per_customer = records_per_customer
+        self.resources = resources
+        self.requests = {}
+        self._lock = threading.Lock()
+
+    def count(self, path):
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def bill_records(self, bill_cycle):
+        """
+        每个子客户生成records_per_customer条消费明细，金额由子客户序号和服务类型决定
+        """
+        records = []
+        for index, customer in enumerate(self.customers):
+            for n in range(self.records_per_customer):
+                service_type_code = SERVICE_TYPES[n % len(SERVICE_TYPES)]
+                records.append({
+                    'bill_cycle': bill_cycle,
+                    'customer_id': customer['customer_id'],
+                    'service_type_code': service_type_code,
+                    'official_amount': round(1.0 + index + n, 2),
+                    'payment_amount': round(0.8 * (1.0 + index + n), 2),
+                    'consume_amount': round(0.8 * (1.0 + index + n), 2),
+                })
+        return records
+
+    def resource_records(self, bill_date, offset, limit):
+        """
+        每个资源每天生成一条账单明细，只构造请求的一页
+        """
+        records = []
+        for i in range(offset, min(offset + limit, self.resources)):
+            records.append({
+                'bill_date': bill_date,
+                'res_instance_id': f'res-{i:06d}',
+                'resource_name': f'resource-{i:06d}',
+                'cloud_service_type': SERVICE_TYPES[i % len(SERVICE_TYPES)],
+                'enterprise_project_id': str(i % 3),
+                'consume_amount': round(0.01 * (i % 1000 + 1), 2),
+                'official_amount': round(0.02 * (i % 1000 + 1), 2),
+            })
+        return records
+
+
+def page(items, offset, limit):
+    offset = int(offset or 0)
+    limit = int(limit or 10)
+    return items[offset:offset + limit]
+
+
+def make_handler(stub):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, payload, status=200):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            stub.count(url.path)
+            if url.path == '/v2/enterprises/multi-accounts/sub-customers':
+                infos = [
+                    {'id': c['customer_id'], 'name': c['account_name'], 'display_name': c['account_name'].upper(),
+                     'status': 1, 'org_id': 'org-1', 'org_name': 'root'}
+                    for c in page(stub.customers, query.get('offset'), query.get('limit'))
+                ]
+                return self._reply({'total_count': len(stub.customers), 'sub_customer_infos': infos})
+            if url.path == '/v2/bills/subcustomer-bills/res-fee-records':
+                records = stub.bill_records(query.get('bill_cycle'))
+                return self._reply({'total_count': len(records), 'currency': 'CNY',
+                                    'fee_records': page(records, query.get('offset'), query.get('limit'))})
+            if url.path == '/v2/bills/customer-bills/monthly-sum':
+                records = stub.bill_records(query.get('bill_cycle'))
+                return self._reply({'total_count': len(records), 'currency': 'CNY', 'measure_id': 1,
+                                    'bill_sums': page(records, query.get('offset'), query.get('limit'))})
+            self._reply({'error_code': 'CBC.0100', 'error_msg': f'unknown path {url.path}'}, status=404)
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            stub.count(url.path)
+            if url.path == '/v2/partners/sub-customers/query':
+                infos = [
+                    {'customer_id': c['customer_id'], 'account_name': c['account_name'], 'association_type': '1',
+                     'customer_type': 1, 'label': 'stub'}
+                    for c in page(stub.customers, body.get('offset'), body.get('limit'))
+                ]
+                return self._reply({'count': len(stub.customers), 'customer_infos': infos})
+            if url.path == '/v2/accounts/customer-accounts/balances/batch-query':
+                customer_infos = body.get('customer_infos') or []
+                if len(customer_infos) > 100:
+                    return self._reply({'error_code': 'CBC.0150', 'error_msg': 'too many customers'}, status=400)
+                balances = [
+                    {'customer_id': info['customer_id'], 'amount': 1000 + int(info['customer_id'][4:]),
+                     'debt_amount': 0, 'currency': 'CNY', 'measure_id': 1}
+                    for info in customer_infos
+                ]
+                return self._reply({'customer_balances': balances})
+            if url.path == '/v2/bills/customer-bills/res-records/query':
+                offset, limit = int(body.get('offset') or 0), int(body.get('limit') or 10)
+                return self._reply({'total_count': stub.resources, 'currency': 'CNY',
+                                    'monthly_records': stub.resource_records(body.get('bill_cycle_begin'), offset, limit)})
+            self._reply({'error_code': 'CBC.0100', 'error_msg': f'unknown path {url.path}'}, status=404)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start(customers=250, records_per_customer=4, port=0, resources=0):
+    """
+    在后台线程中启动桩服务
+
+    :return: (server, stub, endpoint)
+    """
+    stub = StubBSS(customers, records_per_customer, resources)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(stub))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stub, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stub of the BSS partner and enterprise APIs')
+    parser.add_argument('--port', type=int, default=18080, help='port to listen on')
+    parser.add_argument('--customers', type=int, default=250, help='number of synthetic sub-customers')
+    parser.add_argument('--records-per-customer', type=int, default=4, help='bill records per sub-customer')
+    parser.add_argument('--resources', type=int, default=5000, help='resources with a bill record per day')
+    args = parser.parse_args()
+
+    server, stub, endpoint = start(args.customers, args.records_per_customer, args.port, args.resources)
+    print(f"Stub BSS server listening on {endpoint} with {args.customers} sub-customers")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print(f"Requests served: {stub.requests}")
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,8 @@
 import hmac
 import hashlib
 import datetime
-import requests
 import logging
+from utils.transport import TransportRegistry
 
 logger = logging.getLogger(__name__)
 
@@ -114,7 +114,7 @@ class HWSAuth:
             
             logger.debug("Sending request to get token")
             # 发送请求获取Token
-            response = requests.post(auth_url, json=auth_data)
+            response = TransportRegistry.get_session(auth_url).post(auth_url, json=auth_data)
             response.raise_for_status()
             
             # 从响应头中获取Token
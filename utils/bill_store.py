@@ -0,0 +1,208 @@
+import os
+import sqlite3
+import threading
+import logging
+from contextlib import closing
+
+from prometheus_client import Counter
+
+from utils.data_dir import DataDirectory
+
+logger = logging.getLogger(__name__)
+
+# 定义模块级指标，避免重复注册
+# 写入本地聚合的账单明细记录数指标
+BILL_STORE_RECORDS_TOTAL = Counter(
+    'exporter_bill_store_records_total',
+    'Total number of resource bill records aggregated into the local bill store',
+    ['account']
+)
+
+# 默认数据库文件路径，相对于数据目录（exporter.data_dir）
+DEFAULT_BILL_STORE_PATH = 'resourcebills.db'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bill_rows (
+    account TEXT NOT NULL,
+    query_key TEXT NOT NULL,
+    cycle TEXT NOT NULL,
+    bill_date TEXT NOT NULL,
+    res_instance_id TEXT NOT NULL,
+    cloud_service_type TEXT NOT NULL,
+    enterprise_project_id TEXT NOT NULL,
+    resource_name TEXT NOT NULL,
+    amount REAL NOT NULL,
+    official_amount REAL NOT NULL,
+    records INTEGER NOT NULL,
+    PRIMARY KEY (account, query_key, bill_date, res_instance_id, cloud_service_type, enterprise_project_id)
+);
+CREATE INDEX IF NOT EXISTS bill_rows_cycle ON bill_rows (account, query_key, cycle);
+CREATE TABLE IF NOT EXISTS bill_cursors (
+    account TEXT NOT NULL,
+    query_key TEXT NOT NULL,
+    bill_date TEXT NOT NULL,
+    next_offset INTEGER NOT NULL,
+    total_count INTEGER NOT NULL,
+    complete INTEGER NOT NULL,
+    fetched_open INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (account, query_key, bill_date)
+);
+"""
+
+# 已有数据库的游标表缺少的列，旧游标视为在未结算时获取，结算后重新获取一次
+_CURSOR_MIGRATIONS = {
+    'fetched_open': "ALTER TABLE bill_cursors ADD COLUMN fetched_open INTEGER NOT NULL DEFAULT 1",
+}
+
+
+class BillDetailStore:
+    """
+    资源账单明细的本地聚合存储
+    按 (账号, 查询条件, 日期, 资源, 云服务类型, 企业项目) 累加金额，原始记录不落盘，
+    并为每一天保存分页游标和获取时这一天是否已结算，已结算的天采集中断后从上次获取到的位置继续，
+    在未结算时获取的天结算后重新获取一次。
+    account列保存凭证身份标识（见credential_identity）而不是账号显示名称，账号改名或重用名称不会读到其他账号的数据和游标。
+    同一文件路径在进程内只打开一个实例，多个账号共享。
+    """
+
+    _lock = threading.Lock()
+    _instances = {}
+
+    @classmethod
+    def open(cls, path=DEFAULT_BILL_STORE_PATH):
+        """
+        获取指定路径的存储实例，不存在时创建数据库文件
+
+        :param path: SQLite数据库文件路径，相对路径按数据目录解析
+        :return: BillDetailStore实例
+        """
+        path = DataDirectory.resolve(path)
+        with cls._lock:
+            instance = cls._instances.get(path)
+            if instance is None:
+                instance = cls(path)
+                cls._instances[path] = instance
+            return instance
+
+    def __init__(self, path):
+        """
+        :param path: SQLite数据库文件路径
+        """
+        self.path = path
+        self._write_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(bill_cursors)")}
+            for column, statement in _CURSOR_MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(statement)
+            conn.commit()
+        logger.debug(f"Bill detail store opened at {path}")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def cursor(self, account, query_key, bill_date):
+        """
+        获取某一天的分页游标
+
+        :param account: 凭证身份标识
+        :param query_key: 查询条件标识
+        :param bill_date: 日期（YYYY-MM-DD）
+        :return: (下一页偏移量, 总数, 是否已获取完整, 是否在未结算时获取)，没有游标时为None
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT next_offset, total_count, complete, fetched_open FROM bill_cursors "
+                "WHERE account = ? AND query_key = ? AND bill_date = ?",
+                (account, query_key, bill_date)
+            ).fetchone()
+        return (row[0], row[1], bool(row[2]), bool(row[3])) if row else None
+
+    def reset_day(self, account, query_key, bill_date):
+        """
+        删除某一天已聚合的数据和游标，用于从头重新获取未结算或在未结算时获取的天
+        """
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            for table in ('bill_rows', 'bill_cursors'):
+                conn.execute(f"DELETE FROM {table} WHERE account = ? AND query_key = ? AND bill_date = ?",
+                             (account, query_key, bill_date))
+
+    def add_page(self, account, query_key, cycle, bill_date, rows, next_offset, total_count, complete,
+                 fetched_open=False):
+        """
+        累加一页记录的聚合结果并推进游标，二者在同一事务中提交，中断后不会重复累加
+
+        :param account: 凭证身份标识
+        :param query_key: 查询条件标识
+        :param cycle: 账期（YYYY-MM）
+        :param bill_date: 日期（YYYY-MM-DD）
+        :param rows: (res_instance_id, cloud_service_type, enterprise_project_id) ->
+                     [resource_name, amount, official_amount, records] 字典
+        :param next_offset: 下一页偏移量
+        :param total_count: 接口返回的总数
+        :param complete: 这一天是否已获取完整
+        :param fetched_open: 获取时这一天是否未结算
+        """
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT INTO bill_rows (account, query_key, cycle, bill_date, res_instance_id, cloud_service_type, "
+                "enterprise_project_id, resource_name, amount, official_amount, records) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (account, query_key, bill_date, res_instance_id, cloud_service_type, enterprise_project_id) "
+                "DO UPDATE SET amount = amount + excluded.amount, official_amount = official_amount + excluded.official_amount, "
+                "records = records + excluded.records, resource_name = excluded.resource_name",
+                [(account, query_key, cycle, bill_date, *key, *values) for key, values in rows.items()]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO bill_cursors "
+                "(account, query_key, bill_date, next_offset, total_count, complete, fetched_open) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (account, query_key, bill_date, next_offset, total_count, int(complete), int(fetched_open))
+            )
+
+    def top_resources(self, account, query_key, cycle, limit):
+        """
+        按账期金额获取排名前N的资源
+
+        :return: (res_instance_id, cloud_service_type, enterprise_project_id, resource_name, amount, official_amount) 列表
+        """
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT res_instance_id, cloud_service_type, enterprise_project_id, MAX(resource_name), "
+                "SUM(amount) AS total, SUM(official_amount) FROM bill_rows "
+                "WHERE account = ? AND query_key = ? AND cycle = ? "
+                "GROUP BY res_instance_id, cloud_service_type, enterprise_project_id "
+                "ORDER BY total DESC LIMIT ?",
+                (account, query_key, cycle, limit)
+            ).fetchall()
+
+    def rollup(self, account, query_key, cycle, column):
+        """
+        按云服务类型或企业项目汇总账期金额
+
+        :param column: 汇总维度，cloud_service_type 或 enterprise_project_id
+        :return: (维度值, amount, official_amount, 资源数) 列表
+        """
+        if column not in ('cloud_service_type', 'enterprise_project_id'):
+            raise ValueError(f"Unsupported rollup column: {column}")
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                f"SELECT {column}, SUM(amount), SUM(official_amount), COUNT(DISTINCT res_instance_id) FROM bill_rows "
+                f"WHERE account = ? AND query_key = ? AND cycle = ? GROUP BY {column}",
+                (account, query_key, cycle)
+            ).fetchall()
+
+    def prune(self, account, query_key, keep_from):
+        """
+        删除早于指定日期的数据和游标
+
+        :param keep_from: 保留的第一天（YYYY-MM-DD）
+        """
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            for table in ('bill_rows', 'bill_cursors'):
+                conn.execute(f"DELETE FROM {table} WHERE account = ? AND query_key = ? AND bill_date < ?",
+                             (account, query_key, keep_from))
@@ -0,0 +1,171 @@
+import os
+import sqlite3
+import threading
+import logging
+from contextlib import closing
+
+from prometheus_client import Counter
+
+from utils.response_cache import normalize_params
+from utils.data_dir import DataDirectory
+
+logger = logging.getLogger(__name__)
+
+# 定义模块级指标，避免重复注册
+# 成本月份来源指标
+COST_HISTORY_MONTHS_TOTAL = Counter(
+    'exporter_cost_history_months_total',
+    'Total number of cost months served from the local history cache or queried from the API',
+    ['account', 'source']
+)
+
+# 默认缓存文件路径，相对于数据目录（exporter.data_dir）
+DEFAULT_HISTORY_PATH = 'listcosts_history.db'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cost_months (
+    account TEXT NOT NULL,
+    query_key TEXT NOT NULL,
+    month TEXT NOT NULL,
+    PRIMARY KEY (account, query_key, month)
+);
+CREATE TABLE IF NOT EXISTS cost_rows (
+    account TEXT NOT NULL,
+    query_key TEXT NOT NULL,
+    month TEXT NOT NULL,
+    dimension_key TEXT NOT NULL,
+    dimension_value TEXT NOT NULL,
+    amount REAL NOT NULL,
+    official_amount REAL NOT NULL,
+    PRIMARY KEY (account, query_key, month, dimension_key, dimension_value)
+);
+"""
+
+
+class CostHistoryCache:
+    """
+    已结算月份成本数据的本地持久化缓存
+    按 (凭证身份, 查询条件, 月份) 保存每个维度的月度成本，进程重启后仍然有效。
+    account列保存凭证身份标识（见credential_identity）而不是账号显示名称，账号改名或重用名称不会读到其他账号的数据。
+    同一文件路径在进程内只打开一个实例，多个账号和模块共享。
+    """
+
+    _lock = threading.Lock()
+    _instances = {}
+
+    @classmethod
+    def open(cls, path=DEFAULT_HISTORY_PATH):
+        """
+        获取指定路径的缓存实例，不存在时创建数据库文件
+
+        :param path: SQLite数据库文件路径，相对路径按数据目录解析
+        :return: CostHistoryCache实例
+        """
+        path = DataDirectory.resolve(path)
+        with cls._lock:
+            instance = cls._instances.get(path)
+            if instance is None:
+                instance = cls(path)
+                cls._instances[path] = instance
+            return instance
+
+    @staticmethod
+    def query_key(amount_type, cost_type, groupby, filters):
+        """
+        生成查询条件标识，查询条件不同的成本数据分开缓存
+
+        :param amount_type: 金额类型
+        :param cost_type: 成本类型
+        :param groupby: 分组条件列表
+        :param filters: 过滤条件列表
+        :return: 查询条件标识字符串
+        """
+        return normalize_params({
+            'amount_type': amount_type,
+            'cost_type': cost_type,
+            'groupby': groupby,
+            'filters': filters,
+        })
+
+    def __init__(self, path):
+        """
+        :param path: SQLite数据库文件路径
+        """
+        self.path = path
+        self._write_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+        logger.debug(f"Cost history cache opened at {path}")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def cached_months(self, account, query_key, months):
+        """
+        获取已缓存的月份
+
+        :param account: 凭证身份标识
+        :param query_key: 查询条件标识
+        :param months: 需要检查的月份列表（YYYY-MM）
+        :return: 已缓存月份的集合
+        """
+        if not months:
+            return set()
+        placeholders = ','.join('?' * len(months))
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT month FROM cost_months WHERE account = ? AND query_key = ? AND month IN ({placeholders})",
+                (account, query_key, *months)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def load(self, account, query_key, months):
+        """
+        读取缓存月份的成本数据
+
+        :param account: 凭证身份标识
+        :param query_key: 查询条件标识
+        :param months: 月份列表
+        :return: (dimension_key, dimension_value, month, amount, official_amount) 列表
+        """
+        if not months:
+            return []
+        placeholders = ','.join('?' * len(months))
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT dimension_key, dimension_value, month, amount, official_amount FROM cost_rows "
+                f"WHERE account = ? AND query_key = ? AND month IN ({placeholders})",
+                (account, query_key, *months)
+            ).fetchall()
+        logger.debug(f"Loaded {len(rows)} cached cost rows for {len(months)} months")
+        return rows
+
+    def store(self, account, query_key, months, rows, keep_from=None):
+        """
+        保存已结算月份的成本数据，覆盖这些月份原有的数据
+
+        :param account: 凭证身份标识
+        :param query_key: 查询条件标识
+        :param months: 需要标记为已缓存的月份列表，没有成本数据的月份也会被标记
+        :param rows: (dimension_key, dimension_value, month, amount, official_amount) 列表
+        :param keep_from: 早于该月份的缓存数据会被删除，为None时不清理
+        """
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            for month in months:
+                conn.execute("DELETE FROM cost_rows WHERE account = ? AND query_key = ? AND month = ?",
+                             (account, query_key, month))
+                conn.execute("INSERT OR REPLACE INTO cost_months (account, query_key, month) VALUES (?, ?, ?)",
+                             (account, query_key, month))
+            conn.executemany(
+                "INSERT OR REPLACE INTO cost_rows (account, query_key, dimension_key, dimension_value, month, "
+                "amount, official_amount) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(account, query_key, *row) for row in rows]
+            )
+            if keep_from:
+                for table in ('cost_rows', 'cost_months'):
+                    conn.execute(f"DELETE FROM {table} WHERE account = ? AND query_key = ? AND month < ?",
+                                 (account, query_key, keep_from))
+        logger.debug(f"Stored {len(rows)} cost rows for {len(months)} closed months")
@@ -0,0 +1,130 @@
+import math
+import logging
+from array import array
+from datetime import date, timedelta
+
+logger = logging.getLogger(__name__)
+
+_NAN = float('nan')
+
+
+class DailySeriesStore:
+    """
+    按天滚动窗口的内存序列存储
+    每个维度的金额保存在长度为窗口天数的定长数组中，按日期序号取模定位槽位，
+    窗口滑动时只清空滑出窗口的槽位，不需要重新获取或搬移整个窗口的数据。
+    """
+
+    def __init__(self, window_days):
+        """
+        :param window_days: 窗口天数
+        """
+        self.window_days = max(int(window_days), 1)
+        # 每个槽位当前保存的日期序号，0表示空槽位
+        self._slot_days = array('l', [0] * self.window_days)
+        # 维度 -> (金额数组, 官方金额数组)，没有数据的天为NaN
+        self._series = {}
+
+    def _slot(self, day):
+        return day.toordinal() % self.window_days
+
+    def _new_series(self):
+        return array('d', [_NAN] * self.window_days), array('d', [_NAN] * self.window_days)
+
+    def evict(self, window_begin):
+        """
+        清空早于窗口开始日期的槽位，并删除整个窗口都没有数据的维度
+
+        :param window_begin: 窗口开始日期
+        :return: (被清除的 (维度, 日期) 列表, 被删除的维度列表)
+        """
+        begin = window_begin.toordinal()
+        evicted = []
+        for slot, ordinal in enumerate(self._slot_days):
+            if not ordinal or ordinal >= begin:
+                continue
+            day = date.fromordinal(ordinal)
+            for dimension, (amounts, official_amounts) in self._series.items():
+                if not math.isnan(amounts[slot]):
+                    evicted.append((dimension, day))
+                amounts[slot] = official_amounts[slot] = _NAN
+            self._slot_days[slot] = 0
+
+        dropped = [dimension for dimension, (amounts, _) in self._series.items()
+                   if all(math.isnan(amount) for amount in amounts)]
+        for dimension in dropped:
+            del self._series[dimension]
+        if evicted or dropped:
+            logger.debug(f"Evicted {len(evicted)} daily values and {len(dropped)} empty series before {window_begin}")
+        return evicted, dropped
+
+    def first_missing(self, window_begin, open_begin):
+        """
+        获取需要查询的第一天：窗口内第一个没有数据的天，且不晚于未结算的第一天
+
+        :param window_begin: 窗口开始日期
+        :param open_begin: 未结算的第一天，此后的天每次都重新查询
+        :return: 日期
+        """
+        day = window_begin
+        while day < open_begin and self._slot_days[self._slot(day)] == day.toordinal():
+            day += timedelta(days=1)
+        return day
+
+    def reset(self, days):
+        """
+        将这些天标记为已获取并清空原有数据，随后通过set写入本次查询的结果
+
+        :param days: 日期列表
+        """
+        for day in days:
+            slot = self._slot(day)
+            self._slot_days[slot] = day.toordinal()
+            for amounts, official_amounts in self._series.values():
+                amounts[slot] = official_amounts[slot] = _NAN
+
+    def set(self, dimension, day, amount, official_amount):
+        """
+        写入一个维度某一天的金额，不在已获取天内的数据会被忽略
+
+        :return: 是否写入
+        """
+        slot = self._slot(day)
+        if self._slot_days[slot] != day.toordinal():
+            return False
+        series = self._series.get(dimension)
+        if series is None:
+            series = self._series[dimension] = self._new_series()
+        series[0][slot] = amount
+        series[1][slot] = official_amount
+        return True
+
+    def get(self, dimension, day):
+        """
+        读取一个维度某一天的金额
+
+        :return: (金额, 官方金额)，没有数据时为NaN
+        """
+        series = self._series.get(dimension)
+        slot = self._slot(day)
+        if series is None or self._slot_days[slot] != day.toordinal():
+            return _NAN, _NAN
+        return series[0][slot], series[1][slot]
+
+    def dimensions(self):
+        """
+        :return: 窗口内有数据的维度列表
+        """
+        return list(self._series)
+
+    def totals(self, dimension):
+        """
+        计算一个维度在整个窗口内的金额合计
+
+        :return: (金额合计, 官方金额合计)
+        """
+        amounts, official_amounts = self._series.get(dimension) or self._new_series()
+        return (
+            sum(amount for amount in amounts if not math.isnan(amount)),
+            sum(amount for amount in official_amounts if not math.isnan(amount))
+        )
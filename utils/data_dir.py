@@ -0,0 +1,39 @@
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 默认数据目录，相对路径按项目目录解析，与进程的工作目录无关
+DEFAULT_DATA_DIR = 'data'
+
+# 项目目录（app.py所在目录）
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class DataDirectory:
+    """
+    进程级数据目录（exporter.data_dir配置）
+    采集器的本地持久化文件（如成本历史缓存）的相对路径都按该目录解析
+    """
+
+    _path = os.path.join(PROJECT_DIR, DEFAULT_DATA_DIR)
+
+    @classmethod
+    def configure(cls, path=None):
+        """
+        设置数据目录
+
+        :param path: 数据目录，相对路径按项目目录解析，不传则使用项目目录下的data
+        """
+        cls._path = os.path.join(PROJECT_DIR, path or DEFAULT_DATA_DIR)
+        logger.debug(f"Data directory: {cls._path}")
+
+    @classmethod
+    def resolve(cls, path):
+        """
+        解析数据文件路径
+
+        :param path: 文件路径，绝对路径原样返回，相对路径按数据目录解析
+        :return: 绝对路径
+        """
+        return os.path.abspath(os.path.join(cls._path, path))
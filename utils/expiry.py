@@ -0,0 +1,212 @@
+import time
+import logging
+from array import array
+from bisect import bisect_left
+
+from utils.snapshot import SnapshotGauge, SnapshotRegistry
+
+try:
+    import numpy as np
+except ImportError:
+    # numpy为可选依赖，未安装时使用纯Python实现，结果相同
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# 定义模块级指标，避免重复注册
+# 按到期天数分桶的对象数指标（累计分桶，le为天数）
+EXPIRY_OBJECTS = SnapshotGauge(
+    'huaweicloud_expiry_objects',
+    'Number of objects expiring within le days (le="0" counts already expired objects)',
+    ['account', 'collector', 'group', 'le']
+)
+
+# 按到期天数分桶的金额指标（累计分桶，le为天数）
+EXPIRY_AMOUNT = SnapshotGauge(
+    'huaweicloud_expiry_amount',
+    'Amount of objects expiring within le days (le="0" counts already expired objects)',
+    ['account', 'collector', 'group', 'le']
+)
+
+# 默认分桶（天）
+DEFAULT_EXPIRY_BUCKETS = (7, 30, 90, 180, 365)
+
+
+class ExpiryHistogram:
+    """
+    采集器的到期时间分桶统计
+    每个对象的到期时间、金额和分组以列式保存在连续的数组中，对象按标识原地更新，
+    每个采集周期结束时一次性计算各分组在各到期天数内的累计对象数和金额，替代逐对象的到期时间指标做"未来N天到期"查询。
+    安装了numpy时在数组上做向量化计算，否则逐行计算。只在采集线程中使用，不加锁
+    """
+
+    def __init__(self, collector, buckets=DEFAULT_EXPIRY_BUCKETS, amounts=False):
+        """
+        :param collector: 所属采集器
+        :param buckets: 分桶上界（天），自动加上0（已到期）和+Inf
+        :param amounts: 是否输出金额指标
+        """
+        self.collector = collector
+        self.bounds = [0.0] + sorted(float(days) for days in buckets if float(days) > 0)
+        self.le_labels = [f"{days:g}" for days in self.bounds] + ['+Inf']
+        self.amounts = amounts
+        # 对象标识 -> 行号，删除对象时用最后一行填补，数组保持连续
+        self._index = {}
+        self._keys = []
+        self._groups = array('q')
+        self._expires = array('d')
+        self._values = array('d')
+        # 本周期是否出现过，未出现的对象在发布时删除
+        self._seen = bytearray()
+        self._group_ids = {}
+        self._group_names = []
+        # 上次输出的分组
+        self._exposed = set()
+
+    @classmethod
+    def from_config(cls, collector, expire_family=None, amounts=False):
+        """
+        根据模块配置expiry_histogram创建分桶统计，未启用时返回None
+
+        :param collector: 所属采集器
+        :param expire_family: 逐对象的到期时间指标族，配置replace_series时不再输出
+        :param amounts: 是否输出金额指标
+        :return: ExpiryHistogram或None
+        """
+        config = collector.module_config.get('expiry_histogram')
+        if not config or (isinstance(config, dict) and not config.get('enabled', True)):
+            return None
+        config = config if isinstance(config, dict) else {}
+        histogram = cls(collector, config.get('buckets') or DEFAULT_EXPIRY_BUCKETS, amounts)
+        if expire_family is not None and config.get('replace_series', False):
+            collector.metric_rules.exclude(expire_family)
+        logger.debug(f"Expiry histogram enabled for {collector.module_name} of account {collector.name}, "
+                     f"buckets: {histogram.le_labels}, numpy: {np is not None}")
+        return histogram
+
+    def observe(self, key, group, expire_timestamp, amount=0.0):
+        """
+        记录或更新一个对象的到期时间
+
+        :param key: 对象标识，如资源ID
+        :param group: 分组，如云服务类型或产品名称
+        :param expire_timestamp: 到期时间（Unix时间戳）
+        :param amount: 金额，如储值卡余额
+        """
+        group_id = self._group_ids.get(group)
+        if group_id is None:
+            group_id = self._group_ids[group] = len(self._group_names)
+            self._group_names.append(group)
+        row = self._index.get(key)
+        if row is None:
+            self._index[key] = len(self._keys)
+            self._keys.append(key)
+            self._groups.append(group_id)
+            self._expires.append(float(expire_timestamp))
+            self._values.append(float(amount or 0.0))
+            self._seen.append(1)
+        else:
+            self._groups[row] = group_id
+            self._expires[row] = float(expire_timestamp)
+            self._values[row] = float(amount or 0.0)
+            self._seen[row] = 1
+
+    def retain(self, key):
+        """
+        对象数据未变化、未重新解析时保留上次记录的到期时间
+        """
+        row = self._index.get(key)
+        if row is not None:
+            self._seen[row] = 1
+
+    def discard(self, key):
+        """
+        删除一个对象，如对象已没有到期时间
+        """
+        row = self._index.pop(key, None)
+        if row is None:
+            return
+        last = len(self._keys) - 1
+        if row != last:
+            moved = self._keys[last]
+            self._keys[row] = moved
+            self._index[moved] = row
+            self._groups[row] = self._groups[last]
+            self._expires[row] = self._expires[last]
+            self._values[row] = self._values[last]
+            self._seen[row] = self._seen[last]
+        self._keys.pop()
+        self._groups.pop()
+        self._expires.pop()
+        self._values.pop()
+        self._seen.pop()
+
+    def publish(self, now=None):
+        """
+        删除本周期未出现的对象，计算分桶结果并更新指标，在采集成功结束时调用
+        本周期有响应未变化而跳过处理或请求失败时不删除未出现的对象
+
+        :param now: 当前时间（Unix时间戳），默认为当前时间
+        """
+        if not SnapshotRegistry.partial():
+            for key in [key for key, row in self._index.items() if not self._seen[row]]:
+                self.discard(key)
+        self._seen = bytearray(len(self._keys))
+
+        now = time.time() if now is None else now
+        counts, values = self._compute(now)
+        account = self.collector.name
+        module = self.collector.module_name
+        groups = set()
+        for group_id, group in enumerate(self._group_names):
+            if not counts[group_id][-1]:
+                continue
+            groups.add(group)
+            for le, count, value in zip(self.le_labels, counts[group_id], values[group_id]):
+                EXPIRY_OBJECTS.labels(account, module, group, le).set(count)
+                if self.amounts:
+                    EXPIRY_AMOUNT.labels(account, module, group, le).set(value)
+
+        # 删除已没有对象的分组
+        for group in self._exposed - groups:
+            for le in self.le_labels:
+                EXPIRY_OBJECTS.remove(account, module, group, le)
+                if self.amounts:
+                    EXPIRY_AMOUNT.remove(account, module, group, le)
+        self._exposed = groups
+        logger.debug(f"Published expiry histogram of {len(self._keys)} objects in {len(groups)} groups "
+                     f"for {module} of account {account}")
+
+    def _compute(self, now):
+        """
+        :return: (各分组的累计对象数列表, 各分组的累计金额列表)，下标为分组ID和分桶
+        """
+        width = len(self.le_labels)
+        size = len(self._group_names) * width
+        if np is not None and self._keys:
+            groups = np.frombuffer(self._groups, dtype=np.int64)
+            days = (np.frombuffer(self._expires, dtype=np.float64) - now) / 86400
+            cells = groups * width + np.searchsorted(np.asarray(self.bounds), days, side='left')
+            counts = np.bincount(cells, minlength=size).reshape(-1, width).cumsum(axis=1)
+            values = np.bincount(cells, weights=np.frombuffer(self._values, dtype=np.float64),
+                                 minlength=size).reshape(-1, width).cumsum(axis=1)
+            return counts.tolist(), values.tolist()
+
+        counts = [0] * size
+        values = [0.0] * size
+        bounds = self.bounds
+        for group_id, expire, value in zip(self._groups, self._expires, self._values):
+            cell = group_id * width + bisect_left(bounds, (expire - now) / 86400)
+            counts[cell] += 1
+            values[cell] += value
+        return [self._cumulative(counts[i:i + width]) for i in range(0, size, width)], \
+            [self._cumulative(values[i:i + width]) for i in range(0, size, width)]
+
+    @staticmethod
+    def _cumulative(row):
+        total = 0
+        result = []
+        for value in row:
+            total += value
+            result.append(total)
+        return result
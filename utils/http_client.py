@@ -1,31 +1,48 @@
-import requests
-import time
 from utils.auth import HWSAuth
+from utils.retry import RetryPolicy
+from utils.transport import TransportRegistry
+from utils.response_cache import ResponseCache, credential_identity
+from urllib.parse import urlparse
 import logging
+import requests
 
 logger = logging.getLogger(__name__)
 
 
+def _copy_response(response):
+    """
+    复制缓存的响应对象，响应体内容不可变，可以共享；响应头等可变属性每个调用方各自一份
+    """
+    clone = requests.Response()
+    clone.__setstate__(response.__getstate__())
+    clone.headers = response.headers.copy()
+    return clone
+
+
 class HTTPClient:
     """
     HTTP客户端工具类，用于向华为云API发送请求
     """
     
-    def __init__(self, timeout=30, retries=3):
+    def __init__(self, timeout=30, retries=None, retry_policy=None):
         """
         初始化HTTP客户端
         
         :param timeout: 请求超时时间（秒）
-        :param retries: 请求重试次数
+        :param retries: 最大尝试次数，不传则使用重试策略中的配置
+        :param retry_policy: 重试策略，不传则使用进程级默认策略
         """
         self.timeout = timeout
-        self.retries = retries
-        self.session = requests.Session()
+        self.retry_policy = retry_policy or RetryPolicy.default()
+        if retries is not None:
+            self.retry_policy = self.retry_policy.with_max_attempts(retries)
+        self.retries = self.retry_policy.max_attempts
         
-        logger.debug(f"HTTPClient initialized with timeout: {timeout}, retries: {retries}")
+        logger.debug(f"HTTPClient initialized with timeout: {timeout}, retries: {self.retries}")
         
     def get(self, url, auth_type='aksk', ak=None, sk=None, iam_endpoint=None, domain_name=None, 
-            username=None, password=None, project_id=None, region=None, service=None, params=None):
+            username=None, password=None, project_id=None, region=None, service=None, params=None,
+            stream=False):
         """
         发送GET请求
         
@@ -41,45 +58,53 @@ class HTTPClient:
         :param region: 区域
         :param service: 服务名称
         :param params: 请求参数
-        :return: 响应对象
+        :param stream: 是否以流式方式读取响应体，开启后由调用方负责读取并关闭响应，且不使用响应缓存
+        :return: 响应对象，使用响应缓存时返回缓存响应的副本
         """
         logger.debug(f"Sending GET request to URL: {url}")
         logger.debug(f"Auth type: {auth_type}, Params: {params}")
         
-        headers = {}
-        if auth_type == 'aksk' and ak and sk and region and service:
-            logger.debug(f"Using AK/SK auth for service: {service}, region: {region}")
-            headers = HWSAuth.get_aksk_auth_headers(ak, sk, region, service)
-        elif auth_type == 'token' and iam_endpoint and domain_name and username and password:
-            logger.debug(f"Using Token auth with IAM endpoint: {iam_endpoint}")
-            headers = HWSAuth.get_token_auth_headers(iam_endpoint, domain_name, username, password, project_id)
-        else:
-            logger.warning(f"Invalid authentication configuration for auth_type: {auth_type}")
+        def send(headers):
+            session = TransportRegistry.get_session(url)
+            response = session.get(
+                url, 
+                headers=headers, 
+                params=params, 
+                timeout=self.timeout,
+                stream=stream
+            )
+            logger.debug(f"GET request returned status code: {response.status_code}")
+            response.raise_for_status()
+            return response
+        
+        def load():
+            # 认证头（包括Token认证时获取Token）只在缓存未命中时生成
+            headers = {}
+            if auth_type == 'aksk' and ak and sk and region and service:
+                logger.debug(f"Using AK/SK auth for service: {service}, region: {region}")
+                headers = HWSAuth.get_aksk_auth_headers(ak, sk, region, service)
+            elif auth_type == 'token' and iam_endpoint and domain_name and username and password:
+                logger.debug(f"Using Token auth with IAM endpoint: {iam_endpoint}")
+                headers = HWSAuth.get_token_auth_headers(iam_endpoint, domain_name, username, password, project_id)
+            else:
+                logger.warning(f"Invalid authentication configuration for auth_type: {auth_type}")
+            
+            response = self.retry_policy.execute(lambda: send(headers), idempotent=True, operation=f"GET {url}")
+            # 流式响应的内容由调用方读取，不计算大小
+            return response, 0 if stream else len(response.content)
         
-        for attempt in range(self.retries):
-            try:
-                logger.debug(f"Attempt {attempt+1}/{self.retries} to send GET request")
-                response = self.session.get(
-                    url, 
-                    headers=headers, 
-                    params=params, 
-                    timeout=self.timeout
-                )
-                logger.debug(f"GET request successful with status code: {response.status_code}")
-                response.raise_for_status()
-                return response
-            except requests.exceptions.RequestException as e:
-                logger.warning(f"Attempt {attempt+1}/{self.retries} failed: {e}")
-                if attempt < self.retries - 1:
-                    sleep_time = 2 ** attempt
-                    logger.debug(f"Retrying in {sleep_time} seconds")
-                    time.sleep(sleep_time)  # 指数退避
-                else:
-                    logger.error(f"All {self.retries} attempts failed. Raising exception.")
-                    raise e
+        # 流式响应只能读取一次，不经过响应缓存
+        if stream:
+            return load()[0]
+        
+        identity = credential_identity(auth_type, ak, iam_endpoint, domain_name, username, project_id, region)
+        operation = f"GET {urlparse(url).path}"
+        return ResponseCache.get_or_load(identity, operation, {'url': url, 'params': params}, load,
+                                         copier=_copy_response)
                     
     def post(self, url, auth_type='aksk', ak=None, sk=None, iam_endpoint=None, domain_name=None, 
-             username=None, password=None, project_id=None, region=None, service=None, data=None, json=None):
+             username=None, password=None, project_id=None, region=None, service=None, data=None, json=None,
+             idempotent=False):
         """
         发送POST请求
         
@@ -96,6 +121,7 @@ class HTTPClient:
         :param service: 服务名称
         :param data: 表单数据
         :param json: JSON数据
+        :param idempotent: 请求是否幂等（如查询类POST接口），非幂等请求失败后不会重试
         :return: 响应对象
         """
         logger.debug(f"Sending POST request to URL: {url}")
@@ -112,25 +138,18 @@ class HTTPClient:
         else:
             logger.warning(f"Invalid authentication configuration for auth_type: {auth_type}")
         
-        for attempt in range(self.retries):
-            try:
-                logger.debug(f"Attempt {attempt+1}/{self.retries} to send POST request")
-                response = self.session.post(
-                    url, 
-                    headers=headers,
-                    data=data,
-                    json=json,
-                    timeout=self.timeout
-                )
-                logger.debug(f"POST request successful with status code: {response.status_code}")
-                response.raise_for_status()
-                return response
-            except requests.exceptions.RequestException as e:
-                logger.warning(f"Attempt {attempt+1}/{self.retries} failed: {e}")
-                if attempt < self.retries - 1:
-                    sleep_time = 2 ** attempt
-                    logger.debug(f"Retrying in {sleep_time} seconds")
-                    time.sleep(sleep_time)  # 指数退避
-                else:
-                    logger.error(f"All {self.retries} attempts failed. Raising exception.")
-                    raise e
\ No newline at end of file
+        def send():
+            session = TransportRegistry.get_session(url)
+            response = session.post(
+                url, 
+                headers=headers,
+                data=data,
+                json=json,
+                timeout=self.timeout
+            )
+            logger.debug(f"POST request returned status code: {response.status_code}")
+            response.raise_for_status()
+            return response
+        
+        # POST请求默认视为非幂等，只有调用方明确声明幂等时才会重试
+        return self.retry_policy.execute(send, idempotent=idempotent, operation=f"POST {url}")
@@ -0,0 +1,204 @@
+import codecs
+import json
+import re
+import time
+import logging
+
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# 定义模块级指标，避免重复注册
+# 流式解析读取的字节数指标
+STREAM_BYTES_TOTAL = Counter(
+    'exporter_stream_bytes_total',
+    'Total number of response bytes decoded by the streaming JSON parser',
+    ['source']
+)
+
+# 流式解析产出的记录数指标
+STREAM_RECORDS_TOTAL = Counter(
+    'exporter_stream_records_total',
+    'Total number of records yielded by the streaming JSON parser',
+    ['source']
+)
+
+# 最近一次流式解析的字节吞吐指标
+STREAM_BYTES_PER_SECOND = Gauge(
+    'exporter_stream_bytes_per_second',
+    'Bytes per second of the last streamed response',
+    ['source']
+)
+
+# 最近一次流式解析的记录吞吐指标
+STREAM_RECORDS_PER_SECOND = Gauge(
+    'exporter_stream_records_per_second',
+    'Records per second of the last streamed response',
+    ['source']
+)
+
+# 每次从响应中读取的字节数
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class JSONArrayStream:
+    """
+    流式解析JSON对象响应中的一个顶层数组，边下载边逐条产出数组元素
+
+    内存占用只与读取块大小和单条记录大小有关，与整个响应的大小无关。
+    响应中其他顶层字段（如 total_count、currency）在迭代结束后可通过 meta 获取。
+    """
+
+    def __init__(self, response, array_key, source, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        :param response: 以 stream=True 发出的 requests.Response 对象
+        :param array_key: 需要逐条解析的顶层数组字段名，如 domains、data、cost_data
+        :param source: 数据来源名称，用于指标标签
+        :param chunk_size: 每次读取的字节数
+        """
+        self.meta = {}
+        self.bytes_read = 0
+        self.records = 0
+        self._response = response
+        self._array_key = array_key
+        self._source = source
+        self._chunks = response.iter_content(chunk_size=chunk_size)
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self):
+        start = time.monotonic()
+        try:
+            yield from self._parse_object()
+        finally:
+            self._response.close()
+            self._report(time.monotonic() - start)
+
+    def _report(self, elapsed):
+        """
+        记录本次解析的字节数、记录数和吞吐
+        """
+        STREAM_BYTES_TOTAL.labels(source=self._source).inc(self.bytes_read)
+        STREAM_RECORDS_TOTAL.labels(source=self._source).inc(self.records)
+        if elapsed > 0:
+            STREAM_BYTES_PER_SECOND.labels(source=self._source).set(self.bytes_read / elapsed)
+            STREAM_RECORDS_PER_SECOND.labels(source=self._source).set(self.records / elapsed)
+        logger.debug(f"Streamed {self.records} records ({self.bytes_read} bytes) from {self._source} "
+                     f"in {elapsed:.3f}s")
+
+    def _read_more(self):
+        """
+        读取下一个数据块，丢弃已解析的部分
+
+        :return: 是否读到了新数据
+        """
+        if self._eof:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            self._buf = self._buf[self._pos:] + self._utf8.decode(b'', final=True)
+        else:
+            self.bytes_read += len(chunk)
+            self._buf = self._buf[self._pos:] + self._utf8.decode(chunk)
+        self._pos = 0
+        return True
+
+    def _peek(self):
+        """
+        跳过空白字符，返回下一个字符，数据结束时返回None
+        """
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._read_more():
+                return None
+
+    def _consume(self, char):
+        """
+        消费一个预期的结构字符
+        """
+        actual = self._peek()
+        if actual != char:
+            raise ValueError(f"Malformed JSON stream from {self._source}: expected {char!r}, got {actual!r}")
+        self._pos += 1
+
+    def _decode_value(self):
+        """
+        解析下一个完整的JSON值，数据不足时继续读取
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # 数值等值只有在后面还有字符时才能确定已经完整
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._read_more()
+
+    def _parse_object(self):
+        """
+        解析顶层对象，目标数组逐条产出，其余字段保存到meta
+        """
+        self._consume('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self._decode_value()
+            self._consume(':')
+            if key == self._array_key and self._peek() == '[':
+                self._pos += 1
+                yield from self._parse_array()
+            else:
+                self.meta[key] = self._decode_value()
+            if self._peek() == ',':
+                self._pos += 1
+                continue
+            self._consume('}')
+            return
+
+    def _parse_array(self):
+        """
+        逐条解析目标数组中的元素
+        """
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            record = self._decode_value()
+            self.records += 1
+            yield record
+            if self._peek() == ',':
+                self._pos += 1
+                continue
+            self._consume(']')
+            return
+
+
+class JSONRecords:
+    """
+    已完整解析的响应，提供与JSONArrayStream一致的迭代和meta接口
+    """
+
+    def __init__(self, data, array_key):
+        """
+        :param data: 响应数据字典
+        :param array_key: 记录所在的顶层数组字段名
+        """
+        self.meta = {key: value for key, value in data.items() if key != array_key}
+        self._records = data.get(array_key) or []
+        self.records = len(self._records)
+
+    def __iter__(self):
+        return iter(self._records)
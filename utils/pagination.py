@@ -0,0 +1,92 @@
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# 定义模块级指标，避免重复注册
+# 分页请求数指标
+PAGINATION_PAGES_TOTAL = Counter(
+    'exporter_pagination_pages_total',
+    'Total number of result pages fetched by paginated collectors',
+    ['operation']
+)
+
+# 分页采集完整度指标
+PAGINATION_COMPLETENESS_RATIO = Gauge(
+    'exporter_pagination_completeness_ratio',
+    'Ratio of records fetched to the total count reported by the API in the last collection',
+    ['collector', 'account', 'operation']
+)
+
+# 默认并发页数
+DEFAULT_MAX_CONCURRENCY = 4
+
+
+def iter_offset_pages(fetch_page, limit, partitions=None, max_workers=DEFAULT_MAX_CONCURRENCY,
+                      total_key='total_count', operation=None):
+    """
+    按偏移量并发获取所有分页
+
+    先获取每个分区的第一页，调用方处理完第一页后根据返回的总数并发获取剩余页。
+    同时在途和已返回未处理的页数不超过max_workers，内存占用与总页数无关。
+    页面在调用方线程中逐个产出，指标更新不会发生在工作线程中。
+
+    :param fetch_page: 获取单页的函数，以 (partition, offset) 调用，返回带有meta和records属性的记录集合
+                       （JSONRecords或JSONArrayStream）
+    :param limit: 每页条数
+    :param partitions: 分区列表，每个分区独立分页，不传则只有一个分区None
+    :param max_workers: 最大并发请求数
+    :param total_key: 响应中总数字段名
+    :param operation: 操作名称，用于指标标签
+    :return: (partition, offset, page) 的生成器，调用方必须在取下一页前迭代完当前页
+    """
+    partitions = partitions or [None]
+    max_workers = max(int(max_workers), 1)
+    pending = deque((partition, 0) for partition in partitions)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='page-fetch') as pool:
+        def fill():
+            while pending and len(running) < max_workers:
+                partition, offset = pending.popleft()
+                running[pool.submit(fetch_page, partition, offset)] = (partition, offset)
+
+        fill()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                partition, offset = running.pop(future)
+                page = future.result()
+                PAGINATION_PAGES_TOTAL.labels(operation=operation).inc()
+                logger.debug(f"Fetched {operation} page at offset {offset} for partition {partition}")
+                yield partition, offset, page
+
+                # 第一页处理完成后才能拿到流式响应中的总数，据此安排剩余页
+                if offset == 0:
+                    total = int(page.meta.get(total_key) or 0)
+                    remaining = list(range(limit, total, limit))
+                    logger.debug(f"{operation} partition {partition} has {total} records, "
+                                 f"fetching {len(remaining)} more pages")
+                    pending.extend((partition, next_offset) for next_offset in remaining)
+            fill()
+
+
+def report_completeness(collector, account, operation, fetched, total):
+    """
+    记录分页采集的完整度，获取的记录数少于API返回的总数时记录警告
+
+    :param collector: 收集器名称
+    :param account: 账号名称
+    :param operation: 操作名称
+    :param fetched: 实际获取的记录数
+    :param total: API返回的总数
+    """
+    ratio = fetched / total if total else 1.0
+    PAGINATION_COMPLETENESS_RATIO.labels(collector=collector, account=account, operation=operation).set(ratio)
+    if fetched < total:
+        logger.warning(f"{operation} for account {account} fetched {fetched} of {total} records")
+    else:
+        logger.debug(f"{operation} for account {account} fetched {fetched} of {total} records")
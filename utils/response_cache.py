@@ -0,0 +1,236 @@
+import copy
+import hashlib
+import json
+import threading
+import time
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# 定义模块级指标，避免重复注册
+# 响应缓存请求数指标
+RESPONSE_CACHE_REQUESTS_TOTAL = Counter(
+    'exporter_response_cache_requests_total',
+    'Total number of response cache lookups by operation and result',
+    ['operation', 'result']
+)
+
+# 响应缓存命中率指标
+RESPONSE_CACHE_HIT_RATIO = Gauge(
+    'exporter_response_cache_hit_ratio',
+    'Ratio of response cache lookups served from cache or an in-flight request'
+)
+
+# 响应缓存占用字节数指标
+RESPONSE_CACHE_BYTES = Gauge(
+    'exporter_response_cache_bytes',
+    'Approximate number of response bytes held in the response cache'
+)
+
+# 响应缓存条目数指标
+RESPONSE_CACHE_ENTRIES = Gauge(
+    'exporter_response_cache_entries',
+    'Number of entries held in the response cache'
+)
+
+# 响应缓存淘汰数指标
+RESPONSE_CACHE_EVICTIONS_TOTAL = Counter(
+    'exporter_response_cache_evictions_total',
+    'Total number of response cache entries evicted by reason',
+    ['reason']
+)
+
+# 响应缓存默认配置，默认关闭，开启后只缓存在ttl中配置了缓存时间的操作
+DEFAULT_CACHE_SETTINGS = {
+    'enabled': False,                 # 是否启用响应缓存
+    'default_ttl': 0,                 # 未单独配置的操作的缓存时间（秒），0表示不缓存
+    'ttl': {},                        # 按操作名配置缓存时间，如 list_costs: 3600、"GET /v2/domains": 300
+    'max_bytes': 64 * 1024 * 1024,    # 缓存占用内存上限（字节），超出后按LRU淘汰
+}
+
+
+def credential_identity(*parts):
+    """
+    根据凭证信息生成缓存键中的身份标识，避免在缓存键中保存明文凭证
+
+    :param parts: 用于区分身份的凭证字段，如ak，或iam端点、账号名和用户名
+    :return: 凭证摘要字符串
+    """
+    return hashlib.sha256('\0'.join(str(part or '') for part in parts).encode('utf-8')).hexdigest()[:16]
+
+
+def normalize_params(params):
+    """
+    将请求参数规范化为稳定的字符串，参数顺序不同的相同请求得到相同的缓存键
+    """
+    return json.dumps(params, sort_keys=True, default=str, separators=(',', ':'))
+
+
+class _CacheEntry:
+    """
+    缓存条目
+    """
+    __slots__ = ('value', 'size', 'expires_at')
+
+    def __init__(self, value, size, expires_at):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """
+    进程级响应缓存
+    按 (凭证身份, 操作名, 规范化参数) 缓存查询结果，每个操作有独立的TTL，总大小受内存上限约束并按LRU淘汰。
+    相同键的并发请求只会有一个真正发出，其余调用方等待该请求的结果（singleflight）。
+    缓存的结果不直接交给调用方，每个调用方得到一个副本，调用方修改结果不会影响缓存和其他调用方。
+    """
+
+    _lock = threading.Lock()
+    _entries = OrderedDict()
+    _inflight = {}
+    _settings = dict(DEFAULT_CACHE_SETTINGS)
+    _bytes = 0
+    _hits = 0
+    _lookups = 0
+
+    @classmethod
+    def configure(cls, config=None):
+        """
+        根据配置设置响应缓存参数，并清空已有缓存
+
+        :param config: exporter.cache配置字典
+        """
+        settings = dict(DEFAULT_CACHE_SETTINGS)
+        settings.update(config or {})
+        settings['ttl'] = dict(settings.get('ttl') or {})
+        logger.debug(f"Configuring response cache with settings: {settings}")
+
+        with cls._lock:
+            cls._settings = settings
+        cls.clear()
+
+    @classmethod
+    def clear(cls):
+        """
+        清空缓存
+        """
+        with cls._lock:
+            cls._entries.clear()
+            cls._bytes = 0
+        RESPONSE_CACHE_BYTES.set(0)
+        RESPONSE_CACHE_ENTRIES.set(0)
+
+    @classmethod
+    def get_ttl(cls, operation):
+        """
+        获取操作的缓存时间
+
+        :param operation: 操作名
+        :return: 缓存秒数，0表示不缓存
+        """
+        if not cls._settings['enabled']:
+            return 0
+        return float(cls._settings['ttl'].get(operation, cls._settings['default_ttl']))
+
+    @classmethod
+    def get_or_load(cls, identity, operation, params, loader, copier=copy.deepcopy):
+        """
+        从缓存获取结果，未命中时调用loader加载并写入缓存
+
+        :param identity: 凭证身份标识，见 credential_identity
+        :param operation: 操作名，用于选择TTL和指标标签
+        :param params: 请求参数，会被规范化后作为缓存键的一部分
+        :param loader: 无参数的加载函数，返回 (结果, 结果大小字节数)
+        :param copier: 复制结果的函数，缓存的结果经过复制后才交给调用方，默认深拷贝
+        :return: 结果（使用缓存时为副本）
+        """
+        ttl = cls.get_ttl(operation)
+        if ttl <= 0:
+            return loader()[0]
+
+        key = (identity, operation, normalize_params(params))
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                cls._remove(key, 'expired')
+                entry = None
+            if entry is not None:
+                cls._entries.move_to_end(key)
+                cls._record_lookup(operation, 'hit')
+            else:
+                future = cls._inflight.get(key)
+                owner = future is None
+                if owner:
+                    future = Future()
+                    cls._inflight[key] = future
+                cls._record_lookup(operation, 'miss' if owner else 'coalesced')
+
+        if entry is not None:
+            logger.debug(f"Response cache hit for {operation}")
+            return copier(entry.value)
+
+        if not owner:
+            logger.debug(f"Waiting for in-flight {operation} request")
+            return copier(future.result())
+
+        try:
+            value, size = loader()
+        except BaseException as e:
+            # 失败的结果不缓存，等待中的调用方收到同样的异常
+            with cls._lock:
+                cls._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with cls._lock:
+            cls._inflight.pop(key, None)
+            cls._store(key, _CacheEntry(value, size, time.monotonic() + ttl))
+        future.set_result(value)
+        logger.debug(f"Response cache stored {operation} ({size} bytes, ttl {ttl}s)")
+        return copier(value)
+
+    @classmethod
+    def _record_lookup(cls, operation, result):
+        """
+        记录一次缓存查询结果并更新命中率，调用方需持有锁
+        """
+        cls._lookups += 1
+        if result != 'miss':
+            cls._hits += 1
+        RESPONSE_CACHE_REQUESTS_TOTAL.labels(operation=operation, result=result).inc()
+        RESPONSE_CACHE_HIT_RATIO.set(cls._hits / cls._lookups)
+
+    @classmethod
+    def _store(cls, key, entry):
+        """
+        写入缓存条目并按LRU淘汰超出内存上限的条目，调用方需持有锁
+        """
+        max_bytes = int(cls._settings['max_bytes'])
+        if entry.size > max_bytes:
+            logger.debug(f"Response for {key[1]} is larger than the cache limit, not caching")
+            return
+        if key in cls._entries:
+            cls._remove(key, None)
+        cls._entries[key] = entry
+        cls._bytes += entry.size
+        while cls._bytes > max_bytes:
+            cls._remove(next(iter(cls._entries)), 'size')
+        RESPONSE_CACHE_BYTES.set(cls._bytes)
+        RESPONSE_CACHE_ENTRIES.set(len(cls._entries))
+
+    @classmethod
+    def _remove(cls, key, reason):
+        """
+        删除缓存条目，调用方需持有锁
+        """
+        entry = cls._entries.pop(key)
+        cls._bytes -= entry.size
+        if reason:
+            RESPONSE_CACHE_EVICTIONS_TOTAL.labels(reason=reason).inc()
+        RESPONSE_CACHE_BYTES.set(cls._bytes)
+        RESPONSE_CACHE_ENTRIES.set(len(cls._entries))
@@ -0,0 +1,235 @@
+import random
+import threading
+import time
+import logging
+from email.utils import parsedate_to_datetime
+
+import requests
+from huaweicloudsdkcore.exceptions import exceptions as sdk_exceptions
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# 定义模块级指标，避免重复注册
+# 重试次数指标
+RETRIES_TOTAL = Counter(
+    'exporter_retries_total',
+    'Total number of retried API requests by reason',
+    ['reason']
+)
+
+# 因重试预算耗尽而放弃的重试次数指标
+RETRY_BUDGET_EXHAUSTED_TOTAL = Counter(
+    'exporter_retry_budget_exhausted_total',
+    'Total number of retries skipped because the per-cycle retry budget was exhausted',
+    ['reason']
+)
+
+# 当前采集周期剩余重试预算指标
+RETRY_BUDGET_REMAINING = Gauge(
+    'exporter_retry_budget_remaining',
+    'Remaining retries in the current collection cycle'
+)
+
+# 重试策略默认配置
+DEFAULT_RETRY_SETTINGS = {
+    'max_attempts': 3,                                   # 最大尝试次数（含首次请求）
+    'base_delay': 0.5,                                   # 退避基础时间（秒）
+    'max_delay': 30,                                     # 单次退避最大时间（秒）
+    'retry_statuses': [429, 500, 502, 503, 504],         # 允许重试的HTTP状态码
+    'retry_exceptions': ['connection_error', 'timeout'],  # 允许重试的异常类型
+    'retry_non_idempotent': False,                       # 是否重试非幂等请求
+    'respect_retry_after': True,                         # 是否遵循Retry-After响应头
+    'max_retry_after': 120,                              # Retry-After最大等待时间（秒）
+    'budget_per_cycle': 50,                              # 每个采集周期的重试预算，0表示不限制
+}
+
+
+class RetryBudget:
+    """
+    每个采集周期共享的重试预算，防止故障期间重试风暴放大请求量
+    """
+
+    def __init__(self, limit):
+        """
+        :param limit: 每个周期允许的重试次数，0表示不限制
+        """
+        self._lock = threading.Lock()
+        self.limit = limit
+        self.remaining = limit
+        RETRY_BUDGET_REMAINING.set(limit)
+
+    def reset(self):
+        """
+        新的采集周期开始时重置预算
+        """
+        with self._lock:
+            self.remaining = self.limit
+        RETRY_BUDGET_REMAINING.set(self.limit)
+        logger.debug(f"Retry budget reset to {self.limit}")
+
+    def try_acquire(self):
+        """
+        尝试消耗一次重试预算
+
+        :return: 是否允许重试
+        """
+        if not self.limit:
+            return True
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            remaining = self.remaining
+        RETRY_BUDGET_REMAINING.set(remaining)
+        return True
+
+
+class RetryPolicy:
+    """
+    统一重试策略
+    只对指定的状态码和异常类型重试，使用全抖动指数退避，遵循Retry-After，并受每周期重试预算限制。
+    同时适用于HTTPClient和华为云SDK调用。
+    """
+
+    _default = None
+
+    def __init__(self, settings=None, budget=None):
+        """
+        :param settings: 重试配置字典，未配置的项使用默认值
+        :param budget: 共享的重试预算，不传则按配置新建
+        """
+        self.settings = dict(DEFAULT_RETRY_SETTINGS)
+        self.settings.update(settings or {})
+        self.max_attempts = max(int(self.settings['max_attempts']), 1)
+        self.base_delay = float(self.settings['base_delay'])
+        self.max_delay = float(self.settings['max_delay'])
+        self.retry_statuses = set(self.settings['retry_statuses'])
+        self.retry_exceptions = set(self.settings['retry_exceptions'])
+        self.budget = budget or RetryBudget(int(self.settings['budget_per_cycle']))
+        logger.debug(f"RetryPolicy initialized with settings: {self.settings}")
+
+    @classmethod
+    def configure_default(cls, config=None):
+        """
+        根据配置创建进程级默认重试策略
+
+        :param config: exporter.retry配置字典
+        """
+        cls._default = cls(config)
+        return cls._default
+
+    @classmethod
+    def default(cls):
+        """
+        获取进程级默认重试策略
+        """
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def with_max_attempts(self, max_attempts):
+        """
+        返回使用不同最大尝试次数、但共享同一重试预算的策略
+        """
+        settings = dict(self.settings, max_attempts=max_attempts)
+        return RetryPolicy(settings, budget=self.budget)
+
+    def classify(self, exception):
+        """
+        判断异常是否可重试
+
+        :param exception: 请求抛出的异常
+        :return: 重试原因字符串，不可重试时返回None
+        """
+        status_code = None
+        if isinstance(exception, sdk_exceptions.ServiceResponseException):
+            status_code = exception.status_code
+        elif isinstance(exception, requests.exceptions.HTTPError) and exception.response is not None:
+            status_code = exception.response.status_code
+
+        if status_code is not None:
+            return f'status_{status_code}' if status_code in self.retry_statuses else None
+
+        if isinstance(exception, (requests.exceptions.Timeout, sdk_exceptions.RequestTimeoutException)):
+            reason = 'timeout'
+        elif isinstance(exception, sdk_exceptions.SslHandShakeException):
+            reason = None
+        elif isinstance(exception, (requests.exceptions.ConnectionError, sdk_exceptions.ConnectionException)):
+            reason = 'connection_error'
+        else:
+            reason = None
+        return reason if reason in self.retry_exceptions else None
+
+    def get_retry_after(self, exception):
+        """
+        从异常关联的响应中解析Retry-After头
+        SDK异常没有响应对象，使用SDK客户端工厂的异常处理器保存在retry_after属性中的响应头
+
+        :param exception: 请求抛出的异常
+        :return: 等待秒数，没有该响应头时返回None
+        """
+        response = getattr(exception, 'response', None)
+        headers = getattr(response, 'headers', None)
+        value = headers.get('Retry-After') if headers else getattr(exception, 'retry_after', None)
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+            return max(retry_at.timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            logger.debug(f"Ignoring unparsable Retry-After header: {value}")
+            return None
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        计算下一次重试前的等待时间（全抖动指数退避）
+
+        :param attempt: 已失败的尝试次数，从1开始
+        :param retry_after: 服务端要求的等待时间
+        :return: 等待秒数
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None and self.settings['respect_retry_after']:
+            delay = max(delay, min(retry_after, float(self.settings['max_retry_after'])))
+        return delay
+
+    def execute(self, func, idempotent=True, operation=None):
+        """
+        按重试策略执行请求
+
+        :param func: 无参数的请求函数
+        :param idempotent: 请求是否幂等，非幂等请求默认不重试
+        :param operation: 操作名称，仅用于日志
+        :return: 请求函数的返回值
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return func()
+            except Exception as e:
+                reason = self.classify(e)
+                if reason is None:
+                    logger.debug(f"Not retrying {operation}: non-retryable error {e}")
+                    raise
+                if not idempotent and not self.settings['retry_non_idempotent']:
+                    logger.debug(f"Not retrying non-idempotent {operation} after {reason}")
+                    raise
+                if attempt >= self.max_attempts:
+                    logger.error(f"All {self.max_attempts} attempts for {operation} failed. Raising exception.")
+                    raise
+                if not self.budget.try_acquire():
+                    RETRY_BUDGET_EXHAUSTED_TOTAL.labels(reason=reason).inc()
+                    logger.warning(f"Retry budget exhausted, not retrying {operation} after {reason}")
+                    raise
+
+                RETRIES_TOTAL.labels(reason=reason).inc()
+                sleep_time = self.backoff(attempt, self.get_retry_after(e))
+                logger.warning(f"Attempt {attempt}/{self.max_attempts} for {operation} failed ({reason}): {e}")
+                logger.debug(f"Retrying {operation} in {sleep_time:.2f} seconds")
+                time.sleep(sleep_time)
@@ -0,0 +1,206 @@
+import importlib
+import threading
+import logging
+
+from huaweicloudsdkcore.auth.credentials import BasicCredentials, GlobalCredentials
+from huaweicloudsdkcore.exceptions.exception_handler import DefaultExceptionHandler
+from huaweicloudsdkcore.exceptions.exceptions import ServiceResponseException
+from huaweicloudsdkcore.http.http_config import HttpConfig
+from huaweicloudsdkcore.http.http_handler import HttpHandler
+from prometheus_client import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+# 定义模块级指标，避免重复注册
+# SDK请求数指标
+SDK_REQUESTS_TOTAL = Counter(
+    'exporter_sdk_requests_total',
+    'Total number of Huawei Cloud SDK requests',
+    ['service', 'method', 'status_code']
+)
+
+# SDK请求耗时指标
+SDK_REQUEST_DURATION_SECONDS = Histogram(
+    'exporter_sdk_request_duration_seconds',
+    'Duration of Huawei Cloud SDK requests',
+    ['service']
+)
+
+# 支持的SDK服务：服务名 -> (客户端模块, 客户端类, 区域模块, 区域类)
+SDK_SERVICES = {
+    'bss': ('huaweicloudsdkbss.v2', 'BssClient', 'huaweicloudsdkbss.v2.region.bss_region', 'BssRegion'),
+    'scm': ('huaweicloudsdkscm.v3', 'ScmClient', 'huaweicloudsdkscm.v3.region.scm_region', 'ScmRegion'),
+    'ces': ('huaweicloudsdkces.v1', 'CesClient', 'huaweicloudsdkces.v1.region.ces_region', 'CesRegion'),
+}
+
+# 项目级服务，使用BasicCredentials并按区域的项目ID签名，其余为全局服务
+PROJECT_SERVICES = {'ces'}
+
+# SDK HttpConfig默认配置
+DEFAULT_SDK_SETTINGS = {
+    'connect_timeout': 60,             # 连接超时（秒）
+    'read_timeout': 120,               # 读取超时（秒）
+    'retry_times': 0,                  # SDK底层连接重试次数，重试统一由exporter.retry控制
+    'pool_connections': 10,            # 缓存的连接池数量
+    'pool_maxsize': 10,                # 每个连接池的最大连接数
+    'ignore_ssl_verification': False,  # 是否跳过SSL证书校验
+}
+
+
+class _InstrumentedHttpHandler(HttpHandler):
+    """
+    SDK请求/响应钩子，替换SDK默认的逐请求INFO日志，记录请求指标并调用已注册的扩展钩子
+    """
+
+    def __init__(self, service, request_hooks, response_hooks):
+        super().__init__()
+        self._service = service
+        self._request_handlers = [self._on_request]
+        self._response_handlers = [self._on_response]
+        self._extra_request_hooks = request_hooks
+        self._extra_response_hooks = response_hooks
+
+    def _on_request(self, **kwargs):
+        request = kwargs.get('request')
+        logger.debug(f"SDK request: service={self._service}, method={request.method}, url={request.url}")
+        for hook in self._extra_request_hooks:
+            try:
+                hook(service=self._service, **kwargs)
+            except Exception as e:
+                logger.warning(f"SDK request hook failed: {e}")
+
+    def _on_response(self, **kwargs):
+        response = kwargs.get('response')
+        SDK_REQUESTS_TOTAL.labels(
+            service=self._service,
+            method=response.request.method,
+            status_code=str(response.status_code)
+        ).inc()
+        SDK_REQUEST_DURATION_SECONDS.labels(service=self._service).observe(response.elapsed.total_seconds())
+        logger.debug(f"SDK response: service={self._service}, status={response.status_code}, "
+                     f"elapsed={response.elapsed.total_seconds():.3f}s, "
+                     f"request_id={response.headers.get('X-Request-Id', '')}")
+        for hook in self._extra_response_hooks:
+            try:
+                hook(service=self._service, **kwargs)
+            except Exception as e:
+                logger.warning(f"SDK response hook failed: {e}")
+
+
+class _RetryAfterExceptionHandler(DefaultExceptionHandler):
+    """
+    SDK的响应异常不包含响应对象，将Retry-After头保存到异常的retry_after属性，供重试策略使用
+    """
+
+    def handle_exception(self, request, response):
+        try:
+            super().handle_exception(request, response)
+        except ServiceResponseException as e:
+            e.retry_after = response.headers.get('Retry-After')
+            raise
+
+
+class SDKClientFactory:
+    """
+    华为云SDK客户端工厂
+    按 (ak, region, service) 共享线程安全的SDK客户端，使同一账号的多个采集模块复用凭证、连接池和内存
+    """
+
+    _lock = threading.Lock()
+    _clients = {}
+    _settings = dict(DEFAULT_SDK_SETTINGS)
+    _request_hooks = []
+    _response_hooks = []
+
+    @classmethod
+    def configure(cls, config=None):
+        """
+        根据配置设置SDK HttpConfig参数，已创建的客户端会被关闭并按新配置重建
+
+        :param config: exporter.sdk配置字典
+        """
+        settings = dict(DEFAULT_SDK_SETTINGS)
+        settings.update(config or {})
+        logger.debug(f"Configuring SDK client factory with settings: {settings}")
+
+        with cls._lock:
+            cls._settings = settings
+            for client in cls._clients.values():
+                client.close()
+            cls._clients.clear()
+
+    @classmethod
+    def add_request_hook(cls, hook):
+        """
+        注册SDK请求钩子，钩子以关键字参数 service, request, logger 调用
+        """
+        cls._request_hooks.append(hook)
+
+    @classmethod
+    def add_response_hook(cls, hook):
+        """
+        注册SDK响应钩子，钩子以关键字参数 service, response, logger 调用
+        """
+        cls._response_hooks.append(hook)
+
+    @classmethod
+    def get_client(cls, service, ak, sk, region, endpoint=None, project_id=None):
+        """
+        获取共享的SDK客户端
+
+        :param service: 服务名称，如 bss、scm、ces
+        :param ak: Access Key ID
+        :param sk: Secret Access Key
+        :param region: 区域
+        :param endpoint: 自定义端点（可选），配置后不再按区域解析端点
+        :param project_id: 项目ID（可选），仅项目级服务使用，不传时由SDK按区域自动获取
+        :return: SDK客户端对象
+        """
+        key = (ak, region, service, endpoint, project_id)
+        client = cls._clients.get(key)
+        if client is not None:
+            logger.debug(f"Reusing shared {service} client for region {region}")
+            return client
+
+        with cls._lock:
+            client = cls._clients.get(key)
+            if client is None:
+                client = cls._build_client(service, ak, sk, region, endpoint, project_id)
+                cls._clients[key] = client
+                logger.debug(f"Created shared {service} client for region {region}")
+        return client
+
+    @classmethod
+    def _build_client(cls, service, ak, sk, region, endpoint, project_id=None):
+        """
+        按当前配置构建SDK客户端
+        """
+        if service not in SDK_SERVICES:
+            raise ValueError(f"Unsupported SDK service: {service}")
+        client_module, client_class, region_module, region_class = SDK_SERVICES[service]
+        client_cls = getattr(importlib.import_module(client_module), client_class)
+
+        settings = cls._settings
+        http_config = HttpConfig.get_default_config()
+        http_config.timeout = (settings['connect_timeout'], settings['read_timeout'])
+        http_config.retry_times = settings['retry_times']
+        http_config.pool_connections = settings['pool_connections']
+        http_config.pool_maxsize = settings['pool_maxsize']
+        http_config.ignore_ssl_verification = settings['ignore_ssl_verification']
+
+        if service in PROJECT_SERVICES:
+            credentials = BasicCredentials(ak, sk, project_id)
+        else:
+            credentials = GlobalCredentials(ak, sk)
+
+        builder = client_cls.new_builder() \
+            .with_credentials(credentials) \
+            .with_http_config(http_config) \
+            .with_http_handler(_InstrumentedHttpHandler(service, cls._request_hooks, cls._response_hooks)) \
+            .with_exception_handler(_RetryAfterExceptionHandler())
+        if endpoint:
+            builder = builder.with_endpoints([endpoint])
+        else:
+            region_cls = getattr(importlib.import_module(region_module), region_class)
+            builder = builder.with_region(region_cls.value_of(region))
+        return builder.build()
@@ -0,0 +1,38 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def invoke_raw(client, operation, request, stream=False):
+    """
+    以原始模式调用SDK接口：复用SDK的请求构造、签名和错误处理，但跳过响应模型反序列化
+
+    SDK默认会先把响应JSON逐行构造成模型对象，采集器再通过to_json_object()转回字典，
+    数据量大时这一往返占用了大部分CPU时间。原始模式直接返回HTTP响应，由调用方解码JSON。
+
+    :param client: SDK客户端对象
+    :param operation: SDK客户端方法名，如 list_costs
+    :param request: SDK请求对象
+    :param stream: 是否以流式方式读取响应体
+    :return: requests.Response对象
+    """
+    http_info = getattr(client, f'_{operation}_http_info')(request)
+    logger.debug(f"Invoking {operation} in raw mode: {http_info['method']} {http_info['resource_path']}")
+
+    sdk_request = client.build_future_request(
+        http_info['method'],
+        http_info['resource_path'],
+        http_info.get('path_params'),
+        http_info.get('query_params'),
+        http_info.get('header_params'),
+        http_info.get('body'),
+        http_info.get('post_params'),
+        http_info.get('cname'),
+        http_info.get('response_type'),
+        http_info.get('collection_formats'),
+        None
+    ).result()
+    sdk_request.stream = stream
+
+    # 非2xx响应会在SDK的响应钩子中转换为对应的SDK异常，与SDK模式保持一致
+    return client.get_http_client().do_request_sync(sdk_request)
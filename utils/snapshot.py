@@ -0,0 +1,744 @@
+import sys
+import heapq
+import threading
+import logging
+from contextlib import contextmanager
+
+from prometheus_client import REGISTRY, Counter, Gauge
+from prometheus_client.core import GaugeMetricFamily, InfoMetricFamily
+
+logger = logging.getLogger(__name__)
+
+# 定义模块级指标，避免重复注册
+# 快照指标族当前的序列数指标
+SNAPSHOT_SERIES = Gauge(
+    'exporter_snapshot_series',
+    'Number of live series in snapshot metric families',
+    ['family']
+)
+
+# 连续多个采集代未出现而被淘汰的序列数指标
+SNAPSHOT_EVICTED_SERIES_TOTAL = Counter(
+    'exporter_snapshot_evicted_series_total',
+    'Total number of series evicted after not being seen for the configured number of collection generations',
+    ['family']
+)
+
+# 因超出指标族序列数上限而折叠到other序列或丢弃的序列数指标
+SNAPSHOT_DROPPED_SERIES_TOTAL = Counter(
+    'exporter_snapshot_dropped_series_total',
+    'Total number of series folded into the other series or dropped because a family exceeded its series limit',
+    ['family']
+)
+
+# 默认的淘汰代数，序列连续这么多个成功的采集周期未被写入或保留时删除
+DEFAULT_STALE_GENERATIONS = 3
+
+# 采集线程当前处理的记录标识，写入的序列归属到该记录
+_attribution = threading.local()
+
+
+class SnapshotRegistry:
+    """
+    快照指标注册表
+    每个采集器（owner）一个采集周期内的写入先进入该周期的构建快照，周期结束时整体替换已发布的快照；
+    抓取时只读取已发布的快照，不会看到采集周期中途新旧数据混合的结果，写入和抓取都不需要加锁。
+    整个注册表作为一个自定义Collector注册到prometheus_client的默认REGISTRY中。
+    """
+
+    _lock = threading.Lock()
+    _families = {}
+    # owner -> {指标名: {标签值元组: 样本值}}，已发布的快照不再修改，只整体替换
+    _published = {}
+    # 当前采集周期，为None时写入直接作用于owner为None的快照
+    _cycle = None
+    _registered = False
+    # owner -> {指标名: {标签值元组: 样本值}}，按序列数上限截断后对外输出的视图，未超出上限的指标族与_published共享
+    _exposed = {}
+    # owner -> 采集代状态，记录每个序列最后一次出现的采集代
+    _generations = {}
+    _stale_generations = DEFAULT_STALE_GENERATIONS
+    # 指标名 -> 序列数上限
+    _limits = {}
+
+    @classmethod
+    def configure(cls, config=None):
+        """
+        根据配置设置淘汰代数和各指标族的序列数上限
+
+        :param config: exporter.snapshot配置字典，stale_generations为0时不淘汰，limits为 {指标名: 上限配置}
+        """
+        config = config or {}
+        cls._stale_generations = max(int(config.get('stale_generations', DEFAULT_STALE_GENERATIONS)), 0)
+        cls._limits = {name: SeriesLimit(name, **(limit or {})) for name, limit in (config.get('limits') or {}).items()}
+        logger.debug(f"Snapshot stale generations set to {cls._stale_generations}, limits: {list(cls._limits)}")
+
+    @classmethod
+    def register(cls, family):
+        """
+        注册快照指标族，首次注册时把注册表注册到默认REGISTRY
+
+        :param family: SnapshotGauge或SnapshotInfo对象
+        """
+        with cls._lock:
+            if family.name in cls._families:
+                raise ValueError(f"Duplicated snapshot metric: {family.name}")
+            cls._families[family.name] = family
+            if not cls._registered:
+                REGISTRY.register(_SnapshotCollector())
+                cls._registered = True
+
+    @classmethod
+    @contextmanager
+    def cycle(cls, owner, stale_generations=None, rules=None):
+        """
+        一个采集器的一次采集周期，正常结束时发布该周期的快照，出现异常时丢弃，保留上次发布的快照。
+        完整的采集周期结束时采集代加一，并删除连续stale_generations代未被写入或保留的序列
+
+        :param owner: 快照所有者标识，如 (模块名, 账号名)
+        :param stale_generations: 该采集器的淘汰代数，不传则使用全局配置
+        :param rules: 该采集器的MetricRules，周期内的labels()按规则丢弃指标族和标签
+        """
+        with cls._lock:
+            if cls._cycle is not None:
+                raise RuntimeError(f"Snapshot cycle for {cls._cycle.owner} is still open")
+            cycle = cls._cycle = _Cycle(owner, cls._published.get(owner) or {}, rules)
+        try:
+            yield cycle
+        except BaseException:
+            logger.debug(f"Discarding snapshot of {owner} after a failed cycle")
+            raise
+        else:
+            state = cls._generations.get(owner) or _Generations()
+            if stale_generations is None:
+                stale_generations = cls._stale_generations
+            snapshot, state, evicted = cycle.freeze(state, stale_generations)
+            view, dropped = cls._apply_limits(snapshot, state)
+            published = dict(cls._published)
+            published[owner] = snapshot
+            exposed = dict(cls._exposed)
+            exposed[owner] = view
+            # 引用赋值是原子的，抓取线程要么看到旧快照，要么看到新快照
+            cls._published = published
+            cls._exposed = exposed
+            cls._generations[owner] = state
+            cls._report(published, set(snapshot) | set(cycle.previous), evicted, dropped)
+            logger.debug(f"Published snapshot of {owner} generation {state.generation} with {cycle.writes} writes, "
+                         f"evicted {sum(evicted.values())} series")
+        finally:
+            cls._cycle = None
+
+    @classmethod
+    def _apply_limits(cls, snapshot, state):
+        """
+        对超出序列数上限的指标族生成截断后的视图，完整的快照仍用于下个周期的复制和淘汰判断
+
+        :return: (对外输出的快照视图, {指标名: 折叠或丢弃的序列数})
+        """
+        limits = cls._limits
+        if not limits:
+            return snapshot, {}
+        view = snapshot
+        dropped = {}
+        for name, limit in limits.items():
+            samples = snapshot.get(name)
+            family = cls._families.get(name)
+            if not samples or family is None or len(samples) <= limit.max_series:
+                continue
+            if view is snapshot:
+                view = dict(snapshot)
+            view[name], dropped[name] = limit.apply(family, samples, state.seen)
+        return view, dropped
+
+    @classmethod
+    def _report(cls, published, names, evicted, dropped):
+        """
+        更新发布后各指标族的序列数、淘汰数和截断数指标
+        """
+        for name in names:
+            SNAPSHOT_SERIES.labels(family=name).set(
+                sum(len(snapshot.get(name) or ()) for snapshot in published.values()))
+        for name, count in evicted.items():
+            SNAPSHOT_EVICTED_SERIES_TOTAL.labels(family=name).inc(count)
+        for name, count in dropped.items():
+            SNAPSHOT_DROPPED_SERIES_TOTAL.labels(family=name).inc(count)
+
+    @classmethod
+    def attribute(cls, key):
+        """
+        开始处理一条记录，之后当前线程的写入归属到该记录，直到处理下一条记录
+
+        :param key: 记录标识，在同一采集器内唯一
+        """
+        cycle = cls._cycle
+        if cycle is not None:
+            cycle.records.setdefault(key, set())
+            _attribution.current = (cycle, key)
+
+    @classmethod
+    def touch_record(cls, key):
+        """
+        记录未变化、未重新写入时，保留上一个采集代归属到该记录的所有序列
+
+        :param key: 记录标识
+        """
+        cycle = cls._cycle
+        if cycle is not None:
+            _attribution.current = None
+            cycle.touch_record(key)
+
+    @classmethod
+    def retain_all(cls):
+        """
+        整个响应未变化、无法判断哪些序列仍然存在时，本采集周期保留该采集器的所有序列
+        """
+        cycle = cls._cycle
+        if cycle is not None:
+            cycle.retain = True
+
+    @classmethod
+    def partial(cls):
+        """
+        当前采集周期是否没有看到完整的数据（有响应未变化而跳过处理，或有请求失败）
+
+        :return: 不在采集周期中时为False
+        """
+        cycle = cls._cycle
+        return cycle is not None and (cycle.retain or not cycle.complete)
+
+    @classmethod
+    def mark_incomplete(cls, reason=None):
+        """
+        采集周期中有请求失败，数据可能不完整，本周期不推进采集代也不淘汰序列
+
+        :param reason: 原因，仅用于日志
+        """
+        cycle = cls._cycle
+        if cycle is not None and cycle.complete:
+            cycle.complete = False
+            logger.debug(f"Snapshot cycle of {cycle.owner} marked incomplete: {reason}")
+
+    @classmethod
+    def _samples(cls, family):
+        """
+        获取当前写入目标中指标族的样本字典，采集周期中首次写入时从上次发布的快照复制
+        """
+        cycle = cls._cycle
+        if cycle is not None:
+            return cycle.samples(family.name)
+        # 不在采集周期中（如工具脚本直接调用collect）时写入owner为None的快照
+        standing = cls._published.get(None)
+        if standing is None:
+            with cls._lock:
+                standing = cls._published.setdefault(None, {})
+                # 不在采集周期中的写入不做序列数截断
+                cls._exposed.setdefault(None, standing)
+        return standing.setdefault(family.name, {})
+
+    @classmethod
+    def write(cls, family, labelvalues, value):
+        cls._samples(family)[labelvalues] = value
+        cls.touch(family, labelvalues)
+
+    @classmethod
+    def touch(cls, family, labelvalues):
+        """
+        标记序列在当前采集代中出现，值未变化不需要重新写入时调用
+        """
+        cycle = cls._cycle
+        if cycle is not None:
+            series = (family.name, labelvalues)
+            cycle.touched.add(series)
+            current = getattr(_attribution, 'current', None)
+            if current is not None and current[0] is cycle:
+                cycle.records[current[1]].add(series)
+
+    @classmethod
+    def remove(cls, family, labelvalues):
+        cls._samples(family).pop(labelvalues, None)
+        family._forget(labelvalues)
+
+    @classmethod
+    def collect(cls):
+        """
+        生成所有快照指标族，只读取一次已发布快照（截断后的视图）的引用
+        """
+        published = cls._exposed
+        merged = {}
+        for snapshot in published.values():
+            for name, samples in snapshot.items():
+                merged.setdefault(name, []).append(samples)
+
+        for name, family in list(cls._families.items()):
+            metric = family._new_metric_family()
+            for samples in merged.get(name, ()):
+                for labelvalues, value in list(samples.items()):
+                    family._add_sample(metric, labelvalues, value)
+            yield metric
+
+
+class MetricRules:
+    """
+    一个模块的指标族和标签输出规则（模块配置metric_families）
+    被丢弃的指标族在labels()时直接返回空操作的子指标，不做任何标签处理也不占用快照内存；
+    被丢弃的标签取值写为空字符串，Prometheus中等同于没有该标签。采集器应在解析数据前用enabled()判断，跳过不输出的指标的计算。
+    只有指标族声明的描述性标签（descriptive_labels，如资源ID对应的资源名称）可以丢弃，丢弃标识序列的标签会使不同的序列变成重复的样本，
+    这类配置被忽略并记录警告
+    """
+
+    def __init__(self, config=None):
+        """
+        :param config: 规则配置字典，keep为只输出的指标族列表，drop为不输出的指标族列表，
+                       drop_labels为 {指标名: 标签列表}，指标名为"*"时作用于所有指标族；Info指标的同名信息标签也会被丢弃
+        """
+        config = config or {}
+        self.keep = frozenset(config.get('keep') or ()) or None
+        self.drop = frozenset(config.get('drop') or ())
+        self.drop_labels = {name: frozenset(labels or ()) for name, labels in (config.get('drop_labels') or {}).items()}
+        # 指标名 -> (标签掩码元组或None, 丢弃的标签名集合)
+        self._masks = {}
+        unknown = ((self.keep or set()) | self.drop | set(self.drop_labels)) - set(SnapshotRegistry._families) - {'*'}
+        if unknown:
+            logger.warning(f"Metric rules reference unknown metric families: {sorted(unknown)}")
+        for name, labels in self.drop_labels.items():
+            family = SnapshotRegistry._families.get(name)
+            if family is None:
+                continue
+            rejected = (labels & family._labelname_set) - family.descriptive_labels
+            if rejected:
+                logger.warning(f"Ignoring drop_labels {sorted(rejected)} of {name}: only descriptive labels "
+                               f"{sorted(family.descriptive_labels)} can be dropped without merging distinct series")
+                self.drop_labels[name] = labels - rejected
+
+    def __bool__(self):
+        return bool(self.keep or self.drop or self.drop_labels)
+
+    def exclude(self, family):
+        """
+        不再输出一个指标族，如到期时间改为分桶统计后的逐对象到期时间指标
+        """
+        self.drop = self.drop | {family.name}
+
+    def enabled(self, family):
+        """
+        :param family: 快照指标族
+        :return: 该指标族是否输出
+        """
+        name = family.name
+        return name not in self.drop and (self.keep is None or name in self.keep)
+
+    def mask(self, family):
+        """
+        "*"中的标识标签在该指标族中不丢弃，Info指标的信息标签不标识序列，都可以丢弃
+
+        :return: (与labelnames对应的丢弃掩码，没有丢弃的标签时为None, 丢弃的标签名集合)
+        """
+        cached = self._masks.get(family.name)
+        if cached is None:
+            dropped = self.drop_labels.get('*', frozenset()) | self.drop_labels.get(family.name, frozenset())
+            mask = tuple(name in dropped and name in family.descriptive_labels for name in family.labelnames)
+            cached = self._masks[family.name] = (mask if any(mask) else None, dropped)
+        return cached
+
+
+class SeriesLimit:
+    """
+    指标族的序列数上限
+    超出上限时按取值或最近出现的采集代保留前max_series个序列，其余序列的keep_labels以外的标签取值替换为other，
+    Gauge按替换后的标签组合求和输出，Info无法求和，直接丢弃
+    """
+
+    def __init__(self, name, max_series, order='value', keep_labels=('account',)):
+        """
+        :param name: 指标名
+        :param max_series: 保留的序列数
+        :param order: 排序方式，value按取值从大到小，recency按最近出现的采集代从新到旧
+        :param keep_labels: 折叠到other序列时保留原值的标签
+        """
+        if order not in ('value', 'recency'):
+            raise ValueError(f"Unsupported series limit order for {name}: {order}")
+        self.name = name
+        self.max_series = max(int(max_series), 0)
+        self.order = order
+        self.keep_labels = frozenset(keep_labels or ())
+
+    def apply(self, family, samples, seen):
+        """
+        :param family: 指标族
+        :param samples: 完整的样本字典
+        :param seen: (指标名, 标签值元组) -> 最近出现的采集代
+        :return: (截断后的样本字典, 折叠或丢弃的序列数)
+        """
+        if self.order == 'recency':
+            name = self.name
+            key = lambda item: (seen.get((name, item[0]), 0), family._rank(item[1]))
+        else:
+            key = lambda item: family._rank(item[1])
+        kept = dict(heapq.nlargest(self.max_series, samples.items(), key=key))
+        folded = 0
+        if family._foldable:
+            keep = [name in self.keep_labels for name in family.labelnames]
+            for labelvalues, value in samples.items():
+                if labelvalues in kept:
+                    continue
+                other = tuple(v if k else 'other' for v, k in zip(labelvalues, keep))
+                kept[other] = kept.get(other, 0.0) + value
+                folded += 1
+        else:
+            folded = len(samples) - len(kept)
+        return kept, folded
+
+
+class _Generations:
+    """
+    一个采集器的采集代状态，每次发布时整体替换
+    """
+
+    def __init__(self, generation=0, seen=None, records=None):
+        self.generation = generation
+        # (指标名, 标签值元组) -> 最后一次出现的采集代
+        self.seen = seen or {}
+        # 记录标识 -> 处理该记录时写入的序列集合
+        self.records = records or {}
+
+
+class _Cycle:
+    """
+    一次采集周期的构建快照，只在第一次写入某个指标族时复制该指标族上次发布的样本
+    """
+
+    def __init__(self, owner, previous, rules=None):
+        self.owner = owner
+        self.previous = previous
+        # 没有配置任何规则时不做检查
+        self.rules = rules or None
+        self.families = {}
+        self.writes = 0
+        # 本周期写入或保留的序列
+        self.touched = set()
+        # 本周期处理或保留的记录 -> 归属的序列
+        self.records = {}
+        self.previous_records = SnapshotRegistry._generations.get(owner, _Generations()).records
+        self.retain = False
+        self.complete = True
+
+    def samples(self, name):
+        self.writes += 1
+        samples = self.families.get(name)
+        if samples is None:
+            samples = self.families.setdefault(name, dict(self.previous.get(name) or {}))
+        return samples
+
+    def touch_record(self, key):
+        series = self.previous_records.get(key) or ()
+        self.records.setdefault(key, set()).update(series)
+        self.touched.update(series)
+
+    def freeze(self, state, stale_generations):
+        """
+        合并未写入的指标族（沿用上次发布的样本），完整的周期推进采集代并淘汰过期序列
+
+        :param state: 上次发布时的采集代状态
+        :param stale_generations: 淘汰代数，为0时不淘汰
+        :return: (新的快照, 新的采集代状态, {指标名: 淘汰数})
+        """
+        snapshot = dict(self.previous)
+        snapshot.update(self.families)
+        if not self.complete:
+            # 数据可能不完整，只记录本周期出现的序列，未处理到的记录保留归属关系
+            seen = dict(state.seen)
+            seen.update((series, state.generation) for series in self.touched)
+            records = dict(state.records)
+            records.update(self.records)
+            return snapshot, _Generations(state.generation, seen, records), {}
+
+        generation = state.generation + 1
+        seen = {}
+        evicted = {}
+        for name, samples in snapshot.items():
+            stale = []
+            for labelvalues in samples:
+                series = (name, labelvalues)
+                if self.retain or series in self.touched:
+                    seen[series] = generation
+                    continue
+                # 启用淘汰前已存在的序列从当前采集代开始计算
+                last_seen = state.seen.get(series, state.generation)
+                if stale_generations and generation - last_seen >= stale_generations:
+                    stale.append(labelvalues)
+                else:
+                    seen[series] = last_seen
+            if stale:
+                # 未在本周期写入的指标族与已发布的快照共享样本字典，淘汰前先复制
+                samples = snapshot[name] = dict(samples)
+                family = SnapshotRegistry._families.get(name)
+                for labelvalues in stale:
+                    del samples[labelvalues]
+                    if family is not None:
+                        family._forget(labelvalues)
+                evicted[name] = len(stale)
+        return snapshot, _Generations(generation, seen, self.records), evicted
+
+
+class _SnapshotCollector:
+    """
+    注册到默认REGISTRY的自定义Collector，抓取时输出所有快照指标族
+    """
+
+    def collect(self):
+        return SnapshotRegistry.collect()
+
+
+class _SnapshotFamily:
+    """
+    快照指标族基类，提供与prometheus_client指标相同的labels/remove接口
+    """
+
+    def __init__(self, name, documentation, labelnames=(), descriptive_labels=()):
+        """
+        :param name: 指标名
+        :param documentation: 帮助文本
+        :param labelnames: 标签名列表
+        :param descriptive_labels: 由其他标签唯一确定、不参与标识序列的标签（如资源ID对应的资源名称），
+                                   只有这些标签可以通过MetricRules的drop_labels丢弃
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._labelname_set = frozenset(self.labelnames)
+        self.descriptive_labels = frozenset(descriptive_labels)
+        if not self.descriptive_labels <= self._labelname_set:
+            raise ValueError(f"Descriptive labels of {name} are not label names: "
+                             f"{sorted(self.descriptive_labels - self._labelname_set)}")
+        SnapshotRegistry.register(self)
+
+    def labels(self, *labelvalues, **labelkwargs):
+        """
+        标签值统一转换为字符串并驻留（sys.intern），账号、区域、服务类型等重复出现的取值在所有序列间共享同一个对象。
+        当前采集周期的规则丢弃该指标族时返回空操作的子指标
+
+        :return: 写入该标签组合的子指标
+        """
+        cycle = SnapshotRegistry._cycle
+        rules = cycle.rules if cycle is not None else None
+        if rules is not None and not rules.enabled(self):
+            return _NULL_CHILD
+        if labelvalues and labelkwargs:
+            raise ValueError("Can't pass both *args and **kwargs")
+        if labelkwargs:
+            if len(labelkwargs) != len(self.labelnames) or not self._labelname_set.issuperset(labelkwargs):
+                raise ValueError(f"Incorrect label names for {self.name}: {sorted(labelkwargs)}")
+            labelvalues = tuple(sys.intern(str(labelkwargs[name])) for name in self.labelnames)
+        else:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError(f"Incorrect label count for {self.name}")
+            labelvalues = tuple(sys.intern(str(value)) for value in labelvalues)
+        dropped = None
+        if rules is not None:
+            mask, dropped = rules.mask(self)
+            if mask is not None:
+                labelvalues = tuple('' if drop else value for value, drop in zip(labelvalues, mask))
+        return self._child_class(self, labelvalues, dropped or None)
+
+    def _key(self, labelvalues):
+        """
+        按当前采集周期的规则转换remove/touch的标签值，指标族被丢弃时返回None
+        """
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"Incorrect label count for {self.name}")
+        labelvalues = tuple(str(value) for value in labelvalues)
+        cycle = SnapshotRegistry._cycle
+        rules = cycle.rules if cycle is not None else None
+        if rules is not None:
+            if not rules.enabled(self):
+                return None
+            mask = rules.mask(self)[0]
+            if mask is not None:
+                labelvalues = tuple('' if drop else value for value, drop in zip(labelvalues, mask))
+        return labelvalues
+
+    def remove(self, *labelvalues):
+        """
+        删除一个标签组合的样本
+        """
+        key = self._key(labelvalues)
+        if key is not None:
+            SnapshotRegistry.remove(self, key)
+
+    # 超出序列数上限时能否把多余的序列求和折叠到other序列
+    _foldable = False
+
+    @staticmethod
+    def _rank(value):
+        """
+        按取值截断时的排序键
+        """
+        return 0
+
+    def _forget(self, labelvalues):
+        """
+        序列被删除或淘汰时调用，子类清理按序列保存的状态
+        """
+
+    def touch(self, *labelvalues):
+        """
+        标记一个标签组合在当前采集代中仍然存在，值不需要更新时避免被淘汰
+        """
+        key = self._key(labelvalues)
+        if key is not None:
+            SnapshotRegistry.touch(self, key)
+
+
+class ChildCache:
+    """
+    按紧凑的记录标识（如资源ID）缓存绑定好标签的子指标
+    逐条更新大量记录时，标签值未变化的记录直接复用上次绑定的子指标，跳过labels()的标签校验、字符串转换和驻留；
+    标签值变化（如资源改名）时重新绑定并删除旧的序列。只在采集线程中使用，不加锁
+    """
+
+    def __init__(self, bind):
+        """
+        :param bind: 绑定函数，参数为 (记录标识, *标签值)，返回该记录的子指标元组
+        """
+        self._bind = bind
+        # 记录标识 -> (标签值元组, 子指标元组)
+        self._children = {}
+        self._used = set()
+
+    def get(self, key, labelvalues):
+        """
+        :param key: 记录标识
+        :param labelvalues: 决定该记录所有序列标签的取值元组
+        :return: 绑定函数返回的子指标元组
+        """
+        cached = self._children.get(key)
+        if cached is None or cached[0] != labelvalues:
+            if cached is not None:
+                # 标签值变化（如资源改名）时删除旧标签组合的序列，避免与新序列同时存在
+                for child in cached[1]:
+                    child.remove()
+            cached = self._children[key] = (labelvalues, self._bind(key, *labelvalues))
+        self._used.add(key)
+        return cached[1]
+
+    def prune(self):
+        """
+        删除上次prune以来未使用的记录，每个采集周期结束时调用，避免缓存随已删除的记录增长
+        """
+        stale = self._children.keys() - self._used
+        for key in stale:
+            del self._children[key]
+        self._used = set()
+        logger.debug(f"Child cache pruned {len(stale)} records, {len(self._children)} cached")
+
+
+class _NullChild:
+    """
+    被规则丢弃的指标族的子指标，所有写入都不生效
+    """
+    __slots__ = ()
+
+    def set(self, value):
+        pass
+
+    def info(self, val):
+        pass
+
+    def remove(self):
+        pass
+
+
+_NULL_CHILD = _NullChild()
+
+
+class _GaugeChild:
+    __slots__ = ('_family', '_labelvalues')
+
+    def __init__(self, family, labelvalues, dropped=None):
+        self._family = family
+        self._labelvalues = labelvalues
+
+    def set(self, value):
+        SnapshotRegistry.write(self._family, self._labelvalues, float(value))
+
+    def remove(self):
+        SnapshotRegistry.remove(self._family, self._labelvalues)
+
+
+class _InfoChild:
+    __slots__ = ('_family', '_labelvalues', '_dropped')
+
+    def __init__(self, family, labelvalues, dropped=None):
+        self._family = family
+        self._labelvalues = labelvalues
+        # 规则丢弃的信息标签
+        self._dropped = dropped
+
+    def info(self, val):
+        """
+        写入信息标签，与上次写入的内容相同（按哈希比较）且快照中仍是该值时只标记序列出现，不重新构造样本
+        """
+        family = self._family
+        if not family._labelname_set.isdisjoint(val):
+            raise ValueError(f"Overlapping labels for Info metric {family.name}")
+        if self._dropped:
+            val = {k: v for k, v in val.items() if k not in self._dropped}
+        try:
+            digest = hash(tuple(val.items()))
+        except TypeError:
+            # 取值不可哈希时不做比较，直接写入
+            digest = None
+        labelvalues = self._labelvalues
+        written = family._digests.get(labelvalues)
+        if digest is not None and written is not None and written[0] == digest \
+                and SnapshotRegistry._samples(family).get(labelvalues) is written[1]:
+            SnapshotRegistry.touch(family, labelvalues)
+            return
+        # 信息标签整体替换同一标签组合的样本，旧的信息标签不会残留为单独的序列
+        value = tuple(sorted((k, str(v)) for k, v in val.items()))
+        SnapshotRegistry.write(family, labelvalues, value)
+        family._digests[labelvalues] = (digest, value)
+
+    def remove(self):
+        SnapshotRegistry.remove(self._family, self._labelvalues)
+
+
+class SnapshotGauge(_SnapshotFamily):
+    """
+    快照Gauge，写入当前采集周期的快照，用法与prometheus_client.Gauge相同：METRIC.labels(...).set(value)
+    """
+
+    _child_class = _GaugeChild
+    _foldable = True
+
+    @staticmethod
+    def _rank(value):
+        return value
+
+    def _new_metric_family(self):
+        return GaugeMetricFamily(self.name, self.documentation, labels=self.labelnames)
+
+    def _add_sample(self, metric, labelvalues, value):
+        metric.add_metric(labelvalues, value)
+
+
+class SnapshotInfo(_SnapshotFamily):
+    """
+    快照Info，用法与prometheus_client.Info相同：METRIC.labels(...).info(dict)
+    """
+
+    _child_class = _InfoChild
+
+    def __init__(self, name, documentation, labelnames=(), descriptive_labels=()):
+        super().__init__(name, documentation, labelnames, descriptive_labels)
+        # 标签值元组 -> (信息字典的哈希, 写入的样本值)
+        self._digests = {}
+
+    def _forget(self, labelvalues):
+        self._digests.pop(labelvalues, None)
+
+    def _new_metric_family(self):
+        return InfoMetricFamily(self.name, self.documentation, labels=self.labelnames)
+
+    def _add_sample(self, metric, labelvalues, value):
+        metric.add_metric(labelvalues, dict(value))
@@ -0,0 +1,317 @@
+import socket
+import threading
+import time
+import logging
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import DEFAULT_CA_BUNDLE_PATH
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+from urllib3.util.timeout import _DEFAULT_TIMEOUT
+from urllib3.util.ssl_ import create_urllib3_context
+from prometheus_client import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+# 定义模块级指标，避免重复注册
+# 新建连接数指标
+HTTP_CONNECTIONS_NEW_TOTAL = Counter(
+    'exporter_http_connections_new_total',
+    'Total number of new HTTP connections opened by the shared transport',
+    ['host']
+)
+
+# 复用连接数指标
+HTTP_CONNECTIONS_REUSED_TOTAL = Counter(
+    'exporter_http_connections_reused_total',
+    'Total number of pooled HTTP connections reused by the shared transport',
+    ['host']
+)
+
+# 连接池等待时间指标
+HTTP_POOL_WAIT_SECONDS = Histogram(
+    'exporter_http_pool_wait_seconds',
+    'Time spent waiting for a connection from the shared transport pool',
+    ['host'],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+)
+
+# 传输层默认配置
+DEFAULT_TRANSPORT_SETTINGS = {
+    'pool_connections': 10,    # 每个会话缓存的连接池数量
+    'pool_maxsize': 10,        # 每个主机连接池的最大连接数
+    'pool_block': False,       # 连接池耗尽时是否阻塞等待
+    'keep_alive': True,        # 是否启用HTTP长连接和TCP keepalive
+    'dns_cache_ttl': 300,      # DNS解析结果缓存时间（秒），0表示不缓存
+}
+
+
+class _DNSCache:
+    """
+    DNS解析结果缓存，只用于共享传输层自己的连接，不影响进程中的其他socket
+    条目数有上限，写入时清理已过期的条目，超出上限时淘汰最早写入的条目
+    """
+
+    def __init__(self, max_entries=256):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._ttl = 0
+        self.max_entries = max_entries
+
+    def configure(self, ttl):
+        """
+        设置缓存时间并清空已缓存的解析结果
+
+        :param ttl: 缓存时间（秒），0表示不缓存
+        """
+        with self._lock:
+            self._ttl = ttl
+            self._entries.clear()
+        logger.debug(f"DNS cache configured with ttl: {ttl}")
+
+    def getaddrinfo(self, host, port, family=0, type=0):
+        """
+        与socket.getaddrinfo相同，未过期时返回缓存的解析结果
+        """
+        key = (host, port, family, type)
+        now = time.monotonic()
+        with self._lock:
+            ttl = self._ttl
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        result = socket.getaddrinfo(host, port, family, type)
+        if ttl > 0:
+            with self._lock:
+                self._entries.pop(key, None)
+                self._entries[key] = (now + ttl, result)
+                if len(self._entries) > self.max_entries:
+                    self._purge(now)
+        return result
+
+    def _purge(self, now):
+        """
+        删除已过期的条目，仍超出上限时按写入顺序淘汰最早的条目，调用时需持有锁
+        """
+        for key in [key for key, entry in self._entries.items() if entry[0] <= now]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+    def create_connection(self, address, timeout=_DEFAULT_TIMEOUT, source_address=None, socket_options=None):
+        """
+        与urllib3.util.connection.create_connection相同，地址解析使用缓存
+        """
+        host, port = address
+        if host.startswith("["):
+            host = host.strip("[]")
+        err = None
+        for af, socktype, proto, _, sa in self.getaddrinfo(host, port, allowed_gai_family(), socket.SOCK_STREAM):
+            sock = None
+            try:
+                sock = socket.socket(af, socktype, proto)
+                for option in socket_options or ():
+                    sock.setsockopt(*option)
+                if timeout is not _DEFAULT_TIMEOUT:
+                    sock.settimeout(timeout)
+                if source_address:
+                    sock.bind(source_address)
+                sock.connect(sa)
+                return sock
+            except OSError as e:
+                err = e
+                if sock is not None:
+                    sock.close()
+        if err is not None:
+            raise err
+        raise OSError("getaddrinfo returns an empty list")
+
+
+# 共享传输层连接使用的DNS缓存
+_dns_cache = _DNSCache()
+
+
+class _CachedDNSConnectionMixin:
+    """
+    建立连接时通过DNS缓存解析地址，错误处理与urllib3一致
+    """
+
+    def _new_conn(self):
+        try:
+            sock = _dns_cache.create_connection(
+                (self._dns_host, self.port),
+                self.timeout,
+                source_address=self.source_address,
+                socket_options=self.socket_options,
+            )
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        except socket.timeout as e:
+            raise ConnectTimeoutError(
+                self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})"
+            ) from e
+        except OSError as e:
+            raise NewConnectionError(self, f"Failed to establish a new connection: {e}") from e
+        return sock
+
+
+class _CachedDNSHTTPConnection(_CachedDNSConnectionMixin, HTTPConnection):
+    pass
+
+
+class _CachedDNSHTTPSConnection(_CachedDNSConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _InstrumentedPoolMixin:
+    """
+    连接池统计混入类，记录新建连接、复用连接和等待连接的耗时
+    """
+
+    def _new_conn(self):
+        HTTP_CONNECTIONS_NEW_TOTAL.labels(host=self.host).inc()
+        logger.debug(f"Opening new connection to {self.host}")
+        return super()._new_conn()
+
+    def _get_conn(self, timeout=None):
+        start_time = time.monotonic()
+        conn = super()._get_conn(timeout=timeout)
+        HTTP_POOL_WAIT_SECONDS.labels(host=self.host).observe(time.monotonic() - start_time)
+        # 已建立socket的连接说明是从连接池中复用的
+        if getattr(conn, 'sock', None) is not None:
+            HTTP_CONNECTIONS_REUSED_TOTAL.labels(host=self.host).inc()
+        return conn
+
+
+class _InstrumentedHTTPConnectionPool(_InstrumentedPoolMixin, HTTPConnectionPool):
+    ConnectionCls = _CachedDNSHTTPConnection
+
+
+class _InstrumentedHTTPSConnectionPool(_InstrumentedPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = _CachedDNSHTTPSConnection
+
+
+class _PooledHTTPAdapter(HTTPAdapter):
+    """
+    带连接统计、共享TLS上下文和TCP keepalive的HTTPAdapter
+    """
+
+    def __init__(self, ssl_context=None, keep_alive=True, **kwargs):
+        self._ssl_context = ssl_context
+        self._keep_alive = keep_alive
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        if self._ssl_context is not None:
+            pool_kwargs.setdefault('ssl_context', self._ssl_context)
+        if self._keep_alive:
+            pool_kwargs.setdefault(
+                'socket_options',
+                HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+            )
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _InstrumentedHTTPConnectionPool,
+            'https': _InstrumentedHTTPSConnectionPool,
+        }
+
+    def cert_verify(self, conn, url, verify, cert):
+        super().cert_verify(conn, url, verify, cert)
+        # 默认CA证书已预加载到共享TLS上下文中，无需每个连接重新加载
+        if verify is True and self._ssl_context is not None:
+            conn.ca_certs = None
+            conn.ca_cert_dir = None
+
+
+class TransportRegistry:
+    """
+    进程级HTTP传输注册表
+    为每个主机维护一个共享的requests.Session及其连接池，所有HTTP客户端和认证请求复用同一套连接
+    """
+
+    _lock = threading.Lock()
+    _sessions = {}
+    _settings = dict(DEFAULT_TRANSPORT_SETTINGS)
+    _ssl_context = None
+
+    @classmethod
+    def configure(cls, config=None):
+        """
+        根据配置初始化传输层，已创建的会话会被关闭并按新配置重建
+
+        :param config: exporter.http配置字典
+        """
+        settings = dict(DEFAULT_TRANSPORT_SETTINGS)
+        settings.update(config or {})
+        logger.debug(f"Configuring transport registry with settings: {settings}")
+
+        with cls._lock:
+            cls._settings = settings
+            for session in cls._sessions.values():
+                session.close()
+            cls._sessions.clear()
+
+        _dns_cache.configure(settings.get('dns_cache_ttl', 0) or 0)
+
+    @classmethod
+    def get_session(cls, url):
+        """
+        获取目标URL所在主机的共享会话
+
+        :param url: 请求URL
+        :return: requests.Session对象
+        """
+        parts = urlsplit(url)
+        key = f"{parts.scheme}://{parts.netloc}"
+        session = cls._sessions.get(key)
+        if session is not None:
+            return session
+
+        with cls._lock:
+            session = cls._sessions.get(key)
+            if session is None:
+                session = cls._create_session()
+                cls._sessions[key] = session
+                logger.debug(f"Created shared session for {key}")
+        return session
+
+    @classmethod
+    def _create_session(cls):
+        """
+        按当前配置创建会话
+        """
+        settings = cls._settings
+        # 所有会话共享同一个TLS上下文，避免每个连接重复加载CA证书
+        if cls._ssl_context is None:
+            cls._ssl_context = create_urllib3_context()
+            cls._ssl_context.load_verify_locations(DEFAULT_CA_BUNDLE_PATH)
+
+        adapter = _PooledHTTPAdapter(
+            ssl_context=cls._ssl_context,
+            keep_alive=settings.get('keep_alive', True),
+            pool_connections=settings.get('pool_connections', 10),
+            pool_maxsize=settings.get('pool_maxsize', 10),
+            pool_block=settings.get('pool_block', False)
+        )
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if not settings.get('keep_alive', True):
+            session.headers['Connection'] = 'close'
+        return session
+
+    @classmethod
+    def close_all(cls):
+        """
+        关闭所有共享会话
+        """
+        with cls._lock:
+            for session in cls._sessions.values():
+                session.close()
+            cls._sessions.clear()
+        logger.debug("All shared sessions closed")